@@ -3,11 +3,12 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import Config
+from app.database import RoutingSession
 import pymysql
 import os
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()  # 不要在这里传递 app 和 db
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
@@ -20,10 +21,33 @@ def create_app(config_class=Config):
     
     # Initialize extensions with the app
     pymysql.install_as_MySQLdb()  # 这行让pymysql作为MySQLdb的替代品
+    from app.database import database
+    database.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     
+    from app.passwords import password_hasher
+    password_hasher.init_app(app)
+    
+    from app.search import search_engine
+    search_engine.init_app(app)
+    
+    from app.cache import cache
+    cache.init_app(app)
+    
+    from app.httpcache import http_cache
+    http_cache.init_app(app)
+    
+    from app.metrics import metrics
+    metrics.init_app(app)
+    
+    from app.identity import identity_cache
+    identity_cache.init_app(app)
+    
+    from app.tasks import task_queue
+    task_queue.init_app(app)
+    
     # Register blueprints
     from app.routes import main_bp, auth_bp, user_bp, admin_bp
     app.register_blueprint(main_bp)
@@ -31,6 +55,36 @@ def create_app(config_class=Config):
     app.register_blueprint(user_bp, url_prefix='/user')
     app.register_blueprint(admin_bp, url_prefix='/admin')
     
+    from app.api import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+    
+    # Register CLI commands
+    from app.stats import stats_cli
+    from app.similarity import similarity_cli
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(similarity_cli)
+    
+    from app.explain import explain_command
+    app.cli.add_command(explain_command)
+    
+    from app.passwords import passwords_cli
+    app.cli.add_command(passwords_cli)
+    
+    from app.tasks import tasks_cli
+    app.cli.add_command(tasks_cli)
+    
+    from app.deletion import deletion_cli
+    app.cli.add_command(deletion_cli)
+    
+    from app.bulk import bulk_cli
+    app.cli.add_command(bulk_cli)
+    
+    from app.matching import matching_cli
+    app.cli.add_command(matching_cli)
+    
+    from app.recommendations import recommendations_cli
+    app.cli.add_command(recommendations_cli)
+    
     # Create upload folder if it doesn't exist
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
@@ -0,0 +1,271 @@
+"""Versioned JSON API over jobs, applications and resumes (``/api/v1``).
+
+Every collection supports:
+
+* ``fields=title,location`` - sparse fieldsets; ``id`` is always included.
+  Fields from a related row (an application's ``job_title``) add a join
+  only when asked for.
+* ``cursor`` / ``limit`` - keyset pagination, newest first; the response
+  carries ``next_cursor`` until the last page.
+* ``ids=1,2,3`` - batch fetch in the given order; ids that do not exist or
+  are not visible to the caller are listed under ``missing``.
+
+List endpoints select just the requested columns and serialize the rows
+with orjson, so no ORM objects are built. Jobs are public; applications and
+resumes need a login, and only admins see other users' rows.
+"""
+import orjson
+from flask import Blueprint, current_app, request
+from flask_login import current_user
+from sqlalchemy import select
+from werkzeug.exceptions import HTTPException
+
+from app import db
+from app.database import read_only
+from app.models import Job, Application, Resume
+from app.pagination import decode_cursor, encode_cursor, keyset_filter
+from app.salary import parse_salary_query, salary_criteria
+
+api_bp = Blueprint('api', __name__)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_IDS = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class Resource:
+    """A model exposed by the API: its fields, default fieldset and sort order."""
+
+    def __init__(self, model, fields, default, order, joins=None, owner=None):
+        self.model = model
+        self.fields = fields
+        self.default = default
+        self.order = order
+        # field name -> (related model, ON clause) joined when the field is selected
+        self.joins = joins or {}
+        self.owner = owner
+
+    def fieldset(self, spec):
+        """Field names selected by a ``fields`` parameter, ``id`` first."""
+        names = [name.strip() for name in spec.split(',') if name.strip()] if spec else list(self.default)
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f'Unknown fields: {", ".join(unknown)}; available: {", ".join(self.fields)}')
+        return ['id'] + [name for name in dict.fromkeys(names) if name != 'id']
+
+    def select(self, names):
+        """SELECT of the ``names`` columns, followed by the sort key columns."""
+        statement = select(*[self.fields[name].label(name) for name in names],
+                           *[column.label(f'_sort{i}') for i, column in enumerate(self.order)]) \
+            .select_from(self.model)
+        joined = set()
+        for name in names:
+            if name in self.joins and self.joins[name][0] not in joined:
+                target, onclause = self.joins[name]
+                statement = statement.join(target, onclause)
+                joined.add(target)
+        if self.owner is not None and not current_user.is_admin():
+            statement = statement.where(self.owner == current_user.id)
+        return statement
+
+
+JOBS = Resource(
+    Job,
+    fields={name: getattr(Job, name) for name in (
+        'id', 'title', 'description', 'requirements', 'location', 'salary', 'salary_currency', 'salary_min',
+        'salary_max', 'contact_info', 'created_at', 'updated_at', 'posted_by')},
+    default=('title', 'location', 'salary', 'created_at'),
+    order=(Job.created_at, Job.id),
+)
+
+APPLICATIONS = Resource(
+    Application,
+    fields=dict({name: getattr(Application, name) for name in (
+        'id', 'user_id', 'job_id', 'resume_id', 'status', 'created_at', 'updated_at')},
+        job_title=Job.title),
+    default=('job_id', 'job_title', 'status', 'created_at'),
+    order=(Application.created_at, Application.id),
+    joins={'job_title': (Job, Application.job_id == Job.id)},
+    owner=Application.user_id,
+)
+
+RESUMES = Resource(
+    Resume,
+    fields={name: getattr(Resume, name) for name in (
+        'id', 'user_id', 'name', 'gender', 'age', 'education', 'contact', 'experience', 'introduction',
+        'created_at', 'updated_at')},
+    default=('user_id', 'name', 'education', 'updated_at'),
+    order=(Resume.id,),
+    owner=Resume.user_id,
+)
+
+
+def render(payload, status=200):
+    return current_app.response_class(orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS),
+                                      status=status, mimetype='application/json')
+
+
+@api_bp.errorhandler(ApiError)
+def api_error(error):
+    return render({'error': error.message}, error.status)
+
+
+@api_bp.errorhandler(HTTPException)
+def http_error(error):
+    return render({'error': error.description}, error.code)
+
+
+def require_login():
+    if not current_user.is_authenticated:
+        raise ApiError('Authentication required', 401)
+
+
+def _int_list(value, name):
+    try:
+        ids = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ApiError(f'{name} must be a comma-separated list of integers')
+    if len(ids) > MAX_IDS:
+        raise ApiError(f'At most {MAX_IDS} ids per request')
+    return ids
+
+
+def _rows(statement, names):
+    """Plain dicts of the requested columns; the sort key columns are left out."""
+    return [dict(zip(names, row)) for row in db.session.execute(statement)]
+
+
+def _cursor_values(resource, cursor):
+    """Decode ``cursor`` for ``resource``'s sort order; each value must match its column's type."""
+    if not cursor:
+        return None
+    values = decode_cursor(cursor)
+    if values is None or len(values) != len(resource.order):
+        raise ApiError('Invalid cursor')
+    for column, value in zip(resource.order, values):
+        expected = column.type.python_type
+        # JSON has no separate float type for whole numbers
+        accepted = (int, float) if expected is float else expected
+        if not isinstance(value, accepted):
+            raise ApiError('Invalid cursor')
+    return values
+
+
+def collection(resource, filters=()):
+    """List endpoint body: batch fetch by ``ids`` or one keyset page."""
+    names = resource.fieldset(request.args.get('fields'))
+    statement = resource.select(names).where(*filters)
+
+    if 'ids' in request.args:
+        ids = _int_list(request.args['ids'], 'ids')
+        found = {row['id']: row for row in _rows(statement.where(resource.fields['id'].in_(ids)), names)}
+        return render({
+            'data': [found[row_id] for row_id in dict.fromkeys(ids) if row_id in found],
+            'missing': [row_id for row_id in dict.fromkeys(ids) if row_id not in found],
+        })
+
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    values = _cursor_values(resource, request.args.get('cursor'))
+    if values is not None:
+        statement = statement.where(keyset_filter(resource.order, values))
+    result = db.session.execute(
+        statement.order_by(*[column.desc() for column in resource.order]).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(result) > limit:
+        result = result[:limit]
+        next_cursor = encode_cursor(list(result[-1][len(names):]))
+    return render({
+        'data': [dict(zip(names, row)) for row in result],
+        'next_cursor': next_cursor,
+    })
+
+
+def single(resource, row_id):
+    names = resource.fieldset(request.args.get('fields'))
+    row = db.session.execute(resource.select(names).where(resource.fields['id'] == row_id)).first()
+    if row is None:
+        raise ApiError('Not found', 404)
+    return render({'data': dict(zip(names, row))})
+
+
+def _optional_int(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'{name} must be an integer')
+
+
+@api_bp.route('/jobs')
+@read_only
+def jobs():
+    """Jobs, newest first; ``location`` filters on an exact location, ``salary`` on a range like ``20k-30k``"""
+    filters = []
+    if request.args.get('location'):
+        filters.append(Job.location == request.args['location'])
+    if request.args.get('salary'):
+        wanted = parse_salary_query(request.args['salary'])
+        if wanted is None:
+            raise ApiError('salary must contain an amount, e.g. 25k or 20k-30k')
+        filters.extend(salary_criteria(Job, wanted))
+    return collection(JOBS, filters)
+
+
+@api_bp.route('/jobs/<int:job_id>')
+@read_only
+def job(job_id):
+    """One job"""
+    return single(JOBS, job_id)
+
+
+@api_bp.route('/applications')
+@read_only
+def applications():
+    """Applications, newest first; admins may filter by ``user_id``, ``job_id`` and ``status``"""
+    require_login()
+    filters = []
+    for name, column in (('user_id', Application.user_id), ('job_id', Application.job_id)):
+        value = _optional_int(name)
+        if value is not None:
+            filters.append(column == value)
+    if request.args.get('status'):
+        filters.append(Application.status == request.args['status'])
+    return collection(APPLICATIONS, filters)
+
+
+@api_bp.route('/applications/<int:application_id>')
+@read_only
+def application(application_id):
+    """One application"""
+    require_login()
+    return single(APPLICATIONS, application_id)
+
+
+@api_bp.route('/resumes')
+@read_only
+def resumes():
+    """Resumes, newest first; admins may filter by ``user_id``"""
+    require_login()
+    filters = []
+    user_id = _optional_int('user_id')
+    if user_id is not None:
+        filters.append(Resume.user_id == user_id)
+    return collection(RESUMES, filters)
+
+
+@api_bp.route('/resumes/<int:resume_id>')
+@read_only
+def resume(resume_id):
+    """One resume"""
+    require_login()
+    return single(RESUMES, resume_id)
@@ -0,0 +1,391 @@
+"""Optional ASGI server for the read-heavy public pages.
+
+    uvicorn asgi:app --workers 4
+
+``GET /``, ``GET /search``, ``GET /search/suggest`` and ``GET /job/<id>``
+are answered by async handlers that query through SQLAlchemy's asyncio engine (aiomysql for
+MySQL, aiosqlite for SQLite), so one worker keeps serving other requests
+while the database works. They share the Flask app's models, templates,
+cache, identity cache and search index, and render with the same template
+context (``current_user``, ``url_for``, CSRF token). Template rendering and
+cache reads and writes block, so they run in the threadpool.
+
+When ``DATABASE_REPLICA_URI`` is set they read from the replica.
+
+Anonymous visitors get the same validators, 304s and page cache as the
+Flask views decorated with ``public_page`` (see ``app.httpcache``).
+
+Everything else, any page request carrying pending flash messages and, with
+a replica, any request from a client that has just written (see
+``app.database``) is handed to the Flask app through a WSGI adapter, so the
+whole site is served from this one entry point. Needs the packages in
+requirements-asgi.txt.
+"""
+import re
+
+from a2wsgi import WSGIMiddleware
+from flask import g, render_template, session
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from werkzeug.http import http_date
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from app import create_app, login_manager
+from app.cache import snapshot_job
+from app.database import read_your_writes_pending
+from app.forms import JobSearchForm
+from app.httpcache import PUBLIC, etag_for, http_cache, not_modified, page_key
+from app.identity import identity_cache, detached_user
+from app.models import ContentVersion, Job, User, Application
+from app.pagination import KeysetPage, count_cache, decode_cursor, encode_cursor
+from app.search import search_engine, FullTextBackend, SEARCH_PARAMS, SORTS
+from app.facets import FACETS, FACET_LABELS, bitmap, chosen_values
+from app.suggest import DEFAULT_LIMIT, MAX_LIMIT
+from app.similarity import similar_jobs_statement
+from app.recommendations import fresh_after, recommended_jobs_statement
+from config import Config
+
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+JOB_PATH_RE = re.compile(r'^/job/(\d+)$')
+
+
+def async_database_uri(uri):
+    """The asyncio driver URL for a sync SQLAlchemy database URI."""
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    if driver is None:
+        raise ValueError(f'No asyncio driver configured for {url.drivername}; set ASYNC_DATABASE_URI')
+    return url.set(drivername=driver)
+
+
+class AsyncFrontend:
+    """ASGI application: async handlers for the public read pages, Flask for the rest."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app)
+        config = flask_app.config
+        # These pages only read, so they use the replica when one is configured
+        self.uses_replica = bool(config.get('DATABASE_REPLICA_URI'))
+        url = config.get('ASYNC_DATABASE_URI') or async_database_uri(
+            config.get('DATABASE_REPLICA_URI') or config['SQLALCHEMY_DATABASE_URI'])
+        options = {'pool_pre_ping': True}
+        if make_url(url).get_backend_name() != 'sqlite':
+            options.update(pool_size=config.get('ASYNC_DB_POOL_SIZE', 10),
+                           max_overflow=config.get('ASYNC_DB_MAX_OVERFLOW', 10))
+        self.engine = create_async_engine(url, **options)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.routes = [
+            (re.compile(r'^/$'), self.index),
+            (re.compile(r'^/search$'), self.search),
+            (re.compile(r'^/search/suggest$'), self.suggest),
+            (JOB_PATH_RE, self.job_details),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, handler in self.routes:
+                match = pattern.match(scope['path'])
+                if match:
+                    response = await handler(Request(scope, receive), *match.groups())
+                    if response is not None:
+                        return await response(scope, receive, send)
+                    break
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Build the in-process search index before taking traffic
+                await run_in_threadpool(self._in_app, search_engine.warm)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _in_app(self, func, *args):
+        with self.flask_app.app_context():
+            return func(*args)
+
+    # Flask request context, identity and rendering
+
+    def _request_context(self, request):
+        headers = [(key, value) for key, value in request.headers.items() if key.lower() != 'host']
+        return self.flask_app.test_request_context(
+            request.url.path,
+            base_url=f'{request.url.scheme}://{request.url.netloc}',
+            query_string=request.url.query,
+            headers=headers,
+        )
+
+    def _session_user(self, request):
+        """Return (user id or None, whether Flask must handle the request)."""
+        with self._request_context(request):
+            # Clients that just wrote read from the primary, through Flask
+            delegate = '_flashes' in session or (self.uses_replica and read_your_writes_pending())
+            return session.get('_user_id'), delegate
+
+    async def _current_user(self, user_id):
+        if user_id is None:
+            return None
+        found, entry = await run_in_threadpool(self._in_app, identity_cache.lookup, user_id)
+        if found:
+            fields, counts = entry
+            user = detached_user(fields)
+        else:
+            versions = await run_in_threadpool(self._in_app, identity_cache.versions, user_id)
+            async with self.sessions() as db_session:
+                user = await db_session.get(User, int(user_id))
+                if user is None:
+                    return None
+                counts = {'applications': await db_session.scalar(
+                    select(func.count(Application.id)).where(Application.user_id == user.id))}
+            await run_in_threadpool(self._in_app, identity_cache.store, user, counts, versions)
+        user.badge_counts = counts
+        return user
+
+    def _render(self, request, user, template, context_factory=None, **context):
+        """Render a template as the Flask view would; ``context_factory`` runs inside the request context.
+
+        Blocking (Jinja, cache reads for fragments): handlers call it through ``run_in_threadpool``.
+        """
+        with self._request_context(request):
+            g._login_user = user if user is not None else login_manager.anonymous_user()
+            if context_factory is not None:
+                context.update(context_factory())
+            body = render_template(template, **context)
+            flask_response = self.flask_app.make_response(body)
+            self.flask_app.session_interface.save_session(self.flask_app, session._get_current_object(),
+                                                          flask_response)
+        response = Response(flask_response.get_data(), status_code=flask_response.status_code)
+        for key, value in flask_response.headers.items():
+            if key.lower() != 'content-length':
+                response.headers.append(key, value)
+        return response
+
+    async def _cached(self, key, compute, tags):
+        """Async ``cache.get_or_set`` over the Flask app's cache backend; its I/O runs in the threadpool."""
+        backend = self.flask_app.extensions['cache']
+        config = self.flask_app.config
+        found, value = await run_in_threadpool(backend.get, key)
+        if not found:
+            versions = await run_in_threadpool(backend.tag_versions, tags)
+            value = await compute()
+            # The replica may not have a write that just invalidated these tags yet;
+            # serve what it has but leave the entry for a refill once it has caught up
+            if not (self.uses_replica and await run_in_threadpool(
+                    backend.invalidated_within, tags, config['DB_READ_YOUR_WRITES_SECONDS'])):
+                await run_in_threadpool(backend.set, key, value, config['CACHE_DEFAULT_TTL'], tuple(tags), versions)
+        return value
+
+    async def _content_version(self):
+        async with self.sessions() as db_session:
+            row = (await db_session.execute(
+                select(ContentVersion.version, ContentVersion.updated_at).where(ContentVersion.name == PUBLIC))).first()
+        version, modified = tuple(row) if row is not None else (0, None)
+        # May invalidate the shared cache
+        await run_in_threadpool(self._in_app, http_cache.observe, version)
+        return version, modified
+
+    async def _public_page(self, request, user_id, render, exists=None):
+        """``httpcache.public_page`` for an async handler; ``render`` and ``exists`` are awaited."""
+        config = self.flask_app.config
+        if user_id is not None or not config['HTTP_CACHE_ENABLED']:
+            response = await render()
+            if response is not None:
+                response.headers['Cache-Control'] = 'private, no-cache'
+                response.headers['Vary'] = 'Cookie'
+            return response
+
+        version, modified = await self._content_version()
+        etag = self._in_app(etag_for, version)
+        environ = {'REQUEST_METHOD': request.method}
+        for header in ('If-None-Match', 'If-Modified-Since'):
+            if header in request.headers:
+                environ['HTTP_' + header.upper().replace('-', '_')] = request.headers[header]
+        if not_modified(environ, etag, modified) and (exists is None or await exists()):
+            response = Response(status_code=304)
+        else:
+            backend = self.flask_app.extensions['cache']
+            key = page_key(f'{request.url.path}?{request.url.query}', etag)
+            found, body = await run_in_threadpool(backend.get, key)
+            if found:
+                response = Response(body, media_type='text/html; charset=utf-8')
+            else:
+                response = await render()
+                if response is None:
+                    return None
+                if response.status_code == 200:
+                    await run_in_threadpool(backend.set, key, response.body, config['HTTP_CACHE_PAGE_TTL'],
+                                            ('pages', 'jobs'))
+        if response.status_code in (200, 304):
+            response.headers['ETag'] = f'W/"{etag}"'
+            if modified is not None:
+                response.headers['Last-Modified'] = http_date(modified)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Vary'] = 'Cookie'
+        return response
+
+    # Handlers; returning None passes the request to Flask
+
+    async def index(self, request):
+        user_id, delegate = self._session_user(request)
+        if delegate:
+            return None
+
+        async def latest_jobs():
+            async with self.sessions() as db_session:
+                jobs = await db_session.scalars(
+                    select(Job).options(joinedload(Job.poster_user)).order_by(Job.created_at.desc()).limit(10))
+                return [snapshot_job(job) for job in jobs]
+
+        async def render():
+            jobs = await self._cached('index:latest_jobs', latest_jobs, ('jobs',))
+            recommended = []
+            if user_id is not None:
+                statement = self._in_app(lambda: recommended_jobs_statement(
+                    int(user_id), fresh_after(), self.flask_app.config['RECOMMENDATIONS_TOP_K']))
+                async with self.sessions() as db_session:
+                    recommended = (await db_session.scalars(statement)).all()
+            return await run_in_threadpool(self._render, request, await self._current_user(user_id), 'home.html',
+                                           jobs=jobs, recommended=recommended)
+
+        return await self._public_page(request, user_id, render)
+
+    async def search(self, request):
+        user_id, delegate = self._session_user(request)
+        if delegate:
+            return None
+        jobs, pagination, search_args = [], None, {}
+        chosen = chosen_values(request.query_params)
+        if any(request.query_params.get(field) for field in SEARCH_PARAMS + FACETS):
+            search_args = {field: request.query_params.get(field, '') for field in SEARCH_PARAMS}
+            pagination = await self._search(request.query_params.get('cursor'), chosen=chosen, **search_args)
+            jobs = pagination.items
+        facets = await self._facet_counts(search_args.get('title'), search_args.get('location'),
+                                          search_args.get('salary'), chosen)
+        search_args.update(chosen)
+        return await run_in_threadpool(self._render, request, await self._current_user(user_id), 'search.html',
+                                       context_factory=lambda: {'form': JobSearchForm()}, jobs=jobs,
+                                       pagination=pagination, search_args=search_args, facets=facets,
+                                       facet_labels=FACET_LABELS)
+
+    async def _facet_counts(self, title, location, salary, chosen):
+        await self._sync_indexes()
+        backend = self._in_app(lambda: search_engine.backend)
+        matching = None
+        if title or location or salary:
+            if isinstance(backend, FullTextBackend):
+                _, criteria, _ = backend.criteria(title, location, salary)
+                async with self.sessions() as db_session:
+                    ids = (await db_session.scalars(select(Job.id).where(*criteria))).all()
+            else:
+                ids = await run_in_threadpool(self._in_app, backend.matching_ids, title, location, salary)
+            matching = bitmap(ids)
+        limit = self.flask_app.config['SEARCH_FACET_LIMIT']
+        return await run_in_threadpool(self._in_app, lambda: search_engine.facets.counts(matching, chosen, limit))
+
+    async def _sync_indexes(self):
+        """``search_engine.sync`` in the threadpool when it is due to query the database."""
+        if self._in_app(search_engine.sync_due):
+            await run_in_threadpool(self._in_app, search_engine.sync)
+
+    async def _search(self, cursor, title, location, salary, sort='', chosen=None):
+        await self._sync_indexes()
+        per_page = self.flask_app.config['SEARCH_RESULTS_PER_PAGE']
+        after = decode_cursor(cursor)
+        sort = sort if sort in SORTS else ''
+        backend = self._in_app(lambda: search_engine.backend)
+        selection = await run_in_threadpool(self._in_app, lambda: search_engine.facets.selection(chosen))
+        async with self.sessions() as db_session:
+            if isinstance(backend, FullTextBackend):
+                columns, criteria, count_key = backend.criteria(title, location, salary, sort, selection)
+                statement = select(*columns).where(*criteria)
+                found, total = count_cache.lookup(count_key)
+                if not found:
+                    total = await db_session.scalar(select(func.count()).select_from(statement.subquery()))
+                    count_cache.store(count_key, total)
+                rows = (await db_session.execute(backend.page_statement(statement, columns, after, per_page))).all()
+                ids, next_key = backend.split_page(rows, per_page)
+            else:
+                # In-memory index: no I/O once warm, but keep the CPU work off the event loop
+                ids, next_key, total = await run_in_threadpool(
+                    self._in_app, backend.search, title, location, salary, after, per_page, sort, selection)
+            jobs = []
+            if ids:
+                rows = {job.id: job for job in await db_session.scalars(select(Job).where(Job.id.in_(ids)))}
+                jobs = [rows[job_id] for job_id in ids if job_id in rows]
+        next_cursor = encode_cursor(next_key) if next_key is not None else None
+        return KeysetPage(jobs, next_cursor, total, per_page, cursor=cursor if after is not None else None)
+
+    async def suggest(self, request):
+        params = request.query_params
+        try:
+            limit = max(1, min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        args = (params.get('field', 'title'), params.get('q', ''), limit)
+        await self._sync_indexes()
+        suggestions = self._in_app(lambda: search_engine.suggestions)
+        if suggestions.loaded:
+            # Memory only: answered on the event loop
+            found = suggestions.suggest(*args)
+        else:
+            found = await run_in_threadpool(self._in_app, suggestions.suggest, *args)
+        return JSONResponse([{'text': text, 'jobs': count} for text, count in found],
+                            headers={'Cache-Control': 'public, max-age=60'})
+
+    async def job_details(self, request, job_id):
+        job_id = int(job_id)
+        user_id, delegate = self._session_user(request)
+        if delegate:
+            return None
+
+        async def load():
+            async with self.sessions() as db_session:
+                job = (await db_session.scalars(
+                    select(Job).options(joinedload(Job.poster_user)).where(Job.id == job_id))).first()
+                if job is None:
+                    return None
+                similar_jobs = (await db_session.scalars(similar_jobs_statement(job_id, limit=3))).unique().all()
+                return snapshot_job(job), [snapshot_job(similar_job) for similar_job in similar_jobs]
+
+        async def render():
+            cached = await self._cached(f'job:{job_id}', load, ('jobs', f'job:{job_id}'))
+            if cached is None:
+                # Flask renders the 404 page
+                return None
+            job, similar_jobs = cached
+            user = await self._current_user(user_id)
+            applied = False
+            if user is not None:
+                async with self.sessions() as db_session:
+                    applied = await db_session.scalar(
+                        select(Application.id).where(Application.user_id == user.id, Application.job_id == job_id)
+                        .limit(1)) is not None
+            return await run_in_threadpool(self._render, request, user, 'job_details.html', job=job,
+                                           similar_jobs=similar_jobs, applied=applied)
+
+        async def exists():
+            async with self.sessions() as db_session:
+                return await db_session.scalar(select(Job.id).where(Job.id == job_id)) is not None
+
+        return await self._public_page(request, user_id, render, exists)
+
+
+def create_asgi_app(config_class=Config):
+    return AsyncFrontend(create_app(config_class))
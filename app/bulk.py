@@ -0,0 +1,248 @@
+"""Bulk job import and streaming export of jobs and applications.
+
+Import reads CSV (with a header row) or NDJSON one row at a time, so a file
+of any size is parsed in constant memory. Each row is validated by
+``JobForm``, the same rules as ``admin.create_job``, and valid rows are
+inserted ``IMPORT_BATCH_SIZE`` at a time with one executemany INSERT and one
+transaction per batch, along with their dashboard counts. Invalid rows are skipped and reported with
+their line number and field errors. Columns other than the form's fields
+(``id``, ``created_at`` from an export) are ignored. Each batch logs the
+ids it inserted in ``job_changes``, so the in-process search indexes of the
+web workers pick the rows up as well (``flask bulk import-jobs`` runs in a
+process of its own). After the import the similar-jobs index is rebuilt by
+a queued task.
+
+    flask bulk import-jobs jobs.csv --posted-by admin@example.com
+    flask bulk export jobs --format ndjson -o jobs.ndjson
+
+Export reads the table in primary-key order in batches of plain rows and
+yields each batch as soon as it is formatted. The admin pages use the same
+generators for a file upload form and for chunked downloads.
+"""
+import codecs
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, insert, select
+from werkzeug.datastructures import MultiDict
+
+from app import db, similarity, stats
+from app.cache import cache
+from app.forms import JobForm
+from app.httpcache import touch
+from app.models import User, Job, Application
+from app.salary import salary_columns
+from app.search import INDEXED_FIELDS, search_engine
+
+FORMATS = ('csv', 'ndjson')
+
+JOB_FIELDS = ('title', 'description', 'requirements', 'location', 'salary', 'contact_info')
+
+EXPORTS = {
+    'jobs': (Job, ('id', 'title', 'description', 'requirements', 'location', 'salary', 'salary_currency',
+                   'salary_min', 'salary_max', 'contact_info', 'posted_by', 'created_at', 'updated_at')),
+    'applications': (Application, ('id', 'user_id', 'job_id', 'resume_id', 'status', 'created_at',
+                                   'updated_at')),
+}
+
+
+def format_for(filename, default='csv'):
+    """Guess the format from a file name."""
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict or None, error) for each row of a binary stream."""
+    text = codecs.getreader('utf-8-sig')(stream, errors='replace')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as error:
+                yield reader.line_num, None, f'Unreadable CSV: {error}'
+                return
+            yield reader.line_num, row, None
+    else:
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, None, f'Invalid JSON: {error}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Each line must be a JSON object'
+                continue
+            yield line_number, row, None
+
+
+def validate_job(row):
+    """Return (job field values, None) if ``row`` passes ``JobForm``, else (None, {field: [errors]})."""
+    formdata = MultiDict({field: '' if row.get(field) is None else str(row[field]) for field in JOB_FIELDS})
+    form = JobForm(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, {field: errors for field, errors in form.errors.items() if field in JOB_FIELDS}
+    return {field: form[field].data for field in JOB_FIELDS}, None
+
+
+class ImportResult:
+    """Counts and per-row errors of one import."""
+
+    # Errors kept for the report; the count includes the rest
+    MAX_ERRORS = 1000
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({'line': line, 'errors': message})
+
+
+def _insert_batch(batch, posted_by):
+    # One executemany INSERT; ORM objects would need a round trip each to learn their ids.
+    # Core skips Job's salary validator, so the structured columns are added here.
+    now = datetime.utcnow()
+    rows = [dict(values, posted_by=posted_by, created_at=now, updated_at=now, **salary_columns(values['salary']))
+            for values in batch]
+    if db.engine.dialect.insert_executemany_returning:
+        job_ids = db.session.scalars(insert(Job).returning(Job.id), rows).all()
+    else:
+        # MySQL has no RETURNING: this poster's rows past the highest id before the insert.
+        # Another import by the same poster may interleave; indexing its rows too is harmless
+        highest = db.session.scalar(select(func.max(Job.id))) or 0
+        db.session.execute(insert(Job), rows)
+        job_ids = db.session.scalars(select(Job.id).where(Job.id > highest, Job.posted_by == posted_by)).all()
+    stats.bump(stats.JOBS, now, len(batch))
+    # Other workers' in-process indexes replay these ids from job_changes
+    touch(job_ids=job_ids)
+    db.session.commit()
+    search_engine.index_jobs(db.session.execute(select(Job.id, *[getattr(Job, field) for field in INDEXED_FIELDS])
+                                                .where(Job.id.in_(job_ids))))
+
+
+def import_jobs(stream, fmt, posted_by=None, batch_size=None, dry_run=False, on_batch=None):
+    """Validate and insert the jobs in ``stream``; return an ``ImportResult``."""
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 500)
+    result = ImportResult()
+    batch = []
+    for line, row, error in read_rows(stream, fmt):
+        if error is None:
+            values, error = validate_job(row)
+        if error is not None:
+            result.error(line, error)
+            continue
+        result.imported += 1
+        if dry_run:
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            _insert_batch(batch, posted_by)
+            batch = []
+            if on_batch is not None:
+                on_batch(result)
+    if batch:
+        _insert_batch(batch, posted_by)
+    if result.imported and not dry_run:
+        similarity.schedule_rebuild()
+        db.session.commit()
+        cache.invalidate('jobs')
+    return result
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_rows(table, batch_size=None):
+    """Yield batches of row tuples of an export table in primary-key order."""
+    batch_size = batch_size or current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    model, fields = EXPORTS[table]
+    columns = [getattr(model, field) for field in fields]
+    last_id = None
+    while True:
+        statement = select(*columns).order_by(model.id).limit(batch_size)
+        if last_id is not None:
+            statement = statement.where(model.id > last_id)
+        rows = db.session.execute(statement).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def export(table, fmt, batch_size=None):
+    """Yield an export of ``table`` as text chunks, one per batch of rows."""
+    _, fields = EXPORTS[table]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(fields)
+    for rows in export_rows(table, batch_size):
+        if fmt == 'csv':
+            writer.writerows([[_value(value) for value in row] for row in rows])
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(fields, map(_value, row)))))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+bulk_cli = AppGroup('bulk', help='Bulk job import and data export.')
+
+
+@bulk_cli.command('import-jobs')
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+              help='Defaults to the file extension, else csv.')
+@click.option('--posted-by', default=None, help='Email of the admin the jobs are posted by.')
+@click.option('--batch-size', type=int, default=None)
+@click.option('--dry-run', is_flag=True, help='Only validate.')
+def import_jobs_command(source, fmt, posted_by, batch_size, dry_run):
+    """Import jobs from a CSV or NDJSON file ('-' for stdin)."""
+    poster_id = None
+    if posted_by:
+        poster_id = db.session.scalar(select(User.id).where(User.email == posted_by))
+        if poster_id is None:
+            raise click.BadParameter(f'No user with email {posted_by}', param_hint='--posted-by')
+
+    def progress(result):
+        click.echo(f'  {result.imported} imported, {result.failed} rejected', err=True)
+    result = import_jobs(source, fmt or format_for(source.name), poster_id, batch_size, dry_run, progress)
+    for entry in result.errors:
+        click.echo(f'line {entry["line"]}: {json.dumps(entry["errors"])}', err=True)
+    verb = 'Valid' if dry_run else 'Imported'
+    click.echo(f'{verb}: {result.imported} jobs; rejected: {result.failed} rows.')
+    if result.failed:
+        sys.exit(1)
+
+
+@bulk_cli.command('export')
+@click.argument('table', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('-o', '--output', type=click.File('w'), default='-')
+def export_command(table, fmt, output):
+    """Stream TABLE to a file or stdout."""
+    for chunk in export(table, fmt):
+        output.write(chunk)
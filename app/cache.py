@@ -0,0 +1,423 @@
+"""Cross-request cache for hot read paths.
+
+Entries carry tags; write paths call ``cache.invalidate(tag)`` after they
+commit so readers never see data older than the last write. Backends:
+
+* ``sqlite`` - a local SQLite file shared by every gunicorn worker on a host
+  (default), so an invalidation reaches all of them at once.
+* ``memory`` - per-process LRU with TTL. An invalidation only drops entries
+  in the worker that made the write; the others fall back to the TTL.
+* ``null``   - caching disabled.
+
+Each tag also carries a version that every invalidation bumps. ``get_or_set``
+reads the versions of its tags before computing and the backend refuses the
+``set`` if any of them moved meanwhile, so a value computed from data that a
+concurrent write has since replaced is never stored.
+
+Backends remember when each tag was last invalidated. With a read replica,
+a miss on an entry invalidated less than ``DB_READ_YOUR_WRITES_SECONDS`` ago
+is recomputed from the primary: the replica may not have the write yet, and
+the stale refill would otherwise be cached for the whole TTL.
+
+Only plain data should be cached: use ``snapshot`` rather than storing ORM
+instances, which are bound to the session that loaded them.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from flask import current_app
+
+from app.database import primary_reads, reading_from_replica
+
+
+def snapshot(obj, fields, **extra):
+    """Copy ``fields`` off an ORM object into a picklable, session-free namespace."""
+    if obj is None:
+        return None
+    values = {field: getattr(obj, field) for field in fields}
+    values.update(extra)
+    return SimpleNamespace(**values)
+
+
+JOB_FIELDS = ('id', 'title', 'description', 'requirements', 'location', 'salary',
+              'contact_info', 'created_at', 'updated_at', 'posted_by')
+
+
+def snapshot_job(job):
+    """Job snapshot carrying everything the job templates read."""
+    return snapshot(job, JOB_FIELDS, poster_user=snapshot(job.poster_user, ('id', 'username')))
+
+
+# Seconds a tag's version and last invalidation time are kept, longer than any replica lag
+# worth waiting out or any computation a version check has to span
+INVALIDATIONS_KEPT = 3600
+
+
+class CacheStats:
+    """Hit/miss/eviction counters for one backend in one process."""
+
+    FIELDS = ('hits', 'misses', 'sets', 'stale_sets', 'evictions', 'expirations', 'invalidations')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+class NullBackend:
+    name = 'null'
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def get(self, key):
+        self.stats.incr('misses')
+        return False, None
+
+    def set(self, key, value, ttl, tags, versions=None):
+        return False
+
+    def tag_versions(self, tags):
+        return ()
+
+    def invalidate(self, tag):
+        pass
+
+    def invalidated_within(self, tags, seconds):
+        return False
+
+    def clear(self):
+        pass
+
+    def size(self):
+        return 0
+
+
+class MemoryBackend:
+    """Thread-safe LRU with per-entry expiry and a tag -> keys index."""
+
+    name = 'memory'
+
+    def __init__(self, stats, max_entries=1024):
+        self.stats = stats
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires, value, tags)
+        self._tags = {}  # tag -> set(keys)
+        self._versions = {}  # tag -> (version, time.time() of the last invalidation)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.incr('misses')
+                return False, None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                self.stats.incr('expirations')
+                self.stats.incr('misses')
+                return False, None
+            self._entries.move_to_end(key)
+        self.stats.incr('hits')
+        return True, entry[1]
+
+    def set(self, key, value, ttl, tags, versions=None):
+        """Store ``value``, unless ``versions`` no longer match the tags' current versions."""
+        with self._lock:
+            if versions is not None and self._current_versions(tags) != tuple(versions):
+                self.stats.incr('stale_sets')
+                return False
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats.incr('evictions')
+        self.stats.incr('sets')
+        return True
+
+    def _current_versions(self, tags):
+        return tuple(self._versions.get(tag, (0, 0))[0] for tag in tags)
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return self._current_versions(tags)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tag):
+        now = time.time()
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            self._versions[tag] = (self._versions.get(tag, (0, 0))[0] + 1, now)
+            if len(self._versions) > self.max_entries:
+                self._versions = {tag: entry for tag, entry in self._versions.items()
+                                  if entry[1] > now - INVALIDATIONS_KEPT}
+        self.stats.incr('invalidations', len(keys))
+
+    def invalidated_within(self, tags, seconds):
+        """True if any of ``tags`` was invalidated in the last ``seconds``."""
+        since = time.time() - seconds
+        with self._lock:
+            return any(self._versions.get(tag, (0, 0))[1] > since for tag in tags)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Cache stored in a local SQLite file so all workers on a host share it."""
+
+    name = 'sqlite'
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cache_entries ('
+        ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS cache_tags ('
+        ' tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))',
+        'CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key)',
+        'CREATE INDEX IF NOT EXISTS ix_cache_entries_expires ON cache_entries (expires)',
+        'CREATE TABLE IF NOT EXISTS cache_tag_versions ('
+        ' tag TEXT PRIMARY KEY, version INTEGER NOT NULL, at REAL NOT NULL)',
+        # Superseded by cache_tag_versions
+        'DROP TABLE IF EXISTS cache_invalidations',
+    )
+
+    # Check the entry limit once every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, stats, path, max_entries=10000):
+        self.stats = stats
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            # Connections must not cross a gunicorn fork
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction holding the file's write lock from the start."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, expires FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            self.stats.incr('misses')
+            return False, None
+        if row[1] <= time.time():
+            self._delete_keys([key])
+            self.stats.incr('expirations')
+            self.stats.incr('misses')
+            return False, None
+        self.stats.incr('hits')
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, ttl, tags, versions=None):
+        """Store ``value``, unless ``versions`` no longer match the tags' current versions."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._transaction() as conn:
+            # Checked under the write lock, so no invalidation can land between check and insert
+            if versions is not None and self._current_versions(conn, tags) != tuple(versions):
+                stale = True
+            else:
+                stale = False
+                conn.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+                conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)',
+                             (key, blob, time.time() + ttl))
+                conn.executemany('INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)',
+                                 [(tag, key) for tag in tags])
+        if stale:
+            self.stats.incr('stale_sets')
+            return False
+        self.stats.incr('sets')
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune()
+        return True
+
+    @staticmethod
+    def _current_versions(conn, tags):
+        tags = list(tags)
+        if not tags:
+            return ()
+        placeholders = ', '.join('?' * len(tags))
+        versions = dict(conn.execute(
+            f'SELECT tag, version FROM cache_tag_versions WHERE tag IN ({placeholders})', tags))
+        return tuple(versions.get(tag, 0) for tag in tags)
+
+    def tag_versions(self, tags):
+        return self._current_versions(self._connect(), tags)
+
+    def _delete_keys(self, keys, conn=None):
+        if not keys:
+            return
+        if conn is None:
+            with self._transaction() as conn:
+                self._delete_keys(keys, conn)
+            return
+        conn.executemany('DELETE FROM cache_entries WHERE key = ?', [(key,) for key in keys])
+        conn.executemany('DELETE FROM cache_tags WHERE key = ?', [(key,) for key in keys])
+
+    def _prune(self):
+        conn = self._connect()
+        expired = [row[0] for row in conn.execute(
+            'SELECT key FROM cache_entries WHERE expires <= ?', (time.time(),))]
+        self._delete_keys(expired)
+        self.stats.incr('expirations', len(expired))
+        conn.execute('DELETE FROM cache_tag_versions WHERE at <= ?', (time.time() - INVALIDATIONS_KEPT,))
+        excess = self.size() - self.max_entries
+        if excess > 0:
+            # Entries closest to expiry go first
+            keys = [row[0] for row in conn.execute(
+                'SELECT key FROM cache_entries ORDER BY expires LIMIT ?', (excess,))]
+            self._delete_keys(keys)
+            self.stats.incr('evictions', len(keys))
+
+    def invalidate(self, tag):
+        # One transaction: a reader sees either the old entries and version or neither
+        with self._transaction() as conn:
+            keys = [row[0] for row in conn.execute('SELECT key FROM cache_tags WHERE tag = ?', (tag,))]
+            self._delete_keys(keys, conn)
+            conn.execute('INSERT INTO cache_tag_versions (tag, version, at) VALUES (?, 1, ?)'
+                         ' ON CONFLICT (tag) DO UPDATE SET version = version + 1, at = excluded.at',
+                         (tag, time.time()))
+        self.stats.incr('invalidations', len(keys))
+
+    def invalidated_within(self, tags, seconds):
+        """True if any of ``tags`` was invalidated in the last ``seconds``, by any worker."""
+        tags = list(tags)
+        if not tags:
+            return False
+        placeholders = ', '.join('?' * len(tags))
+        return self._connect().execute(
+            f'SELECT 1 FROM cache_tag_versions WHERE tag IN ({placeholders}) AND at > ? LIMIT 1',
+            tags + [time.time() - seconds]).fetchone() is not None
+
+    def clear(self):
+        # Tag versions stay: a computation that read them before the clear is still checked
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM cache_entries')
+            conn.execute('DELETE FROM cache_tags')
+
+    def size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+
+
+class Cache:
+    """Flask extension exposing tag-invalidated ``get_or_set`` over a configurable backend."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'sqlite')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_SQLITE_PATH', os.path.join(app.instance_path, 'cache.sqlite'))
+
+        stats = CacheStats()
+        choice = app.config['CACHE_BACKEND']
+        if choice == 'sqlite':
+            backend = SQLiteBackend(stats, app.config['CACHE_SQLITE_PATH'], app.config['CACHE_MAX_ENTRIES'])
+        elif choice == 'memory':
+            backend = MemoryBackend(stats, app.config['CACHE_MAX_ENTRIES'])
+        else:
+            backend = NullBackend(stats)
+        app.extensions['cache'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['cache']
+
+    def get_or_set(self, key, compute, tags=(), ttl=None):
+        """Return the cached value for ``key`` or store and return ``compute()``."""
+        backend = self.backend
+        tags = tuple(tags)
+        found, value = backend.get(key)
+        if found:
+            return value
+        # Read before computing: an invalidation from here on makes the set below a no-op
+        versions = backend.tag_versions(tags)
+        if tags and reading_from_replica() \
+                and backend.invalidated_within(tags, current_app.config['DB_READ_YOUR_WRITES_SECONDS']):
+            with primary_reads():
+                value = compute()
+        else:
+            value = compute()
+        backend.set(key, value, ttl or current_app.config['CACHE_DEFAULT_TTL'], tags, versions)
+        return value
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of ``tags``."""
+        backend = self.backend
+        for tag in tags:
+            backend.invalidate(tag)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        backend = self.backend
+        values = backend.stats.as_dict()
+        values.update(backend=backend.name, size=backend.size())
+        return values
+
+
+cache = Cache()
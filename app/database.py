@@ -0,0 +1,295 @@
+"""Database connections: engine options, pool sizing, read/write splitting and pool metrics.
+
+Everything comes from the environment (see ``Config``):
+
+* ``SQLALCHEMY_DATABASE_URI`` - the primary, as set by docker-compose.
+* ``DATABASE_REPLICA_URI`` - optional read replica, added as the ``replica``
+  bind. Without one every statement goes to the primary.
+* Pool size: each gunicorn worker process has its own pool, so the
+  connection budget ``DB_MAX_CONNECTIONS`` is divided by ``WEB_CONCURRENCY``
+  (gunicorn's worker count). A worker keeps ``WEB_THREADS + 1`` connections
+  open and may open the rest of its share as overflow under bursts.
+  ``DB_POOL_SIZE`` / ``DB_MAX_OVERFLOW`` override the derived values.
+* ``DB_POOL_PRE_PING`` tests connections on checkout and ``DB_POOL_RECYCLE``
+  replaces them before MySQL's ``wait_timeout`` (or a proxy) drops them.
+
+Read/write splitting: views decorated with ``read_only`` answer GET requests
+from the replica. The routing session pins the request to the primary as soon
+as it flushes or executes anything but a SELECT, so a view that does write
+reads its own changes. A request that wrote also sets a short-lived cookie;
+until it expires (``DB_READ_YOUR_WRITES_SECONDS``, longer than the replica's
+usual lag) that client's reads stay on the primary, so the page it is
+redirected to shows what it just saved. ``check_replica_routing.py`` checks
+all of this against two SQLite files.
+
+Pools are ``InstrumentedQueuePool``: checkout wait time, timeouts and
+overflow connections are counted per process and exported by
+``/admin/metrics``.
+"""
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+REPLICA = 'replica'
+PRIMARY = 'primary'
+
+# Cookie holding the time until which a client that wrote reads from the primary
+READ_YOUR_WRITES_COOKIE = 'db_primary_until'
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolStats:
+    """Checkout counters for one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.buckets = [0] * len(WAIT_BUCKETS)
+        self.timeouts = 0
+        self.overflow_opened = 0
+
+    def record(self, seconds, overflowed=False, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.overflow_opened += overflowed
+            self.wait_time += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_time': self.wait_time,
+                'max_wait': self.max_wait,
+                'buckets': list(self.buckets),
+                'timeouts': self.timeouts,
+                'overflow_opened': self.overflow_opened,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """``QueuePool`` that times how long each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow = self._overflow
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        # A new connection beyond pool_size was opened for this checkout
+        self.stats.record(time.perf_counter() - started, overflowed=self._overflow > max(overflow, 0))
+        return record
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def pool_sizing(config):
+    """Return (pool_size, max_overflow) for one worker process."""
+    workers = max(1, config['WEB_CONCURRENCY'])
+    threads = max(1, config['WEB_THREADS'])
+    per_worker = max(1, config['DB_MAX_CONNECTIONS'] // workers)
+    pool_size = config['DB_POOL_SIZE']
+    if pool_size is None:
+        pool_size = min(threads + 1, per_worker)
+    max_overflow = config['DB_MAX_OVERFLOW']
+    if max_overflow is None:
+        max_overflow = max(0, per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def engine_options(config, uri):
+    """SQLAlchemy engine options for ``uri`` under this configuration."""
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    # In-memory SQLite keeps its single shared connection (Flask-SQLAlchemy's StaticPool)
+    if not _is_memory_sqlite(make_url(uri)):
+        pool_size, max_overflow = pool_sizing(config)
+        options.update(poolclass=InstrumentedQueuePool, pool_size=pool_size, max_overflow=max_overflow,
+                       pool_timeout=config['DB_POOL_TIMEOUT'])
+    return options
+
+
+def read_only(view):
+    """Mark a view as only reading: its GET requests may be answered from the replica."""
+    view.reads_from_replica = True
+    return view
+
+
+def use_replica():
+    """Answer this request's reads from the replica, if one is configured."""
+    if g.get('_db_route') != PRIMARY:
+        g._db_route = REPLICA
+
+
+def reading_from_replica():
+    """True if this request's reads currently go to the replica."""
+    return has_request_context() and g.get('_db_route') == REPLICA
+
+
+@contextmanager
+def primary_reads():
+    """Send the reads inside the block to the primary, e.g. to refill data a write just changed."""
+    if not reading_from_replica():
+        yield
+        return
+    g._db_route = PRIMARY
+    try:
+        yield
+    finally:
+        # A write inside the block pins the rest of the request to the primary
+        if not g.get('_db_wrote'):
+            g._db_route = REPLICA
+
+
+def _is_write(clause):
+    if clause is None or getattr(clause, 'is_select', False):
+        return False
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(('SELECT', 'WITH'))
+    return True
+
+
+def read_your_writes_pending():
+    """True while the current client must read from the primary after a write."""
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class RoutingSession(Session):
+    """Session that sends a read-only request's SELECTs to the replica bind.
+
+    The first write (a flush, or a statement that is not a SELECT) pins the
+    rest of the request to the primary and marks it as having written.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or _is_write(clause):
+                g._db_route = PRIMARY
+                g._db_wrote = True
+            elif g.get('_db_route') == REPLICA:
+                engine = self._db.engines.get(REPLICA)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# Engines that have opened a connection in this process
+_engines = weakref.WeakSet()
+
+
+@event.listens_for(Engine, 'engine_connect')
+def _track_engine(connection):
+    _engines.add(connection.engine)
+
+
+def _reset_pools():
+    """A pool inherited through fork (gunicorn --preload) shares its sockets
+    with the parent: give each child fresh connections."""
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools)
+
+
+class Database:
+    """Flask extension configuring engines; ``init_app`` must run before ``db.init_app``."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DATABASE_REPLICA_URI', None)
+        app.config.setdefault('WEB_CONCURRENCY', 1)
+        app.config.setdefault('WEB_THREADS', 1)
+        app.config.setdefault('DB_MAX_CONNECTIONS', 100)
+        app.config.setdefault('DB_POOL_SIZE', None)
+        app.config.setdefault('DB_MAX_OVERFLOW', None)
+        app.config.setdefault('DB_POOL_TIMEOUT', 10)
+        app.config.setdefault('DB_POOL_RECYCLE', 1800)
+        app.config.setdefault('DB_POOL_PRE_PING', True)
+        app.config.setdefault('DB_READ_YOUR_WRITES_SECONDS', 5)
+
+        config = app.config
+        options = engine_options(config, config['SQLALCHEMY_DATABASE_URI'])
+        options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+        replica = config['DATABASE_REPLICA_URI']
+        if replica:
+            binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+            binds.setdefault(REPLICA, dict(engine_options(config, replica), url=replica))
+            config['SQLALCHEMY_BINDS'] = binds
+            app.before_request(self._route_request)
+            app.after_request(self._remember_write)
+
+
+    def _route_request(self):
+        view = current_app.view_functions.get(request.endpoint)
+        if request.method in ('GET', 'HEAD') and getattr(view, 'reads_from_replica', False) \
+                and not read_your_writes_pending():
+            use_replica()
+
+    def _remember_write(self, response):
+        if g.get('_db_wrote'):
+            seconds = current_app.config['DB_READ_YOUR_WRITES_SECONDS']
+            response.set_cookie(READ_YOUR_WRITES_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def pool_status(self):
+        """Return {bind name: pool gauges and checkout counters} for this process."""
+        from app import db
+        pools = {}
+        for key, engine in db.engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            status = {
+                'size': pool.size(),
+                'max_overflow': pool._max_overflow,
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(0, pool.overflow()),
+            }
+            if isinstance(pool, InstrumentedQueuePool):
+                status.update(pool.stats.as_dict())
+            pools[key or 'default'] = status
+        return pools
+
+
+database = Database()
@@ -0,0 +1,229 @@
+"""Chunked cascade deletes with soft delete and background purge.
+
+Deleting a job or a user used to remove every row that points at it in one
+statement and one transaction, holding row locks (and undo) for as long as a
+popular job's applications took to go. Instead:
+
+* ``soft_delete(row)`` stamps ``deleted_at`` and queues ``deletion.purge``;
+  the view commits and returns at once. ORM SELECTs stop seeing the row
+  straight away, and also the rows that reference it (a deleted job's
+  applications, a deleted user's resumes), through the session-wide
+  criteria installed below. Pass ``execution_options(include_deleted=True)``
+  to see them anyway.
+* ``purge(model, id)`` (the task, or ``flask deletion purge``) then deletes
+  the row's dependants in batches of ``DELETE_BATCH_SIZE``, grandchildren
+  before children, one short transaction per batch, and finally the row.
+  Every batch is complete in itself, so an interrupted purge just runs again.
+  Progress is saved on the task after each batch (see ``/admin/tasks``).
+
+Dependants are found from the foreign keys in ``app.models``, so any parent
+and child pair is covered without configuration: rows whose key is NOT NULL
+are deleted, nullable keys (``Job.posted_by``) are set to NULL. Models with
+derived data register a ``before_delete`` hook that sees each batch's ids,
+like the dashboard rollup below.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, event, select, tuple_, update
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from app import db
+from app import stats, tasks
+from app.models import User, Job, Application
+
+# model -> callables run with each batch of primary keys before it is deleted
+_before_delete = defaultdict(list)
+_soft_delete_criteria = None
+
+
+def before_delete(model):
+    """Register a hook called with each batch of ``model`` primary keys about to be deleted."""
+    def register(func):
+        _before_delete[model].append(func)
+        return func
+    return register
+
+
+def _models():
+    return {mapper.local_table: mapper.class_ for mapper in db.Model.registry.mappers}
+
+
+def _primary_key(model):
+    """Return (key columns, expression for ``IN`` comparisons) of ``model``'s primary key."""
+    columns = list(model.__table__.primary_key.columns)
+    return columns, columns[0] if len(columns) == 1 else tuple_(*columns)
+
+
+def dependants(model):
+    """Return [(child model, foreign key column, nullable)] for rows that reference ``model``."""
+    found = []
+    for table, child in _models().items():
+        for key in table.foreign_keys:
+            if key.column.table is model.__table__:
+                found.append((child, getattr(child, key.parent.key), key.parent.nullable))
+    return found
+
+
+def _soft_deletable():
+    return [model for model in _models().values() if 'deleted_at' in model.__table__.c]
+
+
+def soft_delete_criteria():
+    """Loader criteria hiding soft-deleted rows and the rows that depend on them."""
+    global _soft_delete_criteria
+    if _soft_delete_criteria is None:
+        criteria = defaultdict(list)
+        for parent in _soft_deletable():
+            criteria[parent].append(parent.deleted_at.is_(None))
+            # Core columns, so that the criteria are not applied inside the subquery too
+            table = parent.__table__
+            deleted = select(table.c.id).where(table.c.deleted_at.isnot(None))
+            for child, column, nullable in dependants(parent):
+                if not nullable:
+                    criteria[child].append(column.not_in(deleted))
+        _soft_delete_criteria = [
+            with_loader_criteria(model, and_(*clauses), include_aliases=True)
+            for model, clauses in criteria.items()
+        ]
+    return _soft_delete_criteria
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_soft_deleted(state):
+    if state.is_select and not state.is_column_load and not state.is_relationship_load \
+            and not state.execution_options.get('include_deleted') \
+            and not state.session.info.get('include_deleted'):
+        state.statement = state.statement.options(*soft_delete_criteria())
+
+
+@contextmanager
+def including_deleted():
+    """Let every query on ``db.session`` see soft-deleted rows for the duration."""
+    info = db.session.info
+    previous = info.get('include_deleted')
+    info['include_deleted'] = True
+    try:
+        yield
+    finally:
+        info['include_deleted'] = previous
+
+
+def soft_delete(row):
+    """Hide ``row`` now and queue the purge of it and its dependants; the caller commits."""
+    row.deleted_at = datetime.utcnow()
+    tasks.enqueue('deletion.purge', table=row.__tablename__, id=row.id)
+
+
+def _batches(model, criteria, batch_size):
+    """Yield the primary keys of the ``model`` rows matching ``criteria``, a batch at a time.
+
+    The caller must delete or change the yielded rows so they stop matching.
+    """
+    columns, _ = _primary_key(model)
+    while True:
+        rows = db.session.execute(select(*columns).where(*criteria).order_by(*columns).limit(batch_size)).all()
+        if not rows:
+            return
+        yield [row[0] for row in rows] if len(columns) == 1 else [tuple(row) for row in rows]
+
+
+def delete_where(model, criteria, batch_size, counts, on_progress=None):
+    """Delete the ``model`` rows matching ``criteria`` in batches, their dependants first.
+
+    ``on_progress`` is called before every batch's commit, so a purge run as a
+    task keeps its lock (``tasks.report_progress``) however many batches it takes.
+    """
+    _, key = _primary_key(model)
+    children = dependants(model)
+    for ids in _batches(model, criteria, batch_size):
+        for child, column, nullable in children:
+            if nullable:
+                _, child_key = _primary_key(child)
+                for child_ids in _batches(child, [column.in_(ids)], batch_size):
+                    db.session.execute(update(child).where(child_key.in_(child_ids)).values({column.key: None})
+                                       .execution_options(synchronize_session=False))
+                    if on_progress is not None:
+                        on_progress(dict(counts))
+                    db.session.commit()
+            else:
+                delete_where(child, [column.in_(ids)], batch_size, counts, on_progress)
+        for hook in _before_delete[model]:
+            hook(ids)
+        db.session.execute(delete(model).where(key.in_(ids)).execution_options(synchronize_session=False))
+        counts[model.__tablename__] += len(ids)
+        if on_progress is not None:
+            on_progress(dict(counts))
+        db.session.commit()
+
+
+def purge(model, row_id, batch_size=None, on_progress=None):
+    """Delete one row and everything that depends on it; return {table: rows deleted}."""
+    batch_size = batch_size or current_app.config.get('DELETE_BATCH_SIZE', 1000)
+    counts = defaultdict(int)
+    _, key = _primary_key(model)
+    with including_deleted():
+        delete_where(model, [key == row_id], batch_size, counts, on_progress)
+    return dict(counts)
+
+
+def model_for_table(name):
+    for table, model in _models().items():
+        if table.name == name:
+            return model
+    raise KeyError(f'No model for table {name}')
+
+
+@tasks.task('deletion.purge')
+def purge_task(table, id):
+    purge(model_for_table(table), id, on_progress=tasks.report_progress)
+
+
+# Dashboard rollup: subtract what is about to be deleted
+
+@before_delete(Application)
+def _applications_removed(ids):
+    stats.record_applications_removed(Application.id.in_(ids))
+
+
+@before_delete(Job)
+def _jobs_removed(ids):
+    stats.record_rows_removed(stats.JOBS, Job.created_at, Job.id.in_(ids))
+
+
+@before_delete(User)
+def _users_removed(ids):
+    stats.record_rows_removed(stats.USERS, User.created_at, User.id.in_(ids))
+
+
+deletion_cli = AppGroup('deletion', help='Soft-deleted rows and their purge.')
+
+
+@deletion_cli.command('purge')
+@click.argument('table')
+@click.argument('row_id', type=int)
+@click.option('--batch-size', type=int, default=None)
+def purge_command(table, row_id, batch_size):
+    """Delete row ROW_ID of TABLE and its dependants now, in batches."""
+    def report(counts):
+        click.echo('  ' + ', '.join(f'{name} {count}' for name, count in sorted(counts.items())))
+    counts = purge(model_for_table(table), row_id, batch_size, report)
+    click.echo(f'Purged {sum(counts.values())} rows.')
+
+
+@deletion_cli.command('pending')
+@click.option('--queue', is_flag=True, help='Queue a purge for each of them.')
+def pending_command(queue):
+    """List soft-deleted rows that have not been purged yet."""
+    with including_deleted():
+        for model in _soft_deletable():
+            for row_id, deleted_at in db.session.execute(
+                    select(model.id, model.deleted_at).where(model.deleted_at.isnot(None))).all():
+                click.echo(f'{model.__tablename__} {row_id} deleted {deleted_at:%Y-%m-%d %H:%M}')
+                if queue:
+                    tasks.enqueue('deletion.purge', table=model.__tablename__, id=row_id)
+    db.session.commit()
@@ -0,0 +1,137 @@
+"""``flask explain``: EXPLAIN every query the routes run and flag full scans.
+
+Read-only pages are requested through the test client (as an admin and as a
+regular user) while statements are captured; the lookups made by the write
+routes are replayed as plain queries so nothing is modified. Each distinct
+statement is then EXPLAINed on the configured database.
+"""
+import click
+from flask import current_app, g
+from sqlalchemy import func
+
+from app import db
+from app.cache import cache
+from app.models import User, Job, Resume, Application, Role
+from app.queries import count_queries
+
+
+def _write_path_probes(user, job):
+    """The SELECTs the POST routes issue before writing, built the same way."""
+    return [
+        ('user.apply_job', lambda: Resume.query.filter_by(user_id=user.id).first()),
+        ('user.apply_job', lambda: Application.query.filter_by(user_id=user.id, job_id=job.id).first()),
+        ('auth.login', lambda: User.query.filter_by(email=user.email).first()),
+        ('auth.register', lambda: User.query.filter_by(username=user.username).first()),
+        ('admin.delete_job', lambda: db.session.query(
+            func.date(Application.created_at), Application.status, func.count(Application.id)
+        ).filter(Application.job_id == job.id).group_by(func.date(Application.created_at), Application.status).all()),
+        ('admin.delete_user', lambda: Application.query.filter_by(user_id=user.id).count()),
+        ('admin.delete_user', lambda: Resume.query.filter_by(user_id=user.id).count()),
+    ]
+
+
+def _pages(admin, user, job):
+    word = (job.title.split() or [''])[0]
+    admin_pages = [
+        '/admin/dashboard',
+        '/admin/jobs',
+        '/admin/users',
+        f'/admin/users?search={word}',
+        '/admin/applications',
+        f'/admin/user/{user.id}/applications',
+    ]
+    user_pages = [
+        '/',
+        f'/search?title={word}',
+        f'/search?location={job.location}',
+        f'/search/pages?title={word}&max_pages=2',
+        f'/job/{job.id}',
+        '/user/profile',
+        '/user/resume',
+        '/user/applications',
+    ]
+    return [(admin.id, page) for page in admin_pages] + [(user.id, page) for page in user_pages]
+
+
+def capture_statements():
+    """Return {(statement, frozen parameters): (source, parameters)} for every statement the routes run."""
+    admin = User.query.filter_by(role=Role.ADMIN).first()
+    user = User.query.filter_by(role=Role.USER).first()
+    job = Job.query.order_by(Job.id.desc()).first()
+    if admin is None or user is None or job is None:
+        raise click.ClickException('Needs at least one admin, one user and one job; run create_test_data.py first.')
+
+    captured = {}
+    client = current_app.test_client()
+    pages = _pages(admin, user, job)
+    probes = _write_path_probes(user, job)
+    for account, page in pages:
+        cache.clear()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(account)
+            session['_fresh'] = True
+        # The CLI's app context is reused by test client requests: reset the
+        # session and cached login so each page starts as a fresh request would
+        db.session.remove()
+        g.pop('_login_user', None)
+        with count_queries() as counter:
+            client.get(page)
+        for statement, parameters in zip(counter.statements, counter.parameters):
+            captured.setdefault((statement, _freeze(parameters)), (page, parameters))
+
+    for source, probe in probes:
+        db.session.remove()
+        with count_queries() as counter:
+            probe()
+        for statement, parameters in zip(counter.statements, counter.parameters):
+            captured.setdefault((statement, _freeze(parameters)), (source, parameters))
+    return captured
+
+
+def _freeze(parameters):
+    if isinstance(parameters, dict):
+        return tuple(sorted(parameters.items()))
+    return tuple(parameters or ())
+
+
+def explain(statement, parameters):
+    """Return (plan lines, full scan table names) for one statement."""
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as conn:
+        if dialect == 'sqlite':
+            rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            plan = [row[-1] for row in rows]
+            scans = [line.split()[1] for line in plan
+                     if line.startswith('SCAN ') and 'USING' not in line and 'CONSTANT ROW' not in line]
+        elif dialect == 'mysql':
+            result = conn.exec_driver_sql('EXPLAIN ' + statement, parameters)
+            keys = list(result.keys())
+            rows = [dict(zip(keys, row)) for row in result]
+            plan = [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}" for row in rows]
+            scans = [row['table'] for row in rows if row['type'] in ('ALL', 'index')]
+        else:
+            raise click.ClickException(f'EXPLAIN is not supported for {dialect}')
+    return plan, scans
+
+
+@click.command('explain')
+@click.option('--verbose', is_flag=True, help='Print the plan of every statement, not only full scans.')
+def explain_command(verbose):
+    """EXPLAIN the queries used in app/routes.py and flag full table scans."""
+    captured = capture_statements()
+    flagged = 0
+    for (statement, _), (source, parameters) in captured.items():
+        if not statement.lstrip().upper().startswith('SELECT'):
+            continue
+        plan, scans = explain(statement, parameters)
+        if scans:
+            flagged += 1
+        if scans or verbose:
+            status = 'FULL SCAN ' + ', '.join(scans) if scans else 'ok'
+            click.echo(f'[{status}] {source}')
+            click.echo('    ' + ' '.join(statement.split())[:300])
+            for line in plan:
+                click.echo('      ' + line)
+    click.echo(f'{len(captured)} statements checked, {flagged} with full scans.')
+    if flagged:
+        raise SystemExit(1)
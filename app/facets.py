@@ -0,0 +1,391 @@
+"""Facet counts for job search: location, salary band and posting age.
+
+``FacetIndex`` keeps, for every facet value, the jobs that have it and a
+running count. The few salary bands are bitmaps (a Python int with bit
+``job_id`` set); locations and posting days, which can have thousands of
+values, are sets of job ids, so their memory grows with the number of jobs
+rather than with the highest id times the number of values. It is built
+lazily per worker from one scan of ``jobs``, like the in-process search
+index, and updated incrementally through ``search_engine.index_job`` /
+``remove_job``: directly by the job write paths of the worker that wrote,
+and by ``search_engine.sync`` replaying other processes' writes before
+counts or a selection are read. No search runs a GROUP BY:
+
+* with no search text and nothing chosen the counts are the running totals;
+* otherwise the jobs matching the text are turned into a bitmap once and
+  the bands and posting windows are counted by popcounts of AND-ed bitmaps.
+  Location counts tally the matching jobs' locations when few jobs match;
+  when many do, locations are counted most common first and the scan stops
+  once no remaining location's running total could reach the top ``limit``.
+  Values chosen in one facet narrow the counts of the others but not its
+  own, so a visitor can see what switching to another location would give.
+
+Posting age is kept per UTC day; "Past week" is a bitmap of the jobs of the
+last seven days, built when first needed that day. The salary band is taken from ``salary_max`` in the default
+currency (``app.salary``); other salaries are counted under "Other".
+
+Chosen values come from the ``place``, ``band`` and ``posted`` request
+parameters (``place`` may repeat). ``Selection`` turns them into SQL
+criteria for the FULLTEXT backend and a bitmap for the in-process one.
+"""
+import heapq
+import threading
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, time
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+
+from app import db
+from app.models import Job
+from app.salary import DEFAULT_CURRENCY, parse_salary
+
+LOCATION = 'place'
+SALARY = 'band'
+POSTED = 'posted'
+FACETS = (LOCATION, SALARY, POSTED)
+FACET_LABELS = {LOCATION: 'Location', SALARY: 'Salary', POSTED: 'Posted'}
+
+# (value, label, salary_max above, salary_max up to)
+SALARY_BANDS = (
+    ('up-to-20k', 'Up to 20k', None, 20000),
+    ('20k-30k', '20k - 30k', 20000, 30000),
+    ('30k-50k', '30k - 50k', 30000, 50000),
+    ('over-50k', 'Over 50k', 50000, None),
+)
+OTHER_BAND = 'other'
+BAND_LABELS = dict([(value, label) for value, label, _, _ in SALARY_BANDS] + [(OTHER_BAND, 'Other')])
+
+# (value, label, days including today)
+POSTED_WITHIN = (
+    ('1d', 'Today', 1),
+    ('7d', 'Past week', 7),
+    ('30d', 'Past month', 30),
+)
+POSTED_DAYS = {value: days for value, _, days in POSTED_WITHIN}
+
+FacetValue = namedtuple('FacetValue', 'value label count chosen')
+
+# Facets whose values keep a set of job ids instead of a bitmap
+SPARSE_FACETS = (LOCATION, POSTED)
+# Tally locations job by job when at most 1/TALLY_RATIO of the jobs match
+TALLY_RATIO = 8
+
+if hasattr(int, 'bit_count'):
+    def popcount(bits):
+        return bits.bit_count()
+else:  # Python < 3.10
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
+def bitmap(ids):
+    """Bitmap of a collection of job ids, built in one pass."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray((max(ids) >> 3) + 1)
+    for job_id in ids:
+        bits[job_id >> 3] |= 1 << (job_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bit_array(bits):
+    """Boolean NumPy array of a bitmap, indexed by job id."""
+    packed = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(packed, bitorder='little').astype(bool)
+
+
+def count_in(present, ids):
+    """How many of the job ids in the array ``ids`` are set in the ``bit_array`` ``present``."""
+    return int(present[ids[ids < len(present)]].sum())
+
+
+def salary_band(salary):
+    """Band value of a salary text."""
+    parsed = parse_salary(salary)
+    if parsed is None or parsed.currency != DEFAULT_CURRENCY or parsed.maximum is None:
+        return OTHER_BAND
+    for value, _, low, high in SALARY_BANDS:
+        if (low is None or parsed.maximum > low) and (high is None or parsed.maximum <= high):
+            return value
+    return OTHER_BAND
+
+
+def chosen_values(args):
+    """Valid facet values chosen in a request's ``args`` (a MultiDict), as {facet: [values]}."""
+    chosen = {}
+    places = [value for value in args.getlist(LOCATION) if value]
+    if places:
+        chosen[LOCATION] = list(dict.fromkeys(places))
+    bands = [value for value in args.getlist(SALARY) if value in BAND_LABELS]
+    if bands:
+        chosen[SALARY] = list(dict.fromkeys(bands))
+    posted = [value for value in args.getlist(POSTED) if value in POSTED_DAYS]
+    if posted:
+        chosen[POSTED] = posted[-1:]
+    return chosen
+
+
+def toggle(args, facet, value):
+    """Search arguments with ``value`` of ``facet`` chosen, or unchosen if it was."""
+    args = {name: arg for name, arg in args.items() if arg}
+    current = args.get(facet) or []
+    current = [current] if isinstance(current, str) else list(current)
+    if value in current:
+        current.remove(value)
+    elif facet == POSTED:
+        current = [value]
+    else:
+        current.append(value)
+    if current:
+        args[facet] = current
+    else:
+        args.pop(facet, None)
+    return args
+
+
+def _day(created_at):
+    return (created_at or datetime.utcnow()).date().toordinal()
+
+
+def _today():
+    return datetime.utcnow().date().toordinal()
+
+
+class Selection:
+    """Chosen facet values as SQL criteria and as a bitmap of the jobs they allow."""
+
+    def __init__(self, chosen, allowed):
+        self.chosen = chosen
+        self.allowed = allowed
+        self._bytes = None
+
+    def __bool__(self):
+        return bool(self.chosen)
+
+    @property
+    def key(self):
+        return tuple((facet, tuple(sorted(self.chosen[facet]))) for facet in FACETS if facet in self.chosen)
+
+    def criteria(self):
+        """WHERE criteria equivalent to the bitmap, served by the jobs indexes."""
+        criteria = []
+        if LOCATION in self.chosen:
+            criteria.append(Job.location.in_(self.chosen[LOCATION]))
+        if SALARY in self.chosen:
+            bands = []
+            for value, _, low, high in SALARY_BANDS:
+                if value in self.chosen[SALARY]:
+                    band = [Job.salary_currency == DEFAULT_CURRENCY]
+                    if low is not None:
+                        band.append(Job.salary_max > low)
+                    if high is not None:
+                        band.append(Job.salary_max <= high)
+                    bands.append(and_(*band))
+            if OTHER_BAND in self.chosen[SALARY]:
+                bands.append(or_(Job.salary_max.is_(None), Job.salary_currency != DEFAULT_CURRENCY))
+            criteria.append(or_(*bands))
+        if POSTED in self.chosen:
+            days = POSTED_DAYS[self.chosen[POSTED][0]]
+            first_day = date.fromordinal(_today() - days + 1)
+            criteria.append(Job.created_at >= datetime.combine(first_day, time()))
+        return criteria
+
+    def contains(self, job_id):
+        if self._bytes is None:
+            self._bytes = self.allowed.to_bytes((self.allowed.bit_length() + 7) // 8, 'little')
+        index = job_id >> 3
+        return index < len(self._bytes) and bool(self._bytes[index] >> (job_id & 7) & 1)
+
+
+class FacetIndex:
+    """Per-worker job sets and running counts of every facet value."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._all = 0
+        # SALARY: value -> bitmap
+        self._bits = {SALARY: {}}
+        # LOCATION: value -> set of job ids; POSTED: day ordinal -> set of job ids
+        self._ids = {facet: {} for facet in SPARSE_FACETS}
+        self._counts = {facet: defaultdict(int) for facet in FACETS}
+        # job_id -> (location, band, day)
+        self._docs = {}
+        # (today, days) -> bitmap of the jobs posted in that window
+        self._windows = {}
+        # location -> its job ids as an array, for counting; dropped when the location changes
+        self._arrays = {}
+
+    def warm(self):
+        self._ensure_loaded()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = db.session.execute(
+                select(Job.id, Job.location, Job.salary, Job.created_at).execution_options(yield_per=1000))
+            self._add_many(rows)
+            self._loaded = True
+
+    def _add_many(self, rows):
+        """Add (id, location, salary, created_at) rows with one update per facet value."""
+        added = {facet: defaultdict(list) for facet in FACETS}
+        ids = []
+        # Salary texts repeat a lot; parse each once
+        bands = {}
+        for job_id, location, salary, created_at in rows:
+            self._remove(job_id)
+            if salary not in bands:
+                bands[salary] = salary_band(salary)
+            doc = (location, bands[salary], _day(created_at))
+            self._docs[job_id] = doc
+            ids.append(job_id)
+            for facet, value in zip(FACETS, doc):
+                added[facet][value].append(job_id)
+        self._all |= bitmap(ids)
+        for facet, values in added.items():
+            counts = self._counts[facet]
+            for value, value_ids in values.items():
+                if facet in SPARSE_FACETS:
+                    self._ids[facet].setdefault(value, set()).update(value_ids)
+                    if facet == LOCATION:
+                        self._arrays.pop(value, None)
+                else:
+                    bits = self._bits[facet]
+                    bits[value] = bits.get(value, 0) | bitmap(value_ids)
+                counts[value] += len(value_ids)
+        self._windows.clear()
+
+    def _remove(self, job_id):
+        doc = self._docs.pop(job_id, None)
+        if doc is None:
+            return
+        mask = ~(1 << job_id)
+        self._all &= mask
+        for facet, value in zip(FACETS, doc):
+            members = self._ids[facet] if facet in SPARSE_FACETS else self._bits[facet]
+            counts = self._counts[facet]
+            if facet in SPARSE_FACETS:
+                members[value].discard(job_id)
+                if facet == LOCATION:
+                    self._arrays.pop(value, None)
+            else:
+                members[value] &= mask
+            counts[value] -= 1
+            if not counts[value]:
+                del members[value], counts[value]
+        self._windows.clear()
+
+    def index_jobs(self, jobs):
+        """Add or refresh jobs (anything with id, location, salary and created_at)."""
+        with self._lock:
+            if self._loaded:
+                self._add_many((job.id, job.location, job.salary, job.created_at) for job in jobs)
+
+    def remove_job(self, job_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(job_id)
+
+    def _window(self, days, today):
+        key = (today, days)
+        if key not in self._windows:
+            self._windows[key] = bitmap(job_id for day, day_ids in self._ids[POSTED].items()
+                                        if today - days < day <= today for job_id in day_ids)
+        return self._windows[key]
+
+    def _chosen_bits(self, facet, values, today):
+        if facet == POSTED:
+            return self._window(POSTED_DAYS[values[0]], today)
+        if facet == LOCATION:
+            return bitmap(job_id for value in values for job_id in self._ids[LOCATION].get(value, ()))
+        bits = 0
+        for value in values:
+            bits |= self._bits[facet].get(value, 0)
+        return bits
+
+    def selection(self, chosen):
+        """A ``Selection`` for chosen facet values, or None if there are none."""
+        if not chosen:
+            return None
+        self._ensure_loaded()
+        today = _today()
+        with self._lock:
+            allowed = self._all
+            for facet, values in chosen.items():
+                allowed &= self._chosen_bits(facet, values, today)
+        return Selection(chosen, allowed)
+
+    def _location_ids(self, value):
+        ids = self._arrays.get(value)
+        if ids is None:
+            members = self._ids[LOCATION][value]
+            ids = self._arrays[value] = np.fromiter(members, dtype=np.int64, count=len(members))
+        return ids
+
+    def _location_counts(self, base, limit, wanted):
+        """{location: jobs in ``base``} for at least the ``limit`` most common locations and ``wanted``."""
+        present = bit_array(base)
+        totals = self._counts[LOCATION]
+        if int(present.sum()) * TALLY_RATIO <= len(self._docs):
+            counts = defaultdict(int)
+            for job_id in np.flatnonzero(present).tolist():
+                doc = self._docs.get(job_id)
+                if doc is not None:
+                    counts[doc[0]] += 1
+            return counts
+        # A location's running total bounds its count: stop at the first that cannot reach the top
+        counts, best = {}, []
+        for value in sorted(totals, key=lambda value: -totals[value]):
+            if len(best) == limit and totals[value] < best[0]:
+                break
+            counts[value] = count = count_in(present, self._location_ids(value))
+            if len(best) < limit:
+                heapq.heappush(best, count)
+            elif count > best[0]:
+                heapq.heapreplace(best, count)
+        for value in wanted:
+            if value not in counts and value in self._ids[LOCATION]:
+                counts[value] = count_in(present, self._location_ids(value))
+        return counts
+
+    def counts(self, matching=None, chosen=None, limit=10):
+        """Return {facet: [FacetValue]} for the jobs in ``matching`` (None for all).
+
+        Locations are the ``limit`` most common, plus any chosen.
+        """
+        self._ensure_loaded()
+        chosen = chosen or {}
+        today = _today()
+        facets = {}
+        with self._lock:
+            masks = {facet: self._chosen_bits(facet, values, today) for facet, values in chosen.items()}
+            for facet in FACETS:
+                base = self._all if matching is None else matching & self._all
+                narrowed = matching is not None
+                for other, mask in masks.items():
+                    if other != facet:
+                        base &= mask
+                        narrowed = True
+                if facet == POSTED:
+                    values = [(value, label, popcount(base & self._window(days, today)))
+                              for value, label, days in POSTED_WITHIN]
+                elif facet == SALARY:
+                    counts = {value: popcount(base & bits) for value, bits in self._bits[SALARY].items()} \
+                        if narrowed else self._counts[SALARY]
+                    values = [(value, BAND_LABELS[value], counts.get(value, 0)) for value in BAND_LABELS]
+                else:
+                    counts = self._location_counts(base, limit, chosen.get(facet, ())) \
+                        if narrowed else self._counts[LOCATION]
+                    top = heapq.nsmallest(limit, (value for value, count in counts.items() if count),
+                                          key=lambda value: (-counts[value], value))
+                    top += [value for value in chosen.get(facet, ()) if value not in top]
+                    values = [(value, value, counts.get(value, 0)) for value in top]
+                facets[facet] = [FacetValue(value, label, count, value in chosen.get(facet, ()))
+                                 for value, label, count in values]
+        return facets
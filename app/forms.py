@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField, IntegerField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
 from app.models import User
@@ -18,12 +19,13 @@ class RegistrationForm(FlaskForm):
     submit = SubmitField('Register')
     
     def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
+        # Names of deleted users stay taken until their purge has run
+        user = User.query.execution_options(include_deleted=True).filter_by(username=username.data).first()
         if user:
             raise ValidationError('Username already taken. Please choose a different one.')
     
     def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
+        user = User.query.execution_options(include_deleted=True).filter_by(email=email.data).first()
         if user:
             raise ValidationError('Email already registered. Please use a different one.')
 
@@ -37,6 +39,14 @@ class JobForm(FlaskForm):
     contact_info = StringField('Contact Information', validators=[DataRequired(), Length(max=100)])
     submit = SubmitField('Post Job')
 
+class JobImportForm(FlaskForm):
+    """Form for uploading a CSV or NDJSON file of job postings"""
+    file = FileField('Jobs File', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'ndjson', 'jsonl'], 'CSV or NDJSON files only.')
+    ])
+    submit = SubmitField('Import Jobs')
+
 class ResumeForm(FlaskForm):
     """Form for resume submission"""
     name = StringField('Full Name', validators=[DataRequired(), Length(max=64)])
@@ -52,7 +62,8 @@ class JobSearchForm(FlaskForm):
     """Form for searching jobs"""
     title = StringField('Job Title')
     location = StringField('Location')
-    salary = StringField('Salary Range')
+    salary = StringField('Salary Range', description='e.g. 25k, 20k-30k or up to 30k')
+    sort = SelectField('Sort By', choices=[('', 'Best match'), ('salary', 'Highest salary')], default='')
     submit = SubmitField('Search')
 
 class EditProfileForm(FlaskForm):
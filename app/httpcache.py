@@ -0,0 +1,300 @@
+"""HTTP validators, page cache and fragment cache for the public pages.
+
+What the public pages show only changes when a job does, or when a poster is
+renamed or deleted. Every such write bumps the ``public`` row of
+``content_versions`` once its transaction has committed (a ``before_flush``
+hook watches the session; bulk writes that bypass it call ``touch()``), so
+one primary-key read tells a request whether anything it could show has
+changed, whichever worker made the write. The bump is a short transaction of
+its own, after the write's: writers never hold the row's lock while they do
+their work, and a transaction that touches many jobs bumps the version once.
+The write has committed by then, so a failed bump is logged rather than
+raised and retried with the process's next bump or ``observe``.
+The ids of the jobs it wrote are logged in ``job_changes`` under the new
+version, which is how other workers' in-process search indexes learn about
+them (``SearchEngine.sync``).
+
+* Views decorated with ``public_page`` send the version as a weak ``ETag``
+  and the time of that write as ``Last-Modified`` with their 200 responses,
+  and answer conditional GETs with 304 before the view runs. A view of one
+  row passes ``exists`` so a request for a missing row, whatever validators
+  it carries, still reaches the view and its 404.
+* Their rendered HTML is cached by URL and version for the next visitor.
+* Templates cache blocks with ``{% call fragment('name', job) %}``. The key
+  holds the id and ``updated_at`` of each row passed in, so an edit gives
+  that job new fragments while the others stay cached.
+
+Per-user output is never cached: pages for a logged-in user, or carrying
+flashed messages, are rendered as before and sent ``Cache-Control: private,
+no-cache``, and fragments must not read ``current_user`` (the "Applied"
+button in job_details.html stays outside them). Pages with a CSRF-protected
+form (search) use fragments only, since their token belongs to one session.
+
+A worker that sees a newer version than before drops its ``jobs`` cache
+entries, so the in-process cache backend catches up with writes made by
+other workers on the next public page view instead of after the TTL.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, g, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import delete, event, exc, insert, inspect, select, update
+from sqlalchemy.orm import Session
+from werkzeug.http import is_resource_modified
+
+from app import db
+from app.cache import cache
+from app.models import ContentVersion, Job, JobChange, User
+
+# The content_versions row covering the public job pages
+PUBLIC = 'public'
+
+
+# session.info keys: the open transaction changes the public content, and the jobs it wrote
+PENDING_BUMP = 'httpcache_pending_bump'
+CHANGED_JOBS = 'httpcache_changed_jobs'
+
+# Versions between prunes of job_changes rows older than SEARCH_CHANGES_RETENTION_HOURS
+PRUNE_EVERY = 1000
+
+
+def touch(session=None, job_ids=()):
+    """Record a write to the public content; the version is bumped when the transaction commits.
+
+    ``job_ids`` are jobs written without the ORM noticing (Core inserts), for
+    the ``job_changes`` log other workers refresh their indexes from.
+    """
+    session = session or db.session
+    session.info[PENDING_BUMP] = True
+    if job_ids:
+        session.info.setdefault(CHANGED_JOBS, set()).update(job_ids)
+
+
+def bump_version(job_ids=()):
+    """Increment the public content version on the primary, in a transaction of its own.
+
+    The jobs written are logged under the new version. Bumps queue on the
+    version row, so versions commit in order and a reader that has seen
+    version N has every ``job_changes`` row up to N.
+    """
+    now = datetime.utcnow()
+    table = ContentVersion.__table__
+    with db.engine.begin() as connection:
+        updated = connection.execute(
+            update(table).where(table.c.name == PUBLIC).values(version=table.c.version + 1, updated_at=now)
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(name=PUBLIC, version=1, updated_at=now))
+        version = connection.execute(select(table.c.version).where(table.c.name == PUBLIC)).scalar()
+        if job_ids:
+            connection.execute(insert(JobChange), [
+                {'version': version, 'job_id': job_id, 'changed_at': now} for job_id in sorted(job_ids)])
+        if version % PRUNE_EVERY == 0:
+            retention = timedelta(hours=current_app.config['SEARCH_CHANGES_RETENTION_HOURS'])
+            connection.execute(delete(JobChange).where(JobChange.changed_at < now - retention))
+    return version
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    if session.info.pop(PENDING_BUMP, False):
+        http_cache.bump(session.info.pop(CHANGED_JOBS, ()))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_bump(session):
+    session.info.pop(PENDING_BUMP, None)
+    session.info.pop(CHANGED_JOBS, None)
+
+
+def _shown_publicly(obj, deleted=False):
+    if isinstance(obj, Job):
+        return True
+    if isinstance(obj, User):
+        # Job pages show the poster's name
+        attrs = inspect(obj).attrs
+        return deleted or attrs.username.history.has_changes() or attrs.deleted_at.history.has_changes()
+    return False
+
+
+@event.listens_for(Session, 'before_flush')
+def _touch_on_public_write(session, flush_context, instances):
+    changed = any(isinstance(obj, Job) for obj in session.new) \
+        or any(_shown_publicly(obj, deleted=True) for obj in session.deleted) \
+        or any(_shown_publicly(obj) for obj in session.dirty if session.is_modified(obj))
+    if changed:
+        touch(session)
+
+
+@event.listens_for(Session, 'after_flush')
+def _log_job_writes(session, flush_context):
+    # After the flush, so new jobs have their ids
+    job_ids = [obj.id for obj in session.new if isinstance(obj, Job)]
+    job_ids += [obj.id for obj in session.deleted if isinstance(obj, Job)]
+    job_ids += [obj.id for obj in session.dirty if isinstance(obj, Job) and session.is_modified(obj)]
+    if job_ids:
+        touch(session, job_ids)
+
+
+def content_version():
+    """(version, time of the last write) of the public content, read once per request."""
+    if 'content_version' not in g:
+        row = db.session.execute(
+            select(ContentVersion.version, ContentVersion.updated_at).where(ContentVersion.name == PUBLIC)
+        ).first()
+        g.content_version = tuple(row) if row is not None else (0, None)
+        http_cache.observe(g.content_version[0])
+    return g.content_version
+
+
+def etag_for(version):
+    return f'{current_app.extensions["http_cache"].release}-{version}'
+
+
+def page_key(path, etag):
+    return f'page:{etag}:{path}'
+
+
+def anonymous_request():
+    """True if nothing in this request's response can depend on who asked."""
+    return request.method in ('GET', 'HEAD') and current_app.config['HTTP_CACHE_ENABLED'] \
+        and not current_user.is_authenticated and '_flashes' not in session
+
+
+def not_modified(environ, etag, modified):
+    """True if the client's copy (``If-None-Match`` / ``If-Modified-Since``) is current."""
+    return not is_resource_modified(environ, etag=etag, last_modified=modified)
+
+
+def public_page(view=None, exists=None):
+    """Serve ``view`` with validators, 304s and the page cache to anonymous visitors.
+
+    ``exists``, called with the view's arguments, is asked before answering a
+    conditional request with 304, so a missing row gets the view's 404.
+    """
+    if view is None:
+        return lambda view: public_page(view, exists)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not anonymous_request():
+            response = current_app.make_response(view(*args, **kwargs))
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+
+        version, modified = content_version()
+        etag = etag_for(version)
+        if not_modified(request.environ, etag, modified) and (exists is None or exists(*args, **kwargs)):
+            response = current_app.response_class(status=304)
+        else:
+            key = page_key(request.full_path, etag)
+            found, body = cache.backend.get(key)
+            if found:
+                response = current_app.response_class(body, mimetype='text/html')
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    cache.backend.set(key, response.get_data(), current_app.config['HTTP_CACHE_PAGE_TTL'],
+                                      ('pages', 'jobs'))
+        if response.status_code in (200, 304):
+            response.set_etag(etag, weak=True)
+            if modified is not None:
+                response.last_modified = modified
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Cookie')
+        return response
+    return wrapper
+
+
+def _key_part(value):
+    if isinstance(value, (list, tuple)):
+        return ','.join(_key_part(item) for item in value)
+    if hasattr(value, 'id'):
+        updated_at = getattr(value, 'updated_at', None) or getattr(value, 'created_at', None)
+        return f'{value.id}@{updated_at.timestamp() if updated_at else ""}'
+    return str(value)
+
+
+def fragment(name, *parts, caller):
+    """Cache the HTML of a ``{% call fragment(name, *parts) %}`` block, keyed by ``parts``."""
+    if not current_app.config['HTTP_CACHE_ENABLED']:
+        return caller()
+    key = ':'.join(['fragment', current_app.extensions['http_cache'].release, name]
+                   + [_key_part(part) for part in parts])
+    return Markup(cache.get_or_set(key, lambda: str(caller()), tags=('fragments',),
+                                   ttl=current_app.config['HTTP_CACHE_FRAGMENT_TTL']))
+
+
+def _release(app):
+    """Digest of the templates, so a deploy that changes them changes every ETag."""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(f'{os.path.relpath(path, app.root_path)}:{os.path.getmtime(path)}'.encode())
+    return digest.hexdigest()[:8]
+
+
+class HttpCacheState:
+    """Per-process state: the release token, the newest content version seen and a failed bump."""
+
+    def __init__(self, release):
+        self.release = release
+        self.seen_version = None
+        # Job ids of bumps that failed, None if none did
+        self.pending_jobs = None
+        self.lock = threading.Lock()
+
+
+class HttpCache:
+    """Flask extension for conditional GETs and the page and fragment caches."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HTTP_CACHE_ENABLED', True)
+        app.config.setdefault('HTTP_CACHE_PAGE_TTL', 300)
+        app.config.setdefault('HTTP_CACHE_FRAGMENT_TTL', 3600)
+        app.config.setdefault('HTTP_CACHE_RELEASE', None)
+
+        app.extensions['http_cache'] = HttpCacheState(app.config['HTTP_CACHE_RELEASE'] or _release(app))
+        app.jinja_env.globals['fragment'] = fragment
+
+    def bump(self, job_ids=()):
+        """``bump_version`` with any earlier failed bump; a failure is logged and kept for a retry.
+
+        Runs after the write committed, so raising would answer a saved write with a 500.
+        """
+        state = current_app.extensions['http_cache']
+        with state.lock:
+            pending, state.pending_jobs = state.pending_jobs, None
+        job_ids = set(job_ids) | (pending or set())
+        try:
+            return bump_version(job_ids)
+        except exc.SQLAlchemyError:
+            current_app.logger.exception('Could not bump the public content version; retrying on the next request')
+            with state.lock:
+                state.pending_jobs = job_ids | (state.pending_jobs or set())
+            return None
+
+    def observe(self, version):
+        """Drop this worker's cached job data once another worker's write is visible; retry a failed bump."""
+        state = current_app.extensions['http_cache']
+        if state.pending_jobs is not None:
+            self.bump()
+        if state.seen_version is not None and version > state.seen_version:
+            cache.invalidate('jobs')
+        if state.seen_version is None or version > state.seen_version:
+            state.seen_version = version
+
+
+http_cache = HttpCache()
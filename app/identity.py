@@ -0,0 +1,137 @@
+"""Cached ``current_user`` loading.
+
+Flask-Login calls the user loader on every authenticated request. The
+loader here keeps the few columns the layout and the loader read
+(``CACHED_FIELDS``), plus the counts the layout shows, in a cache with a
+short TTL, and attaches a ``User`` built from them to the request's session
+with ``merge(load=False)``: a cache hit costs no SQL, while ``current_user``
+is still a normal ``User`` whose other columns and relationships load lazily
+and whose changes are flushed on commit. ``password_hash`` in particular
+never reaches the cache file.
+
+Routes that change a user (profile, password, role, deletion) or the counts
+call ``invalidate_user``. With ``CACHE_BACKEND = 'sqlite'`` the entries live
+in a SQLite file shared by every worker on the host
+(``IDENTITY_CACHE_SQLITE_PATH``), so a demotion or deletion takes effect in
+all of them at once; with ``'memory'`` each worker keeps its own LRU and the
+others see the change once the TTL passes.
+"""
+import os
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db, login_manager
+from app.cache import CacheStats, MemoryBackend, NullBackend, SQLiteBackend
+from app.models import User, Application
+
+# Tag carried by every entry, for writes that change many users' counts at once
+ALL_USERS = 'identity'
+
+
+# Columns kept in the cache; the rest load from the database when first read
+CACHED_FIELDS = ('id', 'username', 'role', 'deleted_at')
+
+
+def cached_fields(user):
+    return {field: getattr(user, field) for field in CACHED_FIELDS}
+
+
+def detached_user(fields):
+    """A session-free ``User`` holding ``fields`` that ``merge(load=False)`` accepts; other columns stay unloaded."""
+    user = User.__mapper__.class_manager.new_instance()
+    for field, value in fields.items():
+        setattr(user, field, value)
+    make_transient_to_detached(user)
+    return user
+
+
+def badge_counts(user_id):
+    """Counts shown next to the layout's navigation links."""
+    applications = db.session.query(func.count(Application.id)).filter(Application.user_id == user_id).scalar()
+    return {'applications': applications}
+
+
+class IdentityCache:
+    """Flask extension installing the cached user loader."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_TTL', 30)
+        app.config.setdefault('IDENTITY_CACHE_MAX_ENTRIES', 10000)
+        app.config.setdefault('IDENTITY_CACHE_SQLITE_PATH', os.path.join(app.instance_path, 'identity.sqlite'))
+
+        stats = CacheStats()
+        if app.config['IDENTITY_CACHE_TTL'] <= 0:
+            backend = NullBackend(stats)
+        elif app.config.get('CACHE_BACKEND', 'sqlite') == 'sqlite':
+            # Its own file, so page caching cannot evict identities (or the reverse)
+            backend = SQLiteBackend(stats, app.config['IDENTITY_CACHE_SQLITE_PATH'],
+                                    app.config['IDENTITY_CACHE_MAX_ENTRIES'])
+            # Entries from before CACHED_FIELDS hold whole rows, password hashes included
+            backend.clear()
+        else:
+            backend = MemoryBackend(stats, app.config['IDENTITY_CACHE_MAX_ENTRIES'])
+        app.extensions['identity_cache'] = backend
+        login_manager.user_loader(self.load_user)
+
+    @property
+    def backend(self):
+        return current_app.extensions['identity_cache']
+
+    def load_user(self, user_id):
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        found, entry = self.lookup(user_id)
+        if found:
+            fields, counts = entry
+            user = db.session.merge(detached_user(fields), load=False)
+        else:
+            versions = self.versions(user_id)
+            user = db.session.get(User, user_id)
+            if user is None:
+                return None
+            counts = badge_counts(user_id)
+            self.store(user, counts, versions)
+        user.badge_counts = counts
+        return user
+
+    def lookup(self, user_id):
+        """Return (found, (``CACHED_FIELDS`` values, counts))."""
+        return self.backend.get(f'user:{user_id}')
+
+    def versions(self, user_id):
+        """Tag versions to read before loading a user on a miss and hand back to ``store``."""
+        return self.backend.tag_versions((f'user:{user_id}', ALL_USERS))
+
+    def store(self, user, counts, versions=None):
+        """Cache ``user`` and ``counts``, unless the user was invalidated since ``versions`` were read."""
+        key = f'user:{user.id}'
+        self.backend.set(key, (cached_fields(user), counts), current_app.config['IDENTITY_CACHE_TTL'],
+                         (key, ALL_USERS), versions)
+
+    def invalidate_user(self, user_id):
+        """Forget the cached identity of one user (in this worker only with the memory backend)."""
+        self.backend.invalidate(f'user:{user_id}')
+
+    def invalidate_all(self):
+        """Forget every cached identity, e.g. after counts change for many users."""
+        self.backend.invalidate(ALL_USERS)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        backend = self.backend
+        values = backend.stats.as_dict()
+        values.update(backend=backend.name, size=backend.size())
+        return values
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,163 @@
+"""Resume-to-job match scores for ranking applicants.
+
+Resumes (education, experience, introduction) and jobs (title,
+requirements, description) are embedded in one hashed TF-IDF space, so a
+skill named in a resume's experience meets the same word in a job's
+requirements; the score of a pair is the cosine of their vectors. The IDF
+comes from the job corpus: ``rebuild`` computes it and saves it under
+``MATCHING_INDEX_PATH``, so later scores use the same weights without
+re-reading every job.
+
+Scores are stored on the applications they rank (``Application.match_score``)
+and computed in NumPy batches of ``MATCHING_BATCH_SIZE`` applications: the
+distinct resumes and jobs of a batch are embedded once each and the batch's
+scores are one row-wise product, written back with one executemany UPDATE
+per batch. ``rebuild`` (``flask matching rebuild``) rescores everything; an
+updated resume, an edited job and a new application queue ``matching.score``
+for just the applications they affect.
+"""
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, select, update
+
+from app import db
+from app.models import Application, Job, Resume
+from app.tasks import report_progress, task
+from app.vectors import IndexDirectory, inverse_document_frequency, normalize, vectorize
+
+# Relative weight of a term in each field
+RESUME_FIELDS = {
+    'experience': 2.0,
+    'education': 1.0,
+    'introduction': 1.0,
+}
+JOB_FIELDS = {
+    'requirements': 2.0,
+    'title': 1.5,
+    'description': 1.0,
+}
+
+
+class MatchingEngine:
+    """Embeds resumes and jobs and keeps ``Application.match_score`` current."""
+
+    def __init__(self, path, dim, batch_size):
+        self.files = IndexDirectory(path)
+        self.dim = dim
+        self.batch_size = batch_size
+        self._idf = None
+
+    @property
+    def idf(self):
+        """IDF weights, reloaded when another process has saved newer ones."""
+        modified = self.files.modified('idf')
+        if self._idf is None or self._idf[0] != modified:
+            # Before the first rebuild: plain term frequencies
+            weights = self.files.load('idf') if modified is not None else np.ones(self.dim, dtype=np.float32)
+            self._idf = (modified, weights)
+        return self._idf[1]
+
+    def embed_resumes(self, rows):
+        """Unit vectors of resume rows (with education, experience and introduction)."""
+        return normalize(vectorize(rows, RESUME_FIELDS, self.dim) * self.idf)
+
+    def embed_jobs(self, rows):
+        """Unit vectors of job rows (with title, requirements and description)."""
+        return normalize(vectorize(rows, JOB_FIELDS, self.dim) * self.idf)
+
+    def rebuild(self, on_progress=None):
+        """Recompute the IDF from every job, then rescore every application; return the count."""
+        document_frequency = np.zeros(self.dim, dtype=np.int64)
+        total = 0
+        rows = db.session.execute(select(Job.id, *[getattr(Job, field) for field in JOB_FIELDS])
+                                  .execution_options(yield_per=self.batch_size))
+        for batch in rows.partitions():
+            document_frequency += (vectorize(batch, JOB_FIELDS, self.dim) > 0).sum(axis=0)
+            total += len(batch)
+        self.files.save('idf', inverse_document_frequency(document_frequency, total))
+        return self.score_where([], on_progress)
+
+    def score_where(self, criteria, on_progress=None):
+        """Score the applications matching ``criteria`` in batches, committing each; return the count."""
+        scored = 0
+        last_id = 0
+        statement = update(Application.__table__) \
+            .where(Application.__table__.c.id == bindparam('application_id')) \
+            .values(match_score=bindparam('score'),
+                    # Not an edit of the application: keep its onupdate timestamp
+                    updated_at=Application.__table__.c.updated_at)
+        while True:
+            batch = db.session.execute(
+                select(Application.id, Application.resume_id, Application.job_id)
+                .where(Application.id > last_id, *criteria).order_by(Application.id).limit(self.batch_size)
+            ).all()
+            if not batch:
+                return scored
+            last_id = batch[-1].id
+            scores = self._score_pairs([(row.resume_id, row.job_id) for row in batch])
+            db.session.execute(statement, [{'application_id': row.id, 'score': score}
+                                           for row, score in zip(batch, scores)])
+            scored += len(batch)
+            if on_progress is not None:
+                on_progress({'scored': scored})
+            db.session.commit()
+
+    def _score_pairs(self, pairs):
+        """Cosine scores of (resume_id, job_id) pairs; None where either row is gone."""
+        resume_ids = sorted({resume_id for resume_id, _ in pairs})
+        job_ids = sorted({job_id for _, job_id in pairs})
+        resumes = db.session.execute(select(Resume.id, *[getattr(Resume, field) for field in RESUME_FIELDS])
+                                     .where(Resume.id.in_(resume_ids))).all()
+        jobs = db.session.execute(select(Job.id, *[getattr(Job, field) for field in JOB_FIELDS])
+                                  .where(Job.id.in_(job_ids))).all()
+        resume_rows = {row.id: i for i, row in enumerate(resumes)}
+        job_rows = {row.id: i for i, row in enumerate(jobs)}
+        found = [i for i, (resume_id, job_id) in enumerate(pairs)
+                 if resume_id in resume_rows and job_id in job_rows]
+        scores = [None] * len(pairs)
+        if found:
+            resume_vectors = self.embed_resumes(resumes)[[resume_rows[pairs[i][0]] for i in found]]
+            job_vectors = self.embed_jobs(jobs)[[job_rows[pairs[i][1]] for i in found]]
+            for i, score in zip(found, np.einsum('ij,ij->i', resume_vectors, job_vectors)):
+                scores[i] = round(float(score), 6)
+        return scores
+
+
+def get_engine():
+    config = current_app.config
+    engine = current_app.extensions.get('matching')
+    if engine is None:
+        engine = MatchingEngine(config['MATCHING_INDEX_PATH'], config['MATCHING_DIMENSIONS'],
+                                config['MATCHING_BATCH_SIZE'])
+        current_app.extensions['matching'] = engine
+    return engine
+
+
+@task('matching.score')
+def score_task(resume_id=None, job_id=None, application_id=None):
+    criteria = []
+    if resume_id is not None:
+        criteria.append(Application.resume_id == resume_id)
+    if job_id is not None:
+        criteria.append(Application.job_id == job_id)
+    if application_id is not None:
+        criteria.append(Application.id == application_id)
+    if criteria:
+        get_engine().score_where(criteria, on_progress=report_progress)
+
+
+@task('matching.rebuild', max_attempts=1)
+def rebuild_task():
+    get_engine().rebuild(on_progress=report_progress)
+
+
+matching_cli = AppGroup('matching', help='Resume-to-job match scores.')
+
+
+@matching_cli.command('rebuild')
+def rebuild_command():
+    """Recompute the job IDF and every application's match score."""
+    count = get_engine().rebuild()
+    click.echo(f'Scored {count} applications.')
@@ -0,0 +1,346 @@
+"""Per-request instrumentation.
+
+SQLAlchemy cursor events and Flask request/template signals are combined
+into per-endpoint counters: requests, latency histogram, statements
+executed, time spent in the database and in templates, and the slowest
+statements seen. They are exposed three ways:
+
+* a ``Server-Timing`` header on every response (visible in browser dev tools);
+* ``/admin/metrics`` in Prometheus text format (see ``render_prometheus``),
+  together with the connection pools' gauges and checkout wait times and
+  the background task backlog;
+* a sampled slow-request log through ``app.logger``.
+
+Counters live in the worker process, like the in-memory cache: with several
+gunicorn workers each one reports its own share.
+"""
+import heapq
+import hmac
+import random
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+from app import db
+from app.database import database, WAIT_BUCKETS
+from app import tasks
+
+# Upper bounds (seconds) of the request duration histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """What one request spent, collected in ``g`` while it runs."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = []  # (seconds, statement)
+        self._template_started = None
+
+    def add_statement(self, statement, seconds, keep):
+        self.queries += 1
+        self.db_time += seconds
+        if len(self.statements) < keep:
+            heapq.heappush(self.statements, (seconds, statement))
+        elif seconds > self.statements[0][0]:
+            heapq.heapreplace(self.statements, (seconds, statement))
+
+    def slowest(self):
+        return sorted(self.statements, reverse=True)
+
+
+class EndpointStats:
+    """Running totals for one endpoint."""
+
+    def __init__(self):
+        self.requests = defaultdict(int)  # (method, status) -> count
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.slowest = []  # min-heap of (seconds, statement)
+
+
+class MetricsRegistry:
+    """Thread-safe per-endpoint aggregation for one process."""
+
+    def __init__(self, keep_statements=5):
+        self.keep_statements = keep_statements
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(EndpointStats)
+
+    def record(self, endpoint, method, status, seconds, metrics):
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats.requests[(method, status)] += 1
+            stats.count += 1
+            stats.duration += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+            stats.queries += metrics.queries
+            stats.db_time += metrics.db_time
+            stats.template_time += metrics.template_time
+            for entry in metrics.statements:
+                if len(stats.slowest) < self.keep_statements:
+                    heapq.heappush(stats.slowest, entry)
+                elif entry[0] > stats.slowest[0][0]:
+                    heapq.heapreplace(stats.slowest, entry)
+
+    def snapshot(self):
+        """Return {endpoint: plain dict of totals}, safe to read without the lock."""
+        with self._lock:
+            return {
+                endpoint: {
+                    'requests': dict(stats.requests),
+                    'buckets': list(stats.buckets),
+                    'count': stats.count,
+                    'duration': stats.duration,
+                    'queries': stats.queries,
+                    'db_time': stats.db_time,
+                    'template_time': stats.template_time,
+                    'slowest': sorted(stats.slowest, reverse=True),
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+def _current():
+    if has_request_context():
+        return g.get('_metrics')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    pending = conn.info.get('_metrics_started')
+    if not pending:
+        return
+    started = pending.pop()
+    metrics = _current()
+    if metrics is not None:
+        keep = current_app.extensions['metrics'].keep_statements
+        metrics.add_statement(' '.join(statement.split()), time.perf_counter() - started, keep)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None:
+        started = context.connection.info.get('_metrics_started')
+        if started:
+            started.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    metrics = _current()
+    if metrics is not None:
+        metrics._template_started = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    metrics = _current()
+    if metrics is not None and metrics._template_started is not None:
+        metrics.template_time += time.perf_counter() - metrics._template_started
+        metrics._template_started = None
+
+
+def server_timing(metrics, total):
+    """``Server-Timing`` header value for one request."""
+    return (f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries", '
+            f'tpl;dur={metrics.template_time * 1000:.2f}, '
+            f'app;dur={total * 1000:.2f}')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', ' ').replace('"', '\\"')
+
+
+def render_prometheus(registry, statement_chars=200):
+    """Render the registry in the Prometheus text exposition format."""
+    endpoints = registry.snapshot()
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    header('jobsite_http_requests_total', 'counter', 'Requests handled, by endpoint, method and status.')
+    for endpoint, stats in sorted(endpoints.items()):
+        for (method, status), count in sorted(stats['requests'].items()):
+            lines.append(f'jobsite_http_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",'
+                         f'status="{status}"}} {count}')
+
+    header('jobsite_http_request_duration_seconds', 'histogram', 'Request duration by endpoint.')
+    for endpoint, stats in sorted(endpoints.items()):
+        label = f'endpoint="{_escape(endpoint)}"'
+        for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+            lines.append(f'jobsite_http_request_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'jobsite_http_request_duration_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+        lines.append(f'jobsite_http_request_duration_seconds_sum{{{label}}} {stats["duration"]:.6f}')
+        lines.append(f'jobsite_http_request_duration_seconds_count{{{label}}} {stats["count"]}')
+
+    for name, key, help_text in (
+        ('jobsite_db_queries_total', 'queries', 'SQL statements executed while handling requests.'),
+        ('jobsite_db_seconds_total', 'db_time', 'Time spent executing SQL statements.'),
+        ('jobsite_template_render_seconds_total', 'template_time', 'Time spent rendering templates.'),
+    ):
+        header(name, 'counter', help_text)
+        for endpoint, stats in sorted(endpoints.items()):
+            value = stats[key]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{name}{{endpoint="{_escape(endpoint)}"}} {value}')
+
+    header('jobsite_db_slowest_statement_seconds', 'gauge', 'Slowest statements seen per endpoint.')
+    for endpoint, stats in sorted(endpoints.items()):
+        for rank, (seconds, statement) in enumerate(stats['slowest'], 1):
+            lines.append(f'jobsite_db_slowest_statement_seconds{{endpoint="{_escape(endpoint)}",rank="{rank}",'
+                         f'statement="{_escape(statement[:statement_chars])}"}} {seconds:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_pool_prometheus(pools):
+    """Render ``Database.pool_status()`` in the Prometheus text exposition format."""
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name, key, help_text in (
+        ('jobsite_db_pool_size', 'size', 'Connections the pool keeps open.'),
+        ('jobsite_db_pool_max_overflow', 'max_overflow', 'Connections the pool may open beyond its size.'),
+        ('jobsite_db_pool_checked_out', 'checked_out', 'Connections currently in use.'),
+        ('jobsite_db_pool_checked_in', 'checked_in', 'Idle connections in the pool.'),
+        ('jobsite_db_pool_overflow', 'overflow', 'Connections currently open beyond the pool size.'),
+    ):
+        header(name, 'gauge', help_text)
+        for bind, status in sorted(pools.items()):
+            lines.append(f'{name}{{bind="{bind}"}} {status[key]}')
+
+    timed = sorted((bind, status) for bind, status in pools.items() if 'checkouts' in status)
+    if not timed:
+        return '\n'.join(lines) + '\n'
+    header('jobsite_db_pool_checkout_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection.')
+    for bind, status in timed:
+        label = f'bind="{bind}"'
+        waits = status['checkouts'] + status['timeouts']
+        for bound, count in zip(WAIT_BUCKETS, status['buckets']):
+            lines.append(f'jobsite_db_pool_checkout_wait_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'jobsite_db_pool_checkout_wait_seconds_bucket{{{label},le="+Inf"}} {waits}')
+        lines.append(f'jobsite_db_pool_checkout_wait_seconds_sum{{{label}}} {status["wait_time"]:.6f}')
+        lines.append(f'jobsite_db_pool_checkout_wait_seconds_count{{{label}}} {waits}')
+    for name, key, help_text in (
+        ('jobsite_db_pool_checkout_timeouts_total', 'timeouts', 'Checkouts that gave up after DB_POOL_TIMEOUT.'),
+        ('jobsite_db_pool_overflow_opened_total', 'overflow_opened', 'Checkouts that opened an overflow connection.'),
+    ):
+        header(name, 'counter', help_text)
+        for bind, status in timed:
+            lines.append(f'{name}{{bind="{bind}"}} {status[key]}')
+    header('jobsite_db_pool_checkout_max_wait_seconds', 'gauge', 'Longest checkout wait since the worker started.')
+    for bind, status in timed:
+        lines.append(f'jobsite_db_pool_checkout_max_wait_seconds{{bind="{bind}"}} {status["max_wait"]:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_task_prometheus(counts, oldest_age):
+    """Render ``tasks.backlog()`` in the Prometheus text exposition format."""
+    lines = [
+        '# HELP jobsite_tasks Background tasks in the queue, by task and state.',
+        '# TYPE jobsite_tasks gauge',
+    ]
+    for name, statuses in sorted(counts.items()):
+        for status, count in sorted(statuses.items()):
+            lines.append(f'jobsite_tasks{{task="{_escape(name)}",status="{status}"}} {count}')
+    lines.append('# HELP jobsite_tasks_oldest_due_seconds How long the oldest due task has been waiting.')
+    lines.append('# TYPE jobsite_tasks_oldest_due_seconds gauge')
+    lines.append(f'jobsite_tasks_oldest_due_seconds {oldest_age:.1f}')
+    return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Flask extension wiring the engine, template and request hooks."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_SERVER_TIMING', True)
+        app.config.setdefault('METRICS_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('METRICS_SLOW_LOG_SAMPLE_RATE', 1.0)
+        app.config.setdefault('METRICS_SLOWEST_STATEMENTS', 5)
+        app.config.setdefault('METRICS_TOKEN', None)
+
+        app.extensions['metrics'] = MetricsRegistry(app.config['METRICS_SLOWEST_STATEMENTS'])
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        with app.app_context():
+            for engine in db.engines.values():
+                if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+                    event.listen(engine, 'handle_error', _handle_error)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_rendered, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    @property
+    def registry(self):
+        return current_app.extensions['metrics']
+
+    def _start(self):
+        g._metrics = RequestMetrics()
+
+    def _finish(self, response):
+        metrics = g.pop('_metrics', None)
+        if metrics is None or request.endpoint == 'static':
+            return response
+        total = time.perf_counter() - metrics.started
+        config = current_app.config
+        endpoint = request.endpoint or 'unmatched'
+        self.registry.record(endpoint, request.method, response.status_code, total, metrics)
+
+        if config['METRICS_SERVER_TIMING']:
+            response.headers.add('Server-Timing', server_timing(metrics, total))
+
+        if total * 1000 >= config['METRICS_SLOW_REQUEST_MS'] \
+                and random.random() < config['METRICS_SLOW_LOG_SAMPLE_RATE']:
+            slowest = '; '.join(f'{seconds * 1000:.1f}ms {statement[:200]}'
+                                for seconds, statement in metrics.slowest()[:3])
+            current_app.logger.warning(
+                'Slow request %s %s -> %s (%s) in %.1fms: %d queries %.1fms, templates %.1fms. Slowest: %s',
+                request.method, request.full_path.rstrip('?'), response.status_code, endpoint, total * 1000,
+                metrics.queries, metrics.db_time * 1000, metrics.template_time * 1000, slowest or '-')
+        return response
+
+    def authorized(self):
+        """True when the request carries the configured scrape token."""
+        token = current_app.config['METRICS_TOKEN']
+        supplied = request.headers.get('Authorization', '')
+        # Bytes: compare_digest rejects str with non-ASCII characters
+        return bool(token) and hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode())
+
+    def prometheus(self):
+        return render_prometheus(self.registry) + render_pool_prometheus(database.pool_status()) \
+            + render_task_prometheus(*tasks.backlog())
+
+
+metrics = Metrics()
@@ -1,7 +1,9 @@
-from app import db, login_manager
+from app import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
+from app.passwords import password_hasher
+from app.salary import parse_salary
 
 # User roles
 class Role:
@@ -17,21 +19,26 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, index=True)
     password_hash = db.Column(db.String(512))
     role = db.Column(db.String(10), default=Role.USER)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Set by app.deletion.soft_delete; the row is purged in the background
+    deleted_at = db.Column(db.DateTime, index=True)
     
     # Relationships
     resumes = db.relationship('Resume', backref='user', lazy='dynamic')
     applications = db.relationship('Application', backref='applicant', lazy='dynamic')
     
+    # Counts shown in the layout, attached by the cached user loader (app/identity.py)
+    badge_counts = None
+    
     def __init__(self, username, email, password, role=Role.USER):
         self.username = username
         self.email = email
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
         self.role = role
     
     def check_password(self, password):
         """Check if the provided password matches the stored hash"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def is_admin(self):
         """Check if the user has admin role"""
@@ -49,11 +56,7 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Set password for user"""
-        self.password_hash = generate_password_hash(password)
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+        self.password_hash = password_hasher.hash(password)
 
 class Job(db.Model):
     """Job posting model"""
@@ -65,14 +68,42 @@ class Job(db.Model):
     requirements = db.Column(db.Text, nullable=False)
     location = db.Column(db.String(100), nullable=False)
     salary = db.Column(db.String(50), nullable=False)
+    # Parsed from salary whenever it is set (app.salary); NULL if it names no amount
+    salary_currency = db.Column(db.String(3))
+    salary_min = db.Column(db.Integer)
+    salary_max = db.Column(db.Integer)
     contact_info = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    posted_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    # Versions the cached page fragments showing this job (app.httpcache)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    posted_by = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    # Set by app.deletion.soft_delete; the row is purged in the background
+    deleted_at = db.Column(db.DateTime, index=True)
     
     # Relationships
     applications = db.relationship('Application', backref='job', lazy='dynamic')
     poster_user = db.relationship('User', foreign_keys=[posted_by], backref='posted_jobs')
     
+    # FULLTEXT indexes used by app.search; other databases fall back to the in-process index
+    __table_args__ = (
+        db.Index('ft_jobs_text', 'title', 'description', 'requirements', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        db.Index('ft_jobs_location', 'location', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        # Newest-first listings and keyset pagination
+        db.Index('ix_jobs_created_at_id', 'created_at', 'id'),
+        # Salary range filters, and salary ordering with keyset pagination
+        db.Index('ix_jobs_salary_max_id', 'salary_currency', 'salary_max', 'id'),
+        db.Index('ix_jobs_salary_min', 'salary_currency', 'salary_min'),
+        # Location facet filter (app.facets)
+        db.Index('ix_jobs_location', 'location'),
+    )
+    
+    @validates('salary')
+    def _parse_salary(self, key, value):
+        """Keep the structured salary columns in step with the text"""
+        salary = parse_salary(value)
+        self.salary_currency, self.salary_min, self.salary_max = salary if salary else (None, None, None)
+        return value
+    
     def __repr__(self):
         return f'<Job {self.title}>'
 
@@ -81,7 +112,7 @@ class Resume(db.Model):
     __tablename__ = 'resumes'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     name = db.Column(db.String(64), nullable=False)
     gender = db.Column(db.String(10), nullable=False)
     age = db.Column(db.Integer, nullable=False)
@@ -110,6 +141,121 @@ class Application(db.Model):
                       default='Pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Cosine of the resume and job, kept by app.matching; NULL until scored
+    match_score = db.Column(db.Float)
+    
+    __table_args__ = (
+        # One application per user and job; also serves has_applied_to and per-user listings
+        db.UniqueConstraint('user_id', 'job_id', name='uq_applications_user_job'),
+        db.Index('ix_applications_job_id_status', 'job_id', 'status'),
+        db.Index('ix_applications_resume_id', 'resume_id'),
+        db.Index('ix_applications_status_created_at', 'status', 'created_at'),
+        db.Index('ix_applications_created_at_id', 'created_at', 'id'),
+        db.Index('ix_applications_user_id_created_at', 'user_id', 'created_at', 'id'),
+        # Applicants by match score, overall and per job
+        db.Index('ix_applications_match_score_id', 'match_score', 'id'),
+        db.Index('ix_applications_job_id_match_score', 'job_id', 'match_score', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<Application {self.id}>'
+
+class StatRollup(db.Model):
+    """Per-day counters for the admin dashboard, maintained by app.stats"""
+    __tablename__ = 'stats_rollup'
+    
+    metric = db.Column(db.String(20), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<StatRollup {self.metric} {self.day} {self.status}: {self.count}>'
+
+class JobSimilarity(db.Model):
+    """Precomputed nearest neighbours of a job, maintained by app.similarity"""
+    __tablename__ = 'job_similarities'
+    
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), primary_key=True)
+    similar_job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_job_similarities_job_id_score', 'job_id', 'score'),
+        # Lets deletes find the rows naming a job as a neighbour
+        db.Index('ix_job_similarities_similar_job_id', 'similar_job_id'),
+    )
+    
+    def __repr__(self):
+        return f'<JobSimilarity {self.job_id} -> {self.similar_job_id}: {self.score:.3f}>'
+
+class JobRecommendation(db.Model):
+    """Precomputed top jobs for a user, maintained by app.recommendations"""
+    __tablename__ = 'job_recommendations'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    # When the user's list was computed; lists older than RECOMMENDATIONS_MAX_AGE are not shown
+    computed_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_job_recommendations_user_id_score', 'user_id', 'score'),
+        # Lets deletes find the rows recommending a job
+        db.Index('ix_job_recommendations_job_id', 'job_id'),
+    )
+    
+    def __repr__(self):
+        return f'<JobRecommendation {self.user_id} -> {self.job_id}: {self.score:.3f}>'
+
+class ContentVersion(db.Model):
+    """Counter and time of the latest write to what public pages show, kept by app.httpcache"""
+    __tablename__ = 'content_versions'
+    
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ContentVersion {self.name} {self.version}>'
+
+class JobChange(db.Model):
+    """Jobs written under each public content version, so other workers can refresh their in-process indexes"""
+    __tablename__ = 'job_changes'
+    
+    version = db.Column(db.Integer, primary_key=True)
+    # No foreign key: the ids of purged jobs are kept
+    job_id = db.Column(db.Integer, primary_key=True)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_job_changes_changed_at', 'changed_at'),
+    )
+    
+    def __repr__(self):
+        return f'<JobChange {self.version}: job {self.job_id}>'
+
+class Task(db.Model):
+    """Queued background work, run by ``flask tasks work`` (app.tasks)"""
+    __tablename__ = 'tasks'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    progress = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Workers poll for the oldest due task in one state
+        db.Index('ix_tasks_status_run_at', 'status', 'run_at', 'id'),
+    )
     
     def __repr__(self):
-        return f'<Application {self.id}>' 
\ No newline at end of file
+        return f'<Task {self.id} {self.name} {self.status}>'
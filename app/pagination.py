@@ -0,0 +1,178 @@
+"""Keyset (cursor) pagination and cheap total counts.
+
+Pages are addressed by an opaque cursor that encodes the sort key of the last
+row shown, so fetching page N costs the same index range scan as page 1
+instead of an ``OFFSET`` that reads and discards every earlier row.
+"""
+import base64
+import binascii
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import and_, or_, text
+
+from app import db
+
+
+def encode_cursor(values):
+    """Encode a sort key as an opaque URL-safe token."""
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token from ``encode_cursor``; returns None for a missing or malformed cursor."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw.decode('utf-8'))
+        if not isinstance(payload, list):
+            return None
+        return [_decode_value(value) for value in payload]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def _decode_value(value):
+    """One sort key element: a number, a string or ``{'dt': isoformat}``; anything else is rejected."""
+    if isinstance(value, dict):
+        if set(value) != {'dt'} or not isinstance(value['dt'], str):
+            raise ValueError('malformed datetime in cursor')
+        return datetime.fromisoformat(value['dt'])
+    # bool is an int subclass and None/lists never come out of encode_cursor
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError('unexpected value in cursor')
+    return value
+
+
+def keyset_filter(columns, values):
+    """Return a clause matching rows that sort after ``values`` in descending ``columns`` order.
+
+    Expanded to ``a < :a OR (a = :a AND b < :b) ...`` rather than a row-value
+    comparison so every supported database can drive it from a composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column < values[i]))
+    return or_(*clauses)
+
+
+class KeysetPage:
+    """One page of rows plus the cursor for the following page."""
+
+    def __init__(self, items, next_cursor, total, per_page, cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+        self.per_page = per_page
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return self.cursor is None
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, total=None, key=None):
+    """Fetch one page of ``query`` ordered by ``columns`` descending.
+
+    ``key`` extracts the sort values from a result row; by default each
+    column's attribute is read off the row.
+    """
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(columns):
+        query = query.filter(keyset_filter(columns, values))
+    else:
+        cursor = None
+    rows = query.order_by(*[column.desc() for column in columns]).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        sort_key = key(last) if key else [getattr(last, column.key) for column in columns]
+        next_cursor = encode_cursor(sort_key)
+    return KeysetPage(rows, next_cursor, total, per_page, cursor=cursor)
+
+
+class CountCache:
+    """Process-local TTL cache for expensive ``COUNT(*)`` results.
+
+    Keys include free-text search terms and user ids, so the cache is an LRU
+    of at most ``max_entries`` counts: unique queries cannot grow a worker's
+    memory without bound.
+    """
+
+    def __init__(self, ttl=60, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        found, value = self.lookup(key)
+        if not found:
+            value = compute()
+            self.store(key, value)
+        return value
+
+    def lookup(self, key):
+        """Return (found, value) without computing; for callers that compute asynchronously."""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._values[key]
+                return False, None
+            self._values.move_to_end(key)
+            return True, entry[1]
+
+    def store(self, key, value):
+        with self._lock:
+            self._values[key] = (time.monotonic() + self.ttl, value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+count_cache = CountCache()
+
+
+def table_row_estimate(model):
+    """Return the optimizer's row estimate for a table on MySQL, or None elsewhere."""
+    if db.engine.dialect.name != 'mysql':
+        return None
+    return db.session.execute(
+        text('SELECT TABLE_ROWS FROM information_schema.TABLES '
+             'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table'),
+        {'table': model.__tablename__}
+    ).scalar()
+
+
+def estimated_count(query, key, model=None):
+    """Total row count for ``query``, served from the count cache.
+
+    Pass ``model`` for unfiltered listings: on MySQL the table statistics
+    estimate is used instead of scanning the table.
+    """
+    def compute():
+        if model is not None:
+            estimate = table_row_estimate(model)
+            if estimate is not None:
+                return estimate
+        return query.order_by(None).count()
+    return count_cache.get(key, compute)
@@ -0,0 +1,208 @@
+"""Password hashing policy.
+
+Hashes are werkzeug ``generate_password_hash`` strings, so existing hashes
+keep verifying. The policy picks the algorithm and its cost:
+
+* ``PASSWORD_HASH_ALGORITHM`` - ``scrypt`` (werkzeug's default) or ``pbkdf2``.
+* ``PASSWORD_HASH_COST`` - scrypt ``N`` or pbkdf2 iterations, or ``auto`` to
+  calibrate at startup so one hash takes about ``PASSWORD_HASH_TARGET_MS``.
+  ``flask passwords calibrate`` prints a fixed value to put in the config.
+* ``PASSWORD_HASH_POOL`` - ``thread`` or ``process`` to run hashing on a
+  bounded pool of ``PASSWORD_HASH_WORKERS``; at most
+  ``PASSWORD_HASH_MAX_PENDING`` hashes may wait, beyond that the request is
+  answered with 503 instead of tying up the worker. ``none`` hashes inline.
+  The limit is per process, so it only applies when a process serves
+  requests on several threads (gunicorn ``--threads``/``gthread``, or the
+  ASGI entry point); sync workers handle one request at a time and never
+  queue a second hash, so leave it ``none`` with them.
+
+``needs_rehash`` reports hashes made with another algorithm or cost, higher
+or lower; ``auth.login`` replaces them while it has the plaintext, so
+changing the cost moves every active account to it. Give every worker the
+same fixed cost (not ``auto``, which may calibrate differently per machine)
+or accounts are rehashed back and forth.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from werkzeug.security import generate_password_hash, check_password_hash
+
+ALGORITHMS = ('scrypt', 'pbkdf2')
+DEFAULT_COSTS = {'scrypt': 2 ** 15, 'pbkdf2': 600000}
+SCRYPT_R, SCRYPT_P = 8, 1
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool already has as many pending hashes as allowed."""
+
+
+def method_for(algorithm, cost):
+    """werkzeug method string for an algorithm and cost."""
+    if algorithm == 'scrypt':
+        return f'scrypt:{cost}:{SCRYPT_R}:{SCRYPT_P}'
+    if algorithm == 'pbkdf2':
+        return f'pbkdf2:sha256:{cost}'
+    raise ValueError(f'Unknown password hash algorithm: {algorithm}')
+
+
+def parse_method(password_hash):
+    """Return (algorithm, cost) of a stored hash, or (None, 0) if unrecognised."""
+    method = (password_hash or '').split('$', 1)[0]
+    parts = method.split(':')
+    try:
+        if parts[0] == 'scrypt':
+            return 'scrypt', int(parts[1]) if len(parts) > 1 else DEFAULT_COSTS['scrypt']
+        if parts[0] == 'pbkdf2':
+            return 'pbkdf2', int(parts[2]) if len(parts) > 2 else 260000
+    except ValueError:
+        pass
+    return None, 0
+
+
+def time_hash(algorithm, cost, rounds=3):
+    """Fastest of ``rounds`` hashes at this cost, in seconds."""
+    method = method_for(algorithm, cost)
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        generate_password_hash('calibration-password', method=method)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(algorithm, target_ms):
+    """Largest cost whose hash time stays within ``target_ms`` on this machine.
+
+    scrypt's N must be a power of two, so it is doubled (up to 2**16, as its
+    memory use grows too); pbkdf2 scales linearly and is rounded down to a
+    multiple of 10,000 so that workers calibrating separately agree.
+    """
+    target = target_ms / 1000.0
+    if algorithm == 'scrypt':
+        cost = 2 ** 12
+        while time_hash(algorithm, cost * 2) <= target and cost < 2 ** 16:
+            cost *= 2
+        return cost
+    base = 50000
+    cost = int(base * target / time_hash(algorithm, base))
+    return max(base, cost // 10000 * 10000)
+
+
+def _pool_worker_hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _pool_worker_check(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """Flask extension applying the configured hashing policy."""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._pools = {}  # (app name, pid) -> executor
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_ALGORITHM', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_COST', None)
+        app.config.setdefault('PASSWORD_HASH_TARGET_MS', 250)
+        app.config.setdefault('PASSWORD_HASH_POOL', 'none')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 16)
+
+        algorithm = app.config['PASSWORD_HASH_ALGORITHM']
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f'PASSWORD_HASH_ALGORITHM must be one of {ALGORITHMS}, not {algorithm!r}')
+        cost = app.config['PASSWORD_HASH_COST']
+        if cost == 'auto':
+            cost = calibrate(algorithm, app.config['PASSWORD_HASH_TARGET_MS'])
+            app.logger.info('Calibrated %s password hashing cost to %s', algorithm, cost)
+        cost = int(cost) if cost else DEFAULT_COSTS[algorithm]
+
+        slots = app.config['PASSWORD_HASH_WORKERS'] + app.config['PASSWORD_HASH_MAX_PENDING']
+        app.extensions['passwords'] = {
+            'algorithm': algorithm,
+            'cost': cost,
+            'method': method_for(algorithm, cost),
+            'slots': threading.BoundedSemaphore(slots),
+        }
+
+        @app.errorhandler(PasswordHashingBusy)
+        def hashing_busy(error):
+            return 'Too many sign-in attempts right now. Please try again in a moment.', 503, {'Retry-After': '1'}
+
+    @property
+    def policy(self):
+        if has_app_context() and 'passwords' in current_app.extensions:
+            return current_app.extensions['passwords']
+        # Outside an app (e.g. one-off scripts) fall back to the default policy
+        return {'algorithm': 'scrypt', 'cost': DEFAULT_COSTS['scrypt'],
+                'method': method_for('scrypt', DEFAULT_COSTS['scrypt']), 'slots': None}
+
+    def _executor(self):
+        kind = current_app.config['PASSWORD_HASH_POOL']
+        if kind not in ('thread', 'process'):
+            return None
+        # Pools do not survive a fork: gunicorn workers each get their own
+        key = (current_app.name, os.getpid())
+        with self._lock:
+            executor = self._pools.get(key)
+            if executor is None:
+                cls = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+                executor = cls(max_workers=current_app.config['PASSWORD_HASH_WORKERS'])
+                self._pools[key] = executor
+        return executor
+
+    def _run(self, func, *args):
+        policy = self.policy
+        executor = self._executor() if policy['slots'] is not None else None
+        if executor is None:
+            return func(*args)
+        if not policy['slots'].acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            return executor.submit(func, *args).result()
+        finally:
+            policy['slots'].release()
+
+    def hash(self, password):
+        """Hash ``password`` with the current policy."""
+        return self._run(_pool_worker_hash, password, self.policy['method'])
+
+    def verify(self, password_hash, password):
+        """Check ``password`` against a stored hash of any supported method."""
+        if not password_hash:
+            return False
+        return self._run(_pool_worker_check, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash uses another algorithm or cost than the policy, so lowering the cost applies too."""
+        policy = self.policy
+        algorithm, cost = parse_method(password_hash)
+        return algorithm != policy['algorithm'] or cost != policy['cost']
+
+
+password_hasher = PasswordHasher()
+
+passwords_cli = AppGroup('passwords', help='Password hashing policy.')
+
+
+@passwords_cli.command('calibrate')
+@click.option('--algorithm', type=click.Choice(ALGORITHMS), default=None)
+@click.option('--target-ms', type=float, default=None, help='Target time for one hash.')
+def calibrate_command(algorithm, target_ms):
+    """Measure hashing speed here and print the cost to configure."""
+    algorithm = algorithm or current_app.config['PASSWORD_HASH_ALGORITHM']
+    target_ms = target_ms or current_app.config['PASSWORD_HASH_TARGET_MS']
+    cost = calibrate(algorithm, target_ms)
+    click.echo(f'{algorithm} cost {cost}: {time_hash(algorithm, cost) * 1000:.0f}ms per hash')
+    click.echo(f'PASSWORD_HASH_ALGORITHM={algorithm} PASSWORD_HASH_COST={cost}')
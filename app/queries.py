@@ -0,0 +1,66 @@
+"""Read-side query helpers for the admin pages.
+
+Each helper answers a whole page in a fixed number of statements: rows come
+from one query, related counts from one grouped query and related objects are
+eager-loaded, so templates never trigger per-row lazy loads.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Application
+
+
+def _counts_by(column, ids):
+    if not ids:
+        return {}
+    rows = db.session.query(column, func.count(Application.id)) \
+        .filter(column.in_(ids)) \
+        .group_by(column)
+    return {key: count for key, count in rows}
+
+
+def application_counts_by_job(jobs):
+    """Return {job_id: application count} for the given jobs in one grouped query."""
+    return _counts_by(Application.job_id, [job.id for job in jobs])
+
+
+def application_counts_by_user(users):
+    """Return {user_id: application count} for the given users in one grouped query."""
+    return _counts_by(Application.user_id, [user.id for user in users])
+
+
+def applications_with_details():
+    """Applications query with the resume and job joined into the same statement."""
+    return Application.query.options(
+        joinedload(Application.resume),
+        joinedload(Application.job)
+    )
+
+
+class QueryCounter:
+    """Counts statements executed on an engine while active."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self.parameters = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Context manager yielding a ``QueryCounter`` for statements run inside the block."""
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
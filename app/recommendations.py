@@ -0,0 +1,418 @@
+"""Personalized job recommendations for the home page.
+
+A user's profile is their resume plus the jobs they applied to most
+recently, embedded in the hashed TF-IDF space ``app.matching`` ranks
+applicants in (with its IDF) and folded down to
+``RECOMMENDATIONS_DIMENSIONS`` buckets, so the vectors of every job fit in
+memory. Scoring each profile against every job would be users x jobs dot
+products; candidates come from an inverted-file index instead:
+
+* ``build`` embeds every job, groups the vectors into spherical k-means
+  clusters (``RECOMMENDATIONS_CLUSTERS``, by default the square root of the
+  job count) and saves them, ordered by cluster, under
+  ``RECOMMENDATIONS_INDEX_PATH``;
+* ``rank`` picks each profile's ``RECOMMENDATIONS_PROBES`` nearest centroids
+  and scores only the jobs of those clusters, one matrix product per cluster
+  for all the profiles of a batch that probe it. Jobs posted since the index
+  was built form one more cluster that every profile probes. Jobs the user
+  applied to are skipped.
+
+The best ``RECOMMENDATIONS_TOP_K`` jobs of each user are stored in
+``job_recommendations`` and the home page reads them with one indexed
+lookup (``recommended_jobs``).
+
+Freshness policy:
+
+* ``flask recommendations rebuild`` (run nightly) rebuilds the index and
+  every user's list, ``RECOMMENDATIONS_BATCH_SIZE`` users per transaction;
+* updating a resume or applying for a job queues
+  ``recommendations.update_user``, so that user's list follows on the next
+  worker poll, new jobs included;
+* ``flask recommendations refresh`` rescores only the lists older than half
+  of ``RECOMMENDATIONS_MAX_AGE``, for a missed or failed rebuild;
+* a list older than ``RECOMMENDATIONS_MAX_AGE`` is not shown: the home page
+  falls back to the latest jobs, as it does for users with neither a resume
+  nor an application. Deleted jobs drop out of lists at once (soft delete
+  hides them from the lookup); edited jobs are re-embedded by the next build.
+"""
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, exists, or_, select
+
+from app import db
+from app.matching import JOB_FIELDS, get_engine as get_matching_engine
+from app.models import Application, Job, JobRecommendation, Resume, User
+from app.tasks import report_progress, task
+from app.vectors import IndexDirectory, normalize
+
+# Weight of the resume and of the application history in a profile
+RESUME_WEIGHT = 1.0
+HISTORY_WEIGHT = 1.0
+# Most recent applications that shape a profile
+HISTORY_SIZE = 20
+
+# k-means training: sampled jobs per cluster and passes over the sample
+TRAINING_ROWS_PER_CLUSTER = 64
+TRAINING_ITERATIONS = 10
+# Rows assigned to centroids per matrix multiply
+ASSIGN_BLOCK = 8192
+
+# Saved index: job ids and vectors ordered by cluster, cluster i holding rows offsets[i]:offsets[i + 1]
+Index = namedtuple('Index', 'ids vectors centroids offsets order sorted_ids')
+# Profiles of a batch of users; applied_rows/applied_ids are (row, job id) pairs to leave out
+Profiles = namedtuple('Profiles', 'user_ids vectors applied_rows applied_ids')
+
+
+def fold(vectors, dim):
+    """Fold hashed vectors into ``dim`` buckets (a divisor of their width) and normalize them.
+
+    A term in bucket ``crc % width`` lands in ``crc % dim``, the bucket it
+    would have had in a ``dim``-wide hash.
+    """
+    count, width = vectors.shape
+    if width % dim:
+        raise ValueError(f'RECOMMENDATIONS_DIMENSIONS ({dim}) must divide MATCHING_DIMENSIONS ({width})')
+    return normalize(vectors.reshape(count, width // dim, dim).sum(axis=1))
+
+
+def sum_by(groups, values, count):
+    """Sum the rows of ``values`` by group number into a (count, width) array."""
+    sums = np.zeros((count, values.shape[1]), dtype=np.float32)
+    if len(groups):
+        order = np.argsort(groups, kind='stable')
+        groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        sums[groups[starts]] = np.add.reduceat(values[order], starts, axis=0)
+    return sums
+
+
+def assign(vectors, centroids):
+    """Index of the nearest centroid of each unit vector."""
+    return np.concatenate([np.argmax(vectors[start:start + ASSIGN_BLOCK] @ centroids.T, axis=1)
+                           for start in range(0, len(vectors), ASSIGN_BLOCK)] or [np.zeros(0, dtype=np.int64)])
+
+
+def kmeans(vectors, clusters, seed=0):
+    """Spherical k-means centroids of unit ``vectors``, trained on a sample of them."""
+    rng = np.random.default_rng(seed)
+    size = min(len(vectors), clusters * TRAINING_ROWS_PER_CLUSTER)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), size, replace=False))])
+    centroids = sample[rng.choice(size, clusters, replace=False)].copy()
+    for _ in range(TRAINING_ITERATIONS):
+        assigned = assign(sample, centroids)
+        sums = sum_by(assigned, sample, clusters)
+        # Reseed clusters left empty with random rows
+        empty = np.flatnonzero(np.bincount(assigned, minlength=clusters) == 0)
+        sums[empty] = sample[rng.choice(size, len(empty))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def _top(scores, k):
+    """Column indices and values of the ``k`` highest scores in each row, unordered."""
+    k = min(k, scores.shape[1])
+    picked = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return picked, np.take_along_axis(scores, picked, axis=1)
+
+
+class RecommendationIndex:
+    """Clustered job vectors plus the routines that keep ``job_recommendations`` current."""
+
+    def __init__(self, path, dim, clusters, probes, top_k, batch_size):
+        self.files = IndexDirectory(path)
+        self.dim = dim
+        self.clusters = clusters
+        self.probes = probes
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self._index = None
+        # (index version, last job id, ids, vectors) of jobs posted since the build
+        self._fresh = None
+
+    @property
+    def built(self):
+        return self.files.exists('centroids')
+
+    def index(self):
+        """The saved index, reloaded when another process has built a newer one; None before the first build."""
+        if not self.built:
+            return None
+        with self.files.locked():
+            version = self.files.modified('centroids')
+            if self._index is None or self._index[0] != version:
+                ids = self.files.load('ids')
+                order = np.argsort(ids, kind='stable')
+                self._index = (version, Index(
+                    ids=ids,
+                    vectors=self.files.load('vectors', mmap=True),
+                    centroids=self.files.load('centroids'),
+                    offsets=self.files.load('offsets'),
+                    order=order,
+                    sorted_ids=ids[order],
+                ))
+        return self._index[1]
+
+    def _embed_jobs(self, rows):
+        return fold(get_matching_engine().embed_jobs(rows), self.dim)
+
+    def build(self):
+        """Embed every job and save the clustered index; return the number of jobs."""
+        ids, chunks = [], []
+        rows = db.session.execute(select(Job.id, *[getattr(Job, field) for field in JOB_FIELDS])
+                                  .order_by(Job.id).execution_options(yield_per=self.batch_size))
+        for batch in rows.partitions():
+            chunks.append(self._embed_jobs(batch))
+            ids.extend(row.id for row in batch)
+        vectors = np.concatenate(chunks) if chunks else np.zeros((0, self.dim), dtype=np.float32)
+        del chunks
+        ids = np.array(ids, dtype=np.int64)
+
+        clusters = min(self.clusters or int(round(math.sqrt(len(ids)))), len(ids))
+        centroids = kmeans(vectors, clusters) if clusters else np.zeros((0, self.dim), dtype=np.float32)
+        assigned = assign(vectors, centroids) if clusters else np.zeros(0, dtype=np.int64)
+        order = np.argsort(assigned, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assigned, minlength=clusters))]).astype(np.int64)
+
+        with self.files.locked():
+            self.files.save('ids', ids[order])
+            self.files.save('vectors', vectors[order])
+            self.files.save('offsets', offsets)
+            # Last: its modification time is the index version readers compare
+            self.files.save('centroids', centroids)
+        return len(ids)
+
+    def _fresh_jobs(self, index):
+        """(ids, vectors) of the jobs posted since ``index`` was built."""
+        version = self._index[0]
+        if self._fresh is None or self._fresh[0] != version:
+            last_id = int(index.sorted_ids[-1]) if len(index.sorted_ids) else 0
+            self._fresh = (version, last_id, np.zeros(0, dtype=np.int64), np.zeros((0, self.dim), dtype=np.float32))
+        _, last_id, ids, vectors = self._fresh
+        rows = db.session.execute(select(Job.id, *[getattr(Job, field) for field in JOB_FIELDS])
+                                  .where(Job.id > last_id).order_by(Job.id)).all()
+        if rows:
+            ids = np.concatenate([ids, np.array([row.id for row in rows], dtype=np.int64)])
+            vectors = np.concatenate([vectors, self._embed_jobs(rows)])
+            self._fresh = (version, int(ids[-1]), ids, vectors)
+        return ids, vectors
+
+    def _lookup(self, index, fresh_ids, job_ids):
+        """(index row, fresh row) of each job id, -1 where the job is not there."""
+        def find(sorted_ids, wanted):
+            if not len(sorted_ids):
+                return np.full(len(wanted), -1, dtype=np.int64)
+            found = np.minimum(np.searchsorted(sorted_ids, wanted), len(sorted_ids) - 1)
+            return np.where(sorted_ids[found] == wanted, found, -1)
+
+        in_index = find(index.sorted_ids, job_ids)
+        return np.where(in_index >= 0, index.order[in_index], -1), find(fresh_ids, job_ids)
+
+    def profiles(self, user_ids):
+        """Profile vectors of ``user_ids`` from their resumes and recent applications.
+
+        Users with neither get a zero vector and no recommendations.
+        """
+        index = self.index()
+        fresh_ids, fresh_vectors = self._fresh_jobs(index)
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        rows = {int(user_id): i for i, user_id in enumerate(user_ids)}
+        vectors = np.zeros((len(user_ids), self.dim), dtype=np.float32)
+
+        resumes = db.session.execute(
+            select(Resume.user_id, Resume.education, Resume.experience, Resume.introduction)
+            .where(Resume.user_id.in_(list(rows)))).all()
+        if resumes:
+            embedded = fold(get_matching_engine().embed_resumes(resumes), self.dim)
+            vectors[[rows[resume.user_id] for resume in resumes]] = RESUME_WEIGHT * embedded
+
+        applied = db.session.execute(
+            select(Application.user_id, Application.job_id).where(Application.user_id.in_(list(rows)))
+            .order_by(Application.user_id, Application.created_at.desc())).all()
+        applied_rows = np.array([rows[user_id] for user_id, _ in applied], dtype=np.int64)
+        applied_ids = np.array([job_id for _, job_id in applied], dtype=np.int64)
+        if len(applied_ids):
+            # Rank of each application within its user's, newest first
+            starts = np.flatnonzero(np.r_[True, applied_rows[1:] != applied_rows[:-1]])
+            rank = np.arange(len(applied_rows)) - np.repeat(starts, np.diff(np.r_[starts, len(applied_rows)]))
+            recent = rank < HISTORY_SIZE
+            in_index, in_fresh = self._lookup(index, fresh_ids, applied_ids[recent])
+            history = np.zeros((int(recent.sum()), self.dim), dtype=np.float32)
+            history[in_index >= 0] = index.vectors[in_index[in_index >= 0]]
+            history[in_fresh >= 0] = fresh_vectors[in_fresh[in_fresh >= 0]]
+            vectors += HISTORY_WEIGHT * normalize(sum_by(applied_rows[recent], history, len(user_ids)))
+        return Profiles(user_ids, normalize(vectors), applied_rows, applied_ids)
+
+    def rank(self, profiles):
+        """Return (job ids, scores) arrays of shape (users, top_k), best first, -1 padded."""
+        index = self.index()
+        fresh_ids, fresh_vectors = self._fresh_jobs(index)
+        vectors = profiles.vectors
+        count, k = len(vectors), self.top_k
+        probes = min(self.probes, len(index.centroids))
+        # One slot of k candidates per probed cluster, plus one for the fresh jobs
+        best_scores = np.full((count, probes + 1, k), -np.inf, dtype=np.float32)
+        best_ids = np.full((count, probes + 1, k), -1, dtype=np.int64)
+        in_index, in_fresh = self._lookup(index, fresh_ids, profiles.applied_ids)
+        excluded = np.argsort(in_index, kind='stable')
+        excluded_positions = in_index[excluded]
+
+        def offer(rows, slot, scores, ids):
+            top, top_scores = _top(scores, k)
+            best_scores[rows, slot, :top.shape[1]] = top_scores
+            best_ids[rows, slot, :top.shape[1]] = ids[top]
+
+        if probes:
+            nearest = np.argpartition(-(vectors @ index.centroids.T), probes - 1, axis=1)[:, :probes]
+            # Visit each probed cluster once, with every profile that probes it
+            flat = nearest.ravel()
+            by_cluster = np.argsort(flat, kind='stable')
+            clusters = flat[by_cluster]
+            starts = np.flatnonzero(np.r_[True, clusters[1:] != clusters[:-1]])
+            block_row = np.full(count, -1, dtype=np.int64)
+            for start, end in zip(starts, np.r_[starts[1:], len(clusters)]):
+                first, last = index.offsets[clusters[start]], index.offsets[clusters[start] + 1]
+                if first == last:
+                    continue
+                members = by_cluster[start:end]
+                rows, slots = members // probes, members % probes
+                scores = vectors[rows] @ np.asarray(index.vectors[first:last]).T
+                # Leave out the jobs in this cluster that these users applied to
+                low, high = np.searchsorted(excluded_positions, [first, last])
+                if low < high:
+                    block_row[rows] = np.arange(len(rows))
+                    pairs = excluded[low:high]
+                    hit = block_row[profiles.applied_rows[pairs]]
+                    scores[hit[hit >= 0], in_index[pairs][hit >= 0] - first] = -np.inf
+                    block_row[rows] = -1
+                offer(rows, slots, scores, index.ids[first:last])
+
+        if len(fresh_ids):
+            scores = vectors @ fresh_vectors.T
+            applied = in_fresh >= 0
+            scores[profiles.applied_rows[applied], in_fresh[applied]] = -np.inf
+            offer(np.arange(count), probes, scores, fresh_ids)
+
+        top, top_scores = _top(best_scores.reshape(count, -1), k)
+        top_ids = np.take_along_axis(best_ids.reshape(count, -1), top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top_ids = np.take_along_axis(top_ids, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        top_ids[~(top_scores > 0)] = -1
+        return top_ids, top_scores
+
+    def store(self, user_ids, job_ids, scores):
+        """Replace the lists of ``user_ids`` in the current transaction; the caller commits."""
+        user_ids = [int(user_id) for user_id in user_ids]
+        now = datetime.utcnow()
+        db.session.execute(delete(JobRecommendation).where(JobRecommendation.user_id.in_(user_ids)))
+        rows = [
+            {'user_id': user_id, 'job_id': int(job_id), 'score': float(score), 'computed_at': now}
+            for user_id, row_ids, row_scores in zip(user_ids, job_ids, scores)
+            for job_id, score in zip(row_ids, row_scores)
+            if job_id >= 0
+        ]
+        if rows:
+            db.session.execute(JobRecommendation.__table__.insert(), rows)
+        return len(rows)
+
+    def update_users(self, user_ids):
+        """Recompute and store the lists of ``user_ids``; the caller commits."""
+        if not self.built:
+            return 0
+        profiles = self.profiles(user_ids)
+        return self.store(profiles.user_ids, *self.rank(profiles))
+
+    def _update_where(self, criteria, on_progress=None):
+        """Update users matching ``criteria`` in batches, committing each; return the count."""
+        updated = 0
+        last_id = 0
+        has_profile = or_(exists().where(Resume.user_id == User.id),
+                          exists().where(Application.user_id == User.id))
+        while True:
+            user_ids = db.session.scalars(
+                select(User.id).where(User.id > last_id, has_profile, *criteria)
+                .order_by(User.id).limit(self.batch_size)).all()
+            if not user_ids:
+                return updated
+            last_id = user_ids[-1]
+            self.update_users(user_ids)
+            updated += len(user_ids)
+            if on_progress is not None:
+                on_progress({'users': updated})
+            db.session.commit()
+
+    def rebuild(self, on_progress=None):
+        """Rebuild the index, then every user's list; return the number of users."""
+        self.build()
+        return self._update_where([], on_progress)
+
+    def refresh(self, older_than, on_progress=None):
+        """Recompute the lists computed before ``older_than`` (or never); return the number of users."""
+        current = exists().where(JobRecommendation.user_id == User.id,
+                                 JobRecommendation.computed_at >= older_than)
+        return self._update_where([~current], on_progress)
+
+
+def get_index():
+    config = current_app.config
+    index = current_app.extensions.get('recommendations')
+    if index is None:
+        index = RecommendationIndex(config['RECOMMENDATIONS_INDEX_PATH'], config['RECOMMENDATIONS_DIMENSIONS'],
+                                    config['RECOMMENDATIONS_CLUSTERS'], config['RECOMMENDATIONS_PROBES'],
+                                    config['RECOMMENDATIONS_TOP_K'], config['RECOMMENDATIONS_BATCH_SIZE'])
+        current_app.extensions['recommendations'] = index
+    return index
+
+
+def recommended_jobs_statement(user_id, fresh_after, limit):
+    """SELECT for the recommended jobs of ``user_id`` from lists computed since ``fresh_after``."""
+    return select(Job).join(JobRecommendation, JobRecommendation.job_id == Job.id) \
+        .where(JobRecommendation.user_id == user_id, JobRecommendation.computed_at >= fresh_after) \
+        .order_by(JobRecommendation.score.desc()) \
+        .limit(limit)
+
+
+def fresh_after():
+    """Oldest computation time of a list that may still be shown."""
+    return datetime.utcnow() - timedelta(seconds=current_app.config['RECOMMENDATIONS_MAX_AGE'])
+
+
+def recommended_jobs(user_id, limit=None):
+    """Recommended jobs of ``user_id`` in one indexed lookup; empty if the list is missing or stale."""
+    limit = limit or current_app.config['RECOMMENDATIONS_TOP_K']
+    return db.session.scalars(recommended_jobs_statement(user_id, fresh_after(), limit)).all()
+
+
+@task('recommendations.update_user')
+def update_user_task(user_id):
+    get_index().update_users([user_id])
+    db.session.commit()
+
+
+@task('recommendations.rebuild', max_attempts=1)
+def rebuild_task():
+    get_index().rebuild(on_progress=report_progress)
+
+
+recommendations_cli = AppGroup('recommendations', help='Precomputed per-user job recommendations.')
+
+
+@recommendations_cli.command('rebuild')
+def rebuild_command():
+    """Rebuild the job index and every user's recommendations."""
+    count = get_index().rebuild()
+    click.echo(f'Recommended jobs to {count} users.')
+
+
+@recommendations_cli.command('refresh')
+def refresh_command():
+    """Recompute the recommendations older than half of RECOMMENDATIONS_MAX_AGE."""
+    max_age = current_app.config['RECOMMENDATIONS_MAX_AGE']
+    count = get_index().refresh(datetime.utcnow() - timedelta(seconds=max_age / 2))
+    click.echo(f'Refreshed recommendations of {count} users.')
@@ -1,12 +1,31 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, Response, stream_with_context, abort
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import User, Job, Resume, Application, Role
-from app.forms import LoginForm, RegistrationForm, JobForm, ResumeForm, JobSearchForm, EditProfileForm, ChangePasswordForm
+from app.forms import LoginForm, RegistrationForm, JobForm, ResumeForm, JobSearchForm, EditProfileForm, ChangePasswordForm, JobImportForm
+from app.search import search_engine, SEARCH_PARAMS
+from app.facets import FACETS, FACET_LABELS, chosen_values
+from app.suggest import DEFAULT_LIMIT, MAX_LIMIT
+from app.pagination import keyset_paginate, estimated_count
+from app.queries import application_counts_by_job, application_counts_by_user, applications_with_details
+from app import stats
+from app.cache import cache, snapshot_job
+from app import similarity
+from app import recommendations
+from app import tasks
+from app import deletion
+from app import bulk
+from app.metrics import metrics
+from app.identity import identity_cache
+from app.passwords import password_hasher
+from app.database import read_only
+from app.httpcache import public_page
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime, timedelta
 from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 import json
 
 # Blueprint definitions
@@ -17,50 +36,113 @@ admin_bp = Blueprint('admin', __name__)
 
 # Main routes
 @main_bp.route('/')
+@read_only
+@public_page
 def index():
     """Home page with latest job listings"""
-    jobs = Job.query.order_by(Job.created_at.desc()).limit(10).all()
-    return render_template('home.html', jobs=jobs)
+    jobs = cache.get_or_set(
+        'index:latest_jobs',
+        lambda: [snapshot_job(job) for job in Job.query.order_by(Job.created_at.desc()).limit(10)],
+        tags=('jobs',)
+    )
+    recommended = []
+    if current_user.is_authenticated:
+        recommended = recommendations.recommended_jobs(current_user.id)
+    return render_template('home.html', jobs=jobs, recommended=recommended)
 
 @main_bp.route('/search', methods=['GET', 'POST'])
+@read_only
 def search():
     """Search for jobs"""
     form = JobSearchForm()
     jobs = []
+    pagination = None
+    search_args = {}
+    chosen = chosen_values(request.args)
     
-    if form.validate_on_submit() or request.args.get('title'):
+    if form.validate_on_submit() or any(request.args.get(field) for field in SEARCH_PARAMS + FACETS):
         # Get search parameters
         title = form.title.data or request.args.get('title', '')
         location = form.location.data or request.args.get('location', '')
         salary = form.salary.data or request.args.get('salary', '')
+        sort = form.sort.data or request.args.get('sort', '')
+        cursor = request.args.get('cursor')
         
-        # Build query
-        query = Job.query
-        
-        if title:
-            query = query.filter(Job.title.ilike(f'%{title}%'))
-        if location:
-            query = query.filter(Job.location.ilike(f'%{location}%'))
-        if salary:
-            query = query.filter(Job.salary.ilike(f'%{salary}%'))
-        
-        jobs = query.order_by(Job.created_at.desc()).all()
-    
-    return render_template('search.html', form=form, jobs=jobs)
+        search_args = {'title': title, 'location': location, 'salary': salary, 'sort': sort}
+        pagination = search_engine.search(cursor=cursor, facets=chosen, **search_args)
+        jobs = pagination.items
+    
+    # Counts for the text searched (or all jobs), from the in-process facet bitmaps
+    facets = search_engine.facet_counts(search_args.get('title'), search_args.get('location'),
+                                        search_args.get('salary'), chosen)
+    search_args.update(chosen)
+    return render_template('search.html', form=form, jobs=jobs, pagination=pagination, search_args=search_args,
+                           facets=facets, facet_labels=FACET_LABELS)
+
+@main_bp.route('/search/suggest')
+@read_only
+def search_suggest():
+    """Typeahead for the search form: ``field`` (title or location) values completing ``q``"""
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    suggestions = search_engine.suggest(request.args.get('field', 'title'), request.args.get('q', ''), limit)
+    response = jsonify([{'text': text, 'jobs': count} for text, count in suggestions])
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@main_bp.route('/search/pages')
+@read_only
+def search_pages():
+    """Stream search results as newline-delimited JSON, one page per line"""
+    search_args = {field: request.args.get(field, '') for field in SEARCH_PARAMS}
+    chosen = chosen_values(request.args)
+    cursor = request.args.get('cursor')
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    max_pages = min(request.args.get('max_pages', 10, type=int), 100)
+    
+    def generate(cursor):
+        for _ in range(max_pages):
+            page = search_engine.search(cursor=cursor, per_page=per_page, facets=chosen, **search_args)
+            yield json.dumps({
+                'total': page.total,
+                'next_cursor': page.next_cursor,
+                'jobs': [{
+                    'id': job.id,
+                    'title': job.title,
+                    'location': job.location,
+                    'salary': job.salary,
+                    'created_at': job.created_at.isoformat() if job.created_at else None
+                } for job in page.items]
+            }) + '\n'
+            # Release the page's ORM objects before fetching the next one
+            db.session.expunge_all()
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+    
+    return Response(stream_with_context(generate(cursor)), mimetype='application/x-ndjson')
+
+def job_exists(job_id):
+    return db.session.query(Job.id).filter_by(id=job_id).first() is not None
 
 @main_bp.route('/job/<int:job_id>')
+@read_only
+@public_page(exists=job_exists)
 def job_details(job_id):
     """View details of a specific job"""
-    job = Job.query.get_or_404(job_id)
+    def load():
+        job = Job.query.get(job_id)
+        if job is None:
+            return None
+        similar_jobs = similarity.similar_jobs(job_id, limit=3)
+        return snapshot_job(job), [snapshot_job(similar_job) for similar_job in similar_jobs]
     
-
-    similar_jobs = Job.query.filter(
-        (Job.location == job.location) | 
-        (Job.title.like(f'%{job.title.split()[0]}%')),
-        Job.id != job.id
-    ).limit(3).all()
+    cached = cache.get_or_set(f'job:{job_id}', load, tags=('jobs', f'job:{job_id}'))
+    if cached is None:
+        abort(404)
+    job, similar_jobs = cached
+    applied = current_user.is_authenticated and current_user.has_applied_to(job_id)
     
-    return render_template('job_details.html', job=job, similar_jobs=similar_jobs)
+    return render_template('job_details.html', job=job, similar_jobs=similar_jobs, applied=applied)
 
 # Authentication routes
 @auth_bp.route('/login', methods=['GET', 'POST'])
@@ -73,6 +155,10 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            if password_hasher.needs_rehash(user.password_hash):
+                # Upgrade hashes made under an older or cheaper policy while we have the password
+                user.set_password(form.password.data)
+                db.session.commit()
             login_user(user)
             next_page = request.args.get('next')
             if user.is_admin():
@@ -103,7 +189,10 @@ def register():
             password=form.password.data
         )
         db.session.add(user)
+        db.session.flush()
+        stats.record_user(user)
         db.session.commit()
+        cache.invalidate('users')
         flash('Registration successful! You can now log in.')
         return redirect(url_for('auth.login'))
     
@@ -111,14 +200,18 @@ def register():
 
 # User routes
 @user_bp.route('/profile')
+@read_only
 @login_required
 def profile():
     """User profile page"""
-    from app.models import Application  # 导入 Application 模型
+    recent_applications = current_user.applications.options(joinedload(Application.job)) \
+        .order_by(Application.created_at.desc()).limit(5).all()
+    user_resume = Resume.query.filter_by(user_id=current_user.id).first()
     
-    return render_template('user/profile.html', Application=Application)
+    return render_template('user/profile.html', recent_applications=recent_applications, user_resume=user_resume)
 
 @user_bp.route('/resume')
+@read_only
 @login_required
 def resume():
     """View or edit resume"""
@@ -154,6 +247,7 @@ def create_resume():
             user_resume.experience = form.experience.data
             user_resume.introduction = form.introduction.data
             user_resume.updated_at = datetime.utcnow()
+            tasks.enqueue('matching.score', resume_id=user_resume.id)
             flash('Your resume has been updated!')
         else:
             # Create new resume
@@ -170,6 +264,7 @@ def create_resume():
             db.session.add(new_resume)
             flash('Your resume has been created!')
         
+        tasks.enqueue('recommendations.update_user', user_id=current_user.id)
         db.session.commit()
         return redirect(url_for('user.profile'))
     
@@ -203,17 +298,35 @@ def apply_job(job_id):
         resume_id=resume.id
     )
     db.session.add(application)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # A concurrent request for the same user and job won the unique constraint
+        db.session.rollback()
+        flash('You have already applied for this job.')
+        return redirect(url_for('main.job_details', job_id=job_id))
+    stats.record_application(application)
+    tasks.enqueue('matching.score', application_id=application.id)
+    tasks.enqueue('recommendations.update_user', user_id=current_user.id)
     db.session.commit()
+    cache.invalidate('applications')
+    identity_cache.invalidate_user(current_user.id)
     
     flash('Application submitted successfully!')
     return redirect(url_for('user.applications'))
 
 @user_bp.route('/applications')
+@read_only
 @login_required
 def applications():
     """View user's job applications"""
-    applications = Application.query.filter_by(user_id=current_user.id).order_by(Application.created_at.desc()).all()
-    return render_template('user/applications.html', applications=applications)
+    query = Application.query.filter_by(user_id=current_user.id)
+    pagination = keyset_paginate(
+        query.options(joinedload(Application.job)), [Application.created_at, Application.id],
+        cursor=request.args.get('cursor'), per_page=20,
+        total=estimated_count(query, ('user_applications', current_user.id))
+    )
+    return render_template('user/applications.html', applications=pagination.items, pagination=pagination)
 
 @user_bp.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
@@ -223,7 +336,8 @@ def edit_profile():
     
     if form.validate_on_submit():
 
-        if form.username.data != current_user.username and User.query.filter_by(username=form.username.data).first():
+        if form.username.data != current_user.username and \
+                User.query.execution_options(include_deleted=True).filter_by(username=form.username.data).first():
             flash('This username is already taken.')
             return render_template('user/edit_profile.html', form=form)
         
@@ -231,6 +345,10 @@ def edit_profile():
         current_user.username = form.username.data
         current_user.email = form.email.data
         db.session.commit()
+        identity_cache.invalidate_user(current_user.id)
+        if current_user.is_admin():
+            # Cached job pages show the poster's username
+            cache.invalidate('jobs')
         
         flash('Your profile has been updated.')
         return redirect(url_for('user.profile'))
@@ -252,6 +370,7 @@ def change_password():
 
         current_user.set_password(form.new_password.data)
         db.session.commit()
+        identity_cache.invalidate_user(current_user.id)
         
         flash('Your password has been updated.')
         return redirect(url_for('user.profile'))
@@ -268,29 +387,20 @@ def dashboard():
         return redirect(url_for('main.index'))
     
 
-    job_count = Job.query.count()
-    user_count = User.query.count()
-    application_count = Application.query.count()
-    accepted_count = Application.query.filter_by(status='Accepted').count()
-    
-
-    application_data = []
-    for i in range(7, 0, -1):
-        date = datetime.utcnow() - timedelta(days=i*5)
-        count = Application.query.filter(
-            Application.created_at >= date.replace(hour=0, minute=0, second=0),
-            Application.created_at <= date.replace(hour=23, minute=59, second=59)
-        ).count()
-        application_data.append(count)
-    
-
-    pending_count = Application.query.filter_by(status='Pending').count()
-    reviewed_count = Application.query.filter_by(status='Reviewed').count()
-    rejected_count = Application.query.filter_by(status='Rejected').count()
+    def load():
+        summary = stats.dashboard_stats(stats.sample_days())
+        recent_jobs = Job.query.order_by(Job.created_at.desc()).limit(5).all()
+        return summary, [snapshot_job(job) for job in recent_jobs], application_counts_by_job(recent_jobs)
     
-    status_data = [pending_count, reviewed_count, rejected_count, accepted_count]
-
-    recent_jobs = Job.query.order_by(Job.created_at.desc()).limit(5).all()
+    summary, recent_jobs, application_counts = cache.get_or_set(
+        'admin:dashboard', load, tags=('jobs', 'applications', 'users')
+    )
+    job_count = summary['totals'][stats.JOBS]
+    user_count = summary['totals'][stats.USERS]
+    application_count = summary['totals'][stats.APPLICATIONS]
+    accepted_count = summary['by_status']['Accepted']
+    application_data = summary['daily']
+    status_data = [summary['by_status'][status] for status in ('Pending', 'Reviewed', 'Rejected', 'Accepted')]
     
     return render_template(
         'admin/dashboard.html',
@@ -300,7 +410,8 @@ def dashboard():
         accepted_count=accepted_count,
         application_data=json.dumps(application_data),
         status_data=json.dumps(status_data),
-        recent_jobs=recent_jobs
+        recent_jobs=recent_jobs,
+        application_counts=application_counts
     )
 
 @admin_bp.route('/jobs')
@@ -311,8 +422,14 @@ def manage_jobs():
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('main.index'))
     
-    jobs = Job.query.order_by(Job.created_at.desc()).all()
-    return render_template('admin/jobs.html', jobs=jobs)
+    pagination = keyset_paginate(
+        Job.query, [Job.created_at, Job.id],
+        cursor=request.args.get('cursor'), per_page=50,
+        total=estimated_count(Job.query, 'admin_jobs', model=Job)
+    )
+    application_counts = application_counts_by_job(pagination.items)
+    return render_template('admin/jobs.html', jobs=pagination.items, pagination=pagination,
+                           application_counts=application_counts)
 
 @admin_bp.route('/jobs/create', methods=['GET', 'POST'])
 @login_required
@@ -334,12 +451,49 @@ def create_job():
             posted_by=current_user.id
         )
         db.session.add(job)
+        db.session.flush()
+        stats.record_job(job)
+        tasks.enqueue('similarity.update_job', job_id=job.id)
         db.session.commit()
+        search_engine.index_job(job)
+        cache.invalidate('jobs')
         flash('Job posted successfully!')
         return redirect(url_for('admin.manage_jobs'))
     
     return render_template('admin/create_job.html', form=form)
 
+@admin_bp.route('/jobs/import', methods=['GET', 'POST'])
+@login_required
+def import_jobs():
+    """Import job postings from an uploaded CSV or NDJSON file"""
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.')
+        return redirect(url_for('main.index'))
+    
+    form = JobImportForm()
+    result = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        result = bulk.import_jobs(upload.stream, bulk.format_for(upload.filename), posted_by=current_user.id)
+        flash(f'Imported {result.imported} jobs; {result.failed} rows rejected.')
+    
+    return render_template('admin/import_jobs.html', form=form, result=result)
+
+@admin_bp.route('/export/<table>.<fmt>')
+@read_only
+@login_required
+def export_data(table, fmt):
+    """Stream all jobs or applications as a CSV or NDJSON download"""
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.')
+        return redirect(url_for('main.index'))
+    if table not in bulk.EXPORTS or fmt not in bulk.FORMATS:
+        abort(404)
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(bulk.export(table, fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={table}.{fmt}'})
+
 @admin_bp.route('/jobs/edit/<int:job_id>', methods=['GET', 'POST'])
 @login_required
 def edit_job(job_id):
@@ -358,7 +512,11 @@ def edit_job(job_id):
         job.location = form.location.data
         job.salary = form.salary.data
         job.contact_info = form.contact_info.data
+        tasks.enqueue('similarity.update_job', job_id=job.id)
+        tasks.enqueue('matching.score', job_id=job.id)
         db.session.commit()
+        search_engine.index_job(job)
+        cache.invalidate('jobs')
         flash('Job updated successfully!')
         return redirect(url_for('admin.manage_jobs'))
     
@@ -382,11 +540,13 @@ def delete_job(job_id):
     
     job = Job.query.get_or_404(job_id)
     
-    # Delete all applications for this job
-    Application.query.filter_by(job_id=job_id).delete()
-    
-    db.session.delete(job)
+    # Hidden now; the job and its applications are purged in batches by the task worker
+    deletion.soft_delete(job)
     db.session.commit()
+    search_engine.remove_job(job_id)
+    cache.invalidate('jobs', 'applications')
+    # Application counts changed for every applicant
+    identity_cache.invalidate_all()
     flash('Job deleted successfully!')
     return redirect(url_for('admin.manage_jobs'))
 
@@ -398,8 +558,52 @@ def manage_applications():
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('main.index'))
     
-    applications = Application.query.order_by(Application.created_at.desc()).all()
-    return render_template('admin/applications.html', applications=applications)
+    sort = request.args.get('sort', '')
+    if sort == 'score':
+        # Unscored applications have no place in the score order until the worker reaches them
+        pagination = keyset_paginate(
+            applications_with_details().filter(Application.match_score.isnot(None)),
+            [Application.match_score, Application.id], cursor=request.args.get('cursor'), per_page=50
+        )
+        unscored = estimated_count(Application.query.filter(Application.match_score.is_(None)),
+                                   'admin_applications_unscored')
+    else:
+        sort = ''
+        pagination = keyset_paginate(
+            applications_with_details(), [Application.created_at, Application.id],
+            cursor=request.args.get('cursor'), per_page=50,
+            total=estimated_count(Application.query, 'admin_applications', model=Application)
+        )
+        unscored = 0
+    return render_template('admin/applications.html', applications=pagination.items, pagination=pagination,
+                           sort=sort, unscored=unscored, list_args={})
+
+@admin_bp.route('/jobs/<int:job_id>/applicants')
+@login_required
+def job_applicants(job_id):
+    """Applicants for one job, best match first"""
+    if not current_user.is_admin():
+        flash('Access denied. Admin privileges required.')
+        return redirect(url_for('main.index'))
+    
+    job = Job.query.get_or_404(job_id)
+    query = applications_with_details().filter(Application.job_id == job_id)
+    sort = request.args.get('sort', 'score')
+    if sort == 'score':
+        pagination = keyset_paginate(
+            query.filter(Application.match_score.isnot(None)), [Application.match_score, Application.id],
+            cursor=request.args.get('cursor'), per_page=50
+        )
+        unscored = Application.query.filter(Application.job_id == job_id,
+                                            Application.match_score.is_(None)).count()
+    else:
+        sort = 'newest'
+        pagination = keyset_paginate(
+            query, [Application.created_at, Application.id], cursor=request.args.get('cursor'), per_page=50
+        )
+        unscored = 0
+    return render_template('admin/applications.html', applications=pagination.items, pagination=pagination,
+                           sort=sort, unscored=unscored, job=job, list_args={'job_id': job.id})
 
 @admin_bp.route('/applications/update/<int:application_id>', methods=['POST'])
 @login_required
@@ -413,12 +617,18 @@ def update_application_status(application_id):
     status = request.form.get('status')
     
     if status in ['Pending', 'Reviewed', 'Rejected', 'Accepted']:
+        old_status = application.status
         application.status = status
         application.updated_at = datetime.utcnow()
+        stats.record_status_change(application, old_status)
         db.session.commit()
+        cache.invalidate('applications')
         flash('Application status updated!')
     
-    return redirect(url_for('admin.manage_applications'))
+    job_id = request.form.get('job_id', type=int)
+    if job_id:
+        return redirect(url_for('admin.job_applicants', job_id=job_id, sort=request.form.get('sort') or None))
+    return redirect(url_for('admin.manage_applications', sort=request.form.get('sort') or None))
 
 @admin_bp.route('/users')
 @login_required
@@ -428,8 +638,6 @@ def manage_users():
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('main.index'))
     
-    from app.models import Application
-    
     page = request.args.get('page', 1, type=int)
     per_page = 10
 
@@ -446,8 +654,10 @@ def manage_users():
     
     pagination = users.paginate(page=page, per_page=per_page)
     users = pagination.items
+    application_counts = application_counts_by_user(users)
     
-    return render_template('admin/users.html', users=users, pagination=pagination, Application=Application)
+    return render_template('admin/users.html', users=users, pagination=pagination,
+                           application_counts=application_counts)
 
 @admin_bp.route('/users/delete/<int:user_id>', methods=['POST'])
 @login_required
@@ -463,12 +673,11 @@ def delete_user(user_id):
         flash('You cannot delete yourself.')
         return redirect(url_for('admin.manage_users'))
 
-    Application.query.filter_by(user_id=user_id).delete()
-
-    Resume.query.filter_by(user_id=user_id).delete()
-
-    db.session.delete(user)
+    # Hidden now; the user, their applications and resumes are purged in batches by the task worker
+    deletion.soft_delete(user)
     db.session.commit()
+    cache.invalidate('users', 'applications')
+    identity_cache.invalidate_user(user_id)
     
     flash(f'User {user.username} has been deleted. ')
     return redirect(url_for('admin.manage_users'))
@@ -495,6 +704,7 @@ def toggle_role(user_id):
         flash(f'Admin {user.username} has been demoted to user.')
     
     db.session.commit()
+    identity_cache.invalidate_user(user_id)
     return redirect(url_for('admin.manage_users'))
 
 @admin_bp.route('/user/<int:user_id>/applications')
@@ -505,20 +715,47 @@ def user_applications(user_id):
         return jsonify({'error': 'Unauthorized access'}), 403
     
     user = User.query.get_or_404(user_id)
-    applications = []
-    
-    for app in user.applications.order_by(Application.created_at.desc()).limit(5).all():
-        job = Job.query.get(app.job_id)
-        if job:
-            applications.append({
-                'id': app.id,
-                'job_id': app.job_id,
-                'job_title': job.title,
-                'status': app.status,
-                'created_at': app.created_at.strftime('%Y-%m-%d')
-            })
+    # Job titles come from the same statement instead of one lookup per application
+    rows = db.session.query(Application.id, Application.job_id, Job.title, Application.status, Application.created_at) \
+        .join(Job, Application.job_id == Job.id) \
+        .filter(Application.user_id == user.id) \
+        .order_by(Application.created_at.desc()).limit(5)
+    applications = [{
+        'id': application_id,
+        'job_id': job_id,
+        'job_title': title,
+        'status': status,
+        'created_at': created_at.strftime('%Y-%m-%d')
+    } for application_id, job_id, title, status, created_at in rows]
     
     return jsonify({
         'user_id': user.id,
         'applications': applications
-    }) 
\ No newline at end of file
+    }) 
+
+@admin_bp.route('/cache/stats')
+@login_required
+def cache_stats():
+    """API endpoint with cache hit/miss/eviction counters for this worker"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    return jsonify(dict(cache.stats(), identity=identity_cache.stats()))
+
+@admin_bp.route('/tasks')
+@login_required
+def task_backlog():
+    """API endpoint with the background task backlog"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Unauthorized access'}), 403
+    
+    counts, oldest_age = tasks.backlog()
+    return jsonify({'tasks': counts, 'oldest_due_seconds': round(oldest_age, 1), 'running': tasks.running()})
+
+@admin_bp.route('/metrics')
+def metrics_export():
+    """Per-endpoint request, query and template metrics for this worker in Prometheus text format"""
+    if not metrics.authorized() and not (current_user.is_authenticated and current_user.is_admin()):
+        abort(403)
+    
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,160 @@
+"""Structured salaries parsed from the free-text ``Job.salary``.
+
+``Job.salary`` stays the text posters type and the pages show
+("HK$20,000 - HK$25,000"). ``parse_salary`` reads a currency and the lowest
+and highest amount out of it, and ``Job`` stores them in ``salary_currency``,
+``salary_min`` and ``salary_max`` whenever ``salary`` is assigned, so every
+ORM write path (``JobForm`` create and edit, the API) keeps them in step.
+Core inserts (``app.bulk``, the benchmark data generator) add
+``salary_columns(text)`` to their rows themselves.
+
+The columns are indexed with the currency first, so search can answer
+"at least HK$25,000" as a range scan and list jobs by salary in index order
+(see ``parse_salary_query`` and ``salary_criteria``). Amounts are compared
+as written; text without an amount ("Negotiable") leaves them NULL, and such
+jobs only match a salary search by their text. "Up to 30k" leaves just
+``salary_min`` NULL and "HK$25,000+" just ``salary_max``: an open bound.
+"""
+import re
+from collections import namedtuple
+
+from sqlalchemy import or_
+
+# Currency of amounts written without one, or with a bare "$"
+DEFAULT_CURRENCY = 'HKD'
+
+# Checked in order, so longer symbols come before the ones they contain
+CURRENCY_SYMBOLS = (
+    ('HK$', 'HKD'), ('US$', 'USD'), ('NT$', 'TWD'), ('S$', 'SGD'), ('A$', 'AUD'), ('C$', 'CAD'),
+    ('RMB', 'CNY'), ('£', 'GBP'), ('€', 'EUR'), ('$', DEFAULT_CURRENCY),
+)
+CURRENCY_CODES = {'HKD', 'USD', 'TWD', 'SGD', 'AUD', 'CAD', 'CNY', 'GBP', 'EUR', 'JPY', 'MOP'}
+
+CODE_RE = re.compile(r'\b([A-Za-z]{3})\b')
+# 20,000 / 20000 / 20.5k / 1.2M
+AMOUNT_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*([kKmM]\b)?')
+MULTIPLIERS = {'k': 1000, 'm': 1000000}
+
+# Text between the two ends of a range: "20 - 25k", "HK$20k to HK$25k", "20~25k"
+RANGE_SEPARATOR_RE = re.compile(r'\s*(?:[A-Za-z]{1,3}\$?|[$£€])?\s*(?:-|–|~|to)\s*(?:[A-Za-z]{1,3}\$?|[$£€])?\s*',
+                                re.IGNORECASE)
+
+# Words that bound the range from one side only, and a "+" right after an amount ("25k+")
+AT_MOST_RE = re.compile(r'\b(?:up\s+to|under|below|max(?:imum)?)\b|<=?', re.IGNORECASE)
+AT_LEAST_RE = re.compile(r'\b(?:at\s+least|from|over|above|min(?:imum)?)\b|>=?|\d[kKmM]?(?:\+|\s+\+\s*$)',
+                         re.IGNORECASE)
+
+Salary = namedtuple('Salary', 'currency minimum maximum')
+
+
+def _currency(text):
+    upper = text.upper()
+    # Codes first: "MOP$" is patacas, not the "$" it contains
+    for word in CODE_RE.findall(upper):
+        if word in CURRENCY_CODES:
+            return word
+    for symbol, code in CURRENCY_SYMBOLS:
+        if symbol in upper:
+            return code
+    return DEFAULT_CURRENCY
+
+
+def _amounts(text):
+    matches = []
+    for match in AMOUNT_RE.finditer(text):
+        number, suffix = match.groups()
+        try:
+            value = float(number.replace(',', ''))
+        except ValueError:
+            continue
+        matches.append((match, value, MULTIPLIERS[suffix.lower()] if suffix else 1))
+    amounts = []
+    for i, (match, value, multiplier) in enumerate(matches):
+        # "20-25k": a bare small number shares the unit of the other end of its range
+        if multiplier == 1 and value < 1000:
+            for j in (i + 1, i - 1):
+                if 0 <= j < len(matches) and matches[j][2] != 1:
+                    first, second = sorted((match, matches[j][0]), key=lambda m: m.start())
+                    if RANGE_SEPARATOR_RE.fullmatch(text, first.end(), second.start()):
+                        multiplier = matches[j][2]
+                        break
+        amounts.append(int(round(value * multiplier)))
+    if not amounts:
+        return []
+    # "HK$30,000 x 13 months": counts next to a salary are not amounts
+    return [amount for amount in amounts if amount * 100 >= max(amounts)]
+
+
+def _bounds(text, amounts, exact):
+    """(minimum, maximum) of ``amounts``, one of them None when the words bound one side only.
+
+    A single amount without such words is both bounds if ``exact`` (a job's
+    pay), else only the minimum (a search).
+    """
+    if len(amounts) > 1:
+        return min(amounts), max(amounts)
+    amount = amounts[0]
+    at_least = AT_LEAST_RE.search(text)
+    if AT_MOST_RE.search(text) and not at_least:
+        return None, amount
+    if exact and not at_least:
+        return amount, amount
+    return amount, None
+
+
+def parse_salary(text):
+    """Return a ``Salary`` for a job's salary text, or None if it names no amount.
+
+    "Up to 30k" leaves the minimum None and "HK$25,000+" the maximum; a
+    single amount without such words is both.
+    """
+    if not text:
+        return None
+    amounts = _amounts(text)
+    if not amounts:
+        return None
+    return Salary(_currency(text), *_bounds(text, amounts, exact=True))
+
+
+def salary_columns(text):
+    """The structured column values for a salary text, for Core inserts and updates."""
+    salary = parse_salary(text)
+    if salary is None:
+        return {'salary_currency': None, 'salary_min': None, 'salary_max': None}
+    return {'salary_currency': salary.currency, 'salary_min': salary.minimum, 'salary_max': salary.maximum}
+
+
+def parse_salary_query(text):
+    """Read a salary search as a ``Salary`` range; either bound may be None.
+
+    One amount is a lower bound ("25k", "at least HK$25,000") unless the
+    words say otherwise ("up to 30k"); two amounts are both bounds.
+    Returns None if the text has no amount.
+    """
+    if not text:
+        return None
+    amounts = _amounts(text)
+    if not amounts:
+        return None
+    return Salary(_currency(text), *_bounds(text, amounts, exact=False))
+
+
+def overlaps(salary, wanted):
+    """True if a job's ``Salary`` can pay something in the ``wanted`` range."""
+    if salary is None or salary.currency != wanted.currency:
+        return False
+    if wanted.minimum is not None and salary.maximum is not None and salary.maximum < wanted.minimum:
+        return False
+    if wanted.maximum is not None and salary.minimum is not None and salary.minimum > wanted.maximum:
+        return False
+    return True
+
+
+def salary_criteria(model, wanted):
+    """SQL form of ``overlaps`` for ``model``'s salary columns; a NULL bound is open."""
+    criteria = [model.salary_currency == wanted.currency]
+    if wanted.minimum is not None:
+        criteria.append(or_(model.salary_max >= wanted.minimum, model.salary_max.is_(None)))
+    if wanted.maximum is not None:
+        criteria.append(or_(model.salary_min <= wanted.maximum, model.salary_min.is_(None)))
+    return criteria
@@ -0,0 +1,466 @@
+"""Full-text job search.
+
+Two backends share one interface:
+
+* ``FullTextBackend`` pushes matching and ranking to MySQL FULLTEXT indexes
+  (see the ``ft_jobs_text`` / ``ft_jobs_location`` indexes on ``Job``).
+* ``InvertedIndexBackend`` is a pure-Python inverted index used when the
+  database has no FULLTEXT support (SQLite in development and testing). It is
+  built lazily per worker. The admin job write paths update it at once in
+  the worker that made the write; every other process catches up through
+  ``SearchEngine.sync``, which replays the ``job_changes`` log (see
+  ``app.httpcache``) at most every ``SEARCH_SYNC_INTERVAL`` seconds.
+
+A salary search with an amount ("25k", "20k-30k", "up to 30k") is a range
+over the structured salary columns (``app.salary``); other text still
+matches the salary as written. ``sort='salary'`` lists the best paid first
+by ``salary_max``, in one currency (the searched one, else the default), so
+jobs without a parsed salary drop out of that ordering.
+
+``SearchEngine.suggest`` completes title and location prefixes for the
+search form from the in-memory index in ``app.suggest``.
+
+Results can be narrowed by facet values (location, salary band, posting
+age); ``SearchEngine.facet_counts`` gives the counts next to them from the
+bitmaps in ``app.facets``.
+"""
+import bisect
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+
+from app import db
+from app.facets import FacetIndex, bitmap, toggle
+from app.httpcache import PUBLIC
+from app.models import ContentVersion, Job, JobChange
+from app.suggest import DEFAULT_LIMIT, SuggestIndex
+from app.salary import DEFAULT_CURRENCY, overlaps, parse_salary, parse_salary_query, salary_criteria
+from app.pagination import KeysetPage, decode_cursor, encode_cursor, estimated_count, keyset_filter
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Request parameters of a search
+SEARCH_PARAMS = ('title', 'location', 'salary', 'sort')
+
+# Orders besides the default (rank, then newest)
+SORT_SALARY = 'salary'
+SORTS = (SORT_SALARY,)
+
+# Job columns the in-process indexes read (besides id)
+INDEXED_FIELDS = ('title', 'description', 'requirements', 'location', 'salary', 'created_at')
+# Changed jobs re-read per query when syncing with other workers' writes
+SYNC_BATCH_SIZE = 1000
+
+# Relative weight of a term hit in each indexed text field
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'requirements': 1.5,
+    'description': 1.0,
+}
+
+
+def tokenize(value):
+    """Split text into lowercase word tokens."""
+    if not value:
+        return []
+    return TOKEN_RE.findall(value.lower())
+
+
+class InvertedIndexBackend:
+    """In-process inverted index over job title, description, requirements and location."""
+
+    name = 'python'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        # term -> {job_id: weighted term frequency}
+        self._postings = defaultdict(dict)
+        # location term -> {job_id}
+        self._locations = defaultdict(set)
+        # job_id -> (sort key, lowercase salary, text terms, location terms, parsed salary)
+        self._docs = {}
+
+    def warm(self):
+        self._ensure_loaded()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = db.session.query(
+                Job.id, Job.title, Job.description, Job.requirements,
+                Job.location, Job.salary, Job.created_at
+            ).execution_options(yield_per=1000)
+            for row in rows:
+                self._add(*row)
+            self._loaded = True
+
+    def _add(self, job_id, title, description, requirements, location, salary, created_at):
+        self._remove(job_id)
+        weights = defaultdict(float)
+        for field, value in (('title', title), ('description', description), ('requirements', requirements)):
+            for term in tokenize(value):
+                weights[term] += FIELD_WEIGHTS[field]
+        for term, weight in weights.items():
+            self._postings[term][job_id] = weight
+        location_terms = set(tokenize(location))
+        for term in location_terms:
+            self._locations[term].add(job_id)
+        sort_key = (created_at.timestamp() if created_at else 0.0, job_id)
+        self._docs[job_id] = (sort_key, (salary or '').lower(), set(weights), location_terms, parse_salary(salary))
+
+    def _remove(self, job_id):
+        doc = self._docs.pop(job_id, None)
+        if doc is None:
+            return
+        _, _, terms, location_terms, _ = doc
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(job_id, None)
+                if not postings:
+                    del self._postings[term]
+        for term in location_terms:
+            ids = self._locations.get(term)
+            if ids is not None:
+                ids.discard(job_id)
+                if not ids:
+                    del self._locations[term]
+
+    def index_job(self, job):
+        with self._lock:
+            if self._loaded:
+                self._add(job.id, job.title, job.description, job.requirements,
+                          job.location, job.salary, job.created_at)
+
+    def matching_ids(self, title, location, salary):
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._scores(title, location, salary))
+
+    def _scores(self, title, location, salary):
+        """Return {job_id: score} for the jobs matching the search text."""
+        wanted = parse_salary_query(salary)
+        docs = self._docs
+        scores = self._match(tokenize(title), tokenize(location))
+        if wanted is not None:
+            scores = {job_id: score for job_id, score in scores.items() if overlaps(docs[job_id][4], wanted)}
+        elif salary:
+            salary = salary.lower()
+            scores = {job_id: score for job_id, score in scores.items()
+                      if salary in docs[job_id][1]}
+        return scores
+
+    def remove_job(self, job_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(job_id)
+
+    def search(self, title, location, salary, after, per_page, sort='', selection=None):
+        self._ensure_loaded()
+        wanted = parse_salary_query(salary)
+        with self._lock:
+            docs = self._docs
+            scores = self._scores(title, location, salary)
+            if selection:
+                scores = {job_id: score for job_id, score in scores.items() if selection.contains(job_id)}
+            # Negated sort keys, (score, created_at, id) or (salary_max, id), so ascending order is best-first
+            if sort == SORT_SALARY:
+                currency = wanted.currency if wanted is not None else DEFAULT_CURRENCY
+                ranked = []
+                for job_id in scores:
+                    parsed = docs[job_id][4]
+                    if parsed is not None and parsed.currency == currency and parsed.maximum is not None:
+                        ranked.append((-parsed.maximum, -job_id))
+                ranked.sort()
+            else:
+                ranked = sorted((-score, -docs[job_id][0][0], -job_id) for job_id, score in scores.items())
+        start = 0
+        if after is not None and ranked and len(after) == len(ranked[0]):
+            start = bisect.bisect_right(ranked, tuple(-value for value in after))
+        window = ranked[start:start + per_page + 1]
+        next_key = None
+        if len(window) > per_page:
+            window = window[:per_page]
+            next_key = [-value for value in window[-1]]
+        return [-key[-1] for key in window], next_key, len(ranked)
+
+    def _match(self, terms, location_terms):
+        """Return {job_id: score} for jobs containing every term and location term."""
+        candidates = None
+        for term in location_terms:
+            ids = self._locations.get(term, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return {}
+
+        if not terms:
+            ids = self._docs.keys() if candidates is None else candidates
+            return dict.fromkeys(ids, 0.0)
+
+        total_docs = len(self._docs)
+        scores = None
+        # Intersect from the rarest term so the working set stays small
+        for term in sorted(set(terms), key=lambda t: len(self._postings.get(t, ()))):
+            postings = self._postings.get(term)
+            if not postings:
+                return {}
+            idf = math.log(1.0 + total_docs / len(postings))
+            if scores is None:
+                ids = postings.keys() if candidates is None else candidates & postings.keys()
+                scores = {job_id: postings[job_id] * idf for job_id in ids}
+            else:
+                scores = {job_id: score + postings[job_id] * idf
+                          for job_id, score in scores.items() if job_id in postings}
+            if not scores:
+                return {}
+        return scores
+
+
+class FullTextBackend:
+    """MySQL FULLTEXT backend; the database keeps the index current on write."""
+
+    name = 'fulltext'
+
+    @staticmethod
+    def _boolean_query(value):
+        # Every term is required; a trailing * keeps prefix matches like ilike did
+        return ' '.join(f'+{term}*' for term in tokenize(value))
+
+    def warm(self):
+        pass
+
+    def index_job(self, job):
+        pass
+
+    def remove_job(self, job_id):
+        pass
+
+    def criteria(self, title, location, salary, sort='', selection=None):
+        """Return (sort columns, WHERE criteria, count cache key) for a search."""
+        columns = [Job.created_at, Job.id]
+        criteria = []
+        terms = self._boolean_query(title)
+        if terms:
+            score = mysql.match(Job.title, Job.description, Job.requirements, against=terms).in_boolean_mode()
+            columns.insert(0, score)
+            criteria.append(score > 0)
+        location_terms = self._boolean_query(location)
+        if location_terms:
+            criteria.append(mysql.match(Job.location, against=location_terms).in_boolean_mode() > 0)
+        wanted = parse_salary_query(salary)
+        if wanted is not None:
+            criteria.extend(salary_criteria(Job, wanted))
+        elif salary:
+            criteria.append(Job.salary.ilike(f'%{salary}%'))
+        if sort == SORT_SALARY:
+            # (salary_currency, salary_max, id) index order
+            if wanted is None:
+                criteria.append(Job.salary_currency == DEFAULT_CURRENCY)
+            criteria.append(Job.salary_max.isnot(None))
+            columns = [Job.salary_max, Job.id]
+        if selection:
+            criteria.extend(selection.criteria())
+        return columns, criteria, ('search', terms, location_terms, salary, sort,
+                                   selection.key if selection else ())
+
+    @staticmethod
+    def page_statement(query, columns, after, per_page):
+        """Apply the keyset position, rank order and page limit to a query or select."""
+        if after is not None and len(after) == len(columns):
+            query = query.filter(keyset_filter(columns, after))
+        return query.order_by(*[column.desc() for column in columns]).limit(per_page + 1)
+
+    @staticmethod
+    def split_page(rows, per_page):
+        """Return (job ids, next keyset key) from up to ``per_page + 1`` sort-key rows."""
+        next_key = None
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            next_key = list(rows[-1])
+        return [row[-1] for row in rows], next_key
+
+    def matching_ids(self, title, location, salary):
+        _, criteria, _ = self.criteria(title, location, salary)
+        return db.session.scalars(select(Job.id).where(*criteria)).all()
+
+    def search(self, title, location, salary, after, per_page, sort='', selection=None):
+        columns, criteria, count_key = self.criteria(title, location, salary, sort, selection)
+        query = db.session.query(*columns).filter(*criteria)
+        total = estimated_count(query, count_key)
+        rows = self.page_statement(query, columns, after, per_page).all()
+        ids, next_key = self.split_page(rows, per_page)
+        return ids, next_key, total
+
+
+class IndexSync:
+    """How far this worker's in-process indexes have followed the ``job_changes`` log."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Public content version the indexes reflect; None until the first check
+        self.version = None
+        # time.monotonic() of the last check, and the wall clock time it ran at
+        self.checked_at = None
+        self.synced_at = None
+
+
+class SearchEngine:
+    """Flask extension that selects a search backend per application."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.config.setdefault('SEARCH_RESULTS_PER_PAGE', 20)
+        app.config.setdefault('SEARCH_FACET_LIMIT', 10)
+        app.config.setdefault('SEARCH_SYNC_INTERVAL', 1.0)
+        app.config.setdefault('SEARCH_CHANGES_RETENTION_HOURS', 24)
+        app.extensions['search_engine'] = None
+        app.extensions['search_facets'] = FacetIndex()
+        app.extensions['search_suggest'] = SuggestIndex()
+        app.extensions['search_sync'] = IndexSync()
+        app.jinja_env.globals['facet_toggle'] = toggle
+
+    @property
+    def backend(self):
+        backend = current_app.extensions.get('search_engine')
+        if backend is None:
+            choice = current_app.config['SEARCH_BACKEND']
+            if choice == 'auto':
+                choice = 'fulltext' if db.engine.dialect.name == 'mysql' else 'python'
+            backend = FullTextBackend() if choice == 'fulltext' else InvertedIndexBackend()
+            current_app.extensions['search_engine'] = backend
+        return backend
+
+    @property
+    def facets(self):
+        return current_app.extensions['search_facets']
+
+    @property
+    def suggestions(self):
+        return current_app.extensions['search_suggest']
+
+    def search(self, title='', location='', salary='', cursor=None, per_page=None, sort='', facets=None):
+        """Return a ``KeysetPage`` whose ``items`` are ``Job`` rows in rank (or ``sort``) order.
+
+        ``facets`` is {facet: [chosen values]} as read by ``app.facets.chosen_values``.
+        """
+        self.sync()
+        per_page = per_page or current_app.config['SEARCH_RESULTS_PER_PAGE']
+        after = decode_cursor(cursor)
+        sort = sort if sort in SORTS else ''
+        ids, next_key, total = self.backend.search(title or '', location or '', salary or '', after, per_page,
+                                                   sort, self.facets.selection(facets))
+        jobs = []
+        if ids:
+            rows = {job.id: job for job in Job.query.filter(Job.id.in_(ids))}
+            jobs = [rows[job_id] for job_id in ids if job_id in rows]
+        next_cursor = encode_cursor(next_key) if next_key is not None else None
+        return KeysetPage(jobs, next_cursor, total, per_page, cursor=cursor if after is not None else None)
+
+    def facet_counts(self, title='', location='', salary='', facets=None):
+        """Return {facet: [FacetValue]} for the jobs matching the search text and the other chosen facets."""
+        self.sync()
+        matching = None
+        if title or location or salary:
+            matching = bitmap(self.backend.matching_ids(title or '', location or '', salary or ''))
+        return self.facets.counts(matching, facets, current_app.config['SEARCH_FACET_LIMIT'])
+
+    def suggest(self, field, prefix, limit=DEFAULT_LIMIT):
+        """Return [(text, job count)] completing ``prefix`` for the ``title`` or ``location`` field."""
+        self.sync()
+        return self.suggestions.suggest(field, prefix, limit)
+
+    def warm(self):
+        """Build any in-process index now instead of on the first search."""
+        self.sync()
+        self.backend.warm()
+        self.facets.warm()
+        self.suggestions.warm()
+
+    def index_job(self, job):
+        """Add or refresh a job after it has been committed."""
+        self.index_jobs([job])
+
+    def index_jobs(self, jobs):
+        """``index_job`` for a batch, updating each facet bitmap once."""
+        jobs = list(jobs)
+        for job in jobs:
+            self.backend.index_job(job)
+        self.facets.index_jobs(jobs)
+        self.suggestions.index_jobs(jobs)
+
+    def remove_job(self, job_id):
+        """Drop a deleted job from the index."""
+        self.backend.remove_job(job_id)
+        self.facets.remove_job(job_id)
+        self.suggestions.remove_job(job_id)
+
+    def sync_due(self):
+        """True if ``sync`` would check the database now; no I/O."""
+        state = current_app.extensions['search_sync']
+        return state.checked_at is None \
+            or time.monotonic() - state.checked_at >= current_app.config['SEARCH_SYNC_INTERVAL']
+
+    def sync(self):
+        """Apply the job writes other processes (workers, tasks, CLI imports) have committed.
+
+        At most every ``SEARCH_SYNC_INTERVAL`` seconds this reads the public
+        content version, one primary-key lookup. When it has moved, the jobs
+        logged in ``job_changes`` since the version the indexes reflect are
+        re-read and re-indexed, or dropped if they are gone. Indexes that fell
+        further behind than the log keeps are rebuilt instead.
+        """
+        if not self.sync_due():
+            return
+        config = current_app.config
+        state = current_app.extensions['search_sync']
+        with state.lock:
+            if not self.sync_due():
+                return
+            version = db.session.scalar(
+                select(ContentVersion.version).where(ContentVersion.name == PUBLIC)) or 0
+            now = datetime.utcnow()
+            # The first check runs before any index loads, so later loads include this version
+            if state.version is not None and version != state.version:
+                if now - state.synced_at > timedelta(hours=config['SEARCH_CHANGES_RETENTION_HOURS']):
+                    self._reset()
+                else:
+                    self._replay(state.version, version)
+            state.version, state.synced_at, state.checked_at = version, now, time.monotonic()
+
+    def _replay(self, since, until):
+        job_ids = db.session.scalars(
+            select(JobChange.job_id).where(JobChange.version > since, JobChange.version <= until).distinct()
+        ).all()
+        for start in range(0, len(job_ids), SYNC_BATCH_SIZE):
+            batch = job_ids[start:start + SYNC_BATCH_SIZE]
+            rows = db.session.execute(select(Job.id, *[getattr(Job, field) for field in INDEXED_FIELDS])
+                                      .where(Job.id.in_(batch))).all()
+            self.index_jobs(rows)
+            # Deleted, soft-deleted or purged
+            for job_id in set(batch) - {row.id for row in rows}:
+                self.remove_job(job_id)
+
+    def _reset(self):
+        extensions = current_app.extensions
+        if isinstance(extensions['search_engine'], InvertedIndexBackend):
+            extensions['search_engine'] = None
+        extensions['search_facets'] = FacetIndex()
+        extensions['search_suggest'] = SuggestIndex()
+
+
+search_engine = SearchEngine()
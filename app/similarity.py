@@ -0,0 +1,296 @@
+"""Precomputed "similar jobs".
+
+Jobs are embedded as hashed TF-IDF vectors over their title, description,
+requirements and location. ``rebuild`` scores every job against every other
+in NumPy blocks and stores the top neighbours in ``job_similarities``, so the
+job detail page reads them with one indexed lookup.
+
+The normalized vectors are saved under ``SIMILARITY_INDEX_PATH`` so that a job
+created or edited later can be scored against the corpus without re-reading
+the ``jobs`` table. The admin job views queue ``similarity.update_job``, so
+a written job gets its neighbours on the next worker poll; until then its
+page shows no similar jobs. Vectors for jobs changed since the last rebuild
+live in an overlay that ``rebuild`` folds back in. Each update schedules a
+``similarity.rebuild`` within ``SIMILARITY_REBUILD_INTERVAL`` seconds, or
+at once when the overlay holds ``SIMILARITY_OVERLAY_MAX`` jobs, so the
+overlay stays small. A rebuild replaces the stored neighbours one block of
+jobs per transaction.
+"""
+from datetime import datetime, timedelta
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, select
+from sqlalchemy.orm import joinedload
+
+from app import db, tasks
+from app.cache import cache
+from app.httpcache import touch
+from app.models import Job, JobSimilarity, Task
+from app.tasks import report_progress, task
+from app.vectors import IndexDirectory, inverse_document_frequency, normalize, vectorize
+
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'requirements': 1.5,
+    'description': 1.0,
+    'location': 2.0,
+}
+# Location words get their own buckets, apart from the same words in the text
+FIELD_PREFIXES = {'location': 'loc:'}
+
+# Rows scored against the corpus per matrix multiply, and corpus rows per block
+QUERY_BLOCK = 256
+CORPUS_BLOCK = 50000
+
+
+def top_neighbours(queries, query_ids, corpus, corpus_ids, top_n):
+    """Return (ids, scores) arrays of shape (len(queries), top_n), best first.
+
+    The corpus is consumed in blocks so peak memory stays at
+    ``QUERY_BLOCK x CORPUS_BLOCK`` scores regardless of corpus size.
+    """
+    count = len(queries)
+    best_scores = np.full((count, top_n), -np.inf, dtype=np.float32)
+    best_ids = np.full((count, top_n), -1, dtype=np.int64)
+    for start in range(0, len(corpus), CORPUS_BLOCK):
+        block = np.asarray(corpus[start:start + CORPUS_BLOCK])
+        block_ids = corpus_ids[start:start + CORPUS_BLOCK]
+        scores = queries @ block.T
+        scores[query_ids[:, None] == block_ids[None, :]] = -np.inf
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate([best_ids, np.broadcast_to(block_ids, scores.shape)], axis=1)
+        keep = min(top_n, merged_scores.shape[1])
+        picked = np.argpartition(-merged_scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(merged_scores, picked, axis=1)
+        best_ids = np.take_along_axis(merged_ids, picked, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class SimilarityIndex:
+    """Saved job vectors plus the routines that keep ``job_similarities`` current."""
+
+    def __init__(self, path, dim, top_n):
+        self.files = IndexDirectory(path)
+        self.dim = dim
+        self.top_n = top_n
+
+    def _vectorize(self, rows):
+        return vectorize(rows, FIELD_WEIGHTS, self.dim, FIELD_PREFIXES)
+
+    @property
+    def built(self):
+        return self.files.exists('vectors')
+
+    def overlay_size(self):
+        """Number of jobs scored since the last rebuild."""
+        overlay_ids = self.files.load('overlay_ids')
+        return 0 if overlay_ids is None else len(overlay_ids)
+
+    def rebuild(self, batch_size=5000, on_progress=None):
+        """Recompute vectors and neighbours for every job, committing a block of jobs at a time."""
+        with self.files.locked():
+            ids, chunks = [], []
+            document_frequency = np.zeros(self.dim, dtype=np.int64)
+            rows = db.session.query(
+                Job.id, Job.title, Job.description, Job.requirements, Job.location
+            ).order_by(Job.id).execution_options(yield_per=batch_size)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    chunks.append(self._vectorize(batch))
+                    ids.extend(r.id for r in batch)
+                    batch = []
+            if batch:
+                chunks.append(self._vectorize(batch))
+                ids.extend(r.id for r in batch)
+
+            for chunk in chunks:
+                document_frequency += (chunk > 0).sum(axis=0)
+            vectors = np.concatenate(chunks) if chunks else np.zeros((0, self.dim), dtype=np.float32)
+            del chunks
+            ids = np.array(ids, dtype=np.int64)
+            idf = inverse_document_frequency(document_frequency, len(ids))
+            vectors *= idf
+            normalize(vectors)
+
+            for start in range(0, len(ids), QUERY_BLOCK):
+                block_ids = ids[start:start + QUERY_BLOCK]
+                neighbour_ids, scores = top_neighbours(
+                    vectors[start:start + QUERY_BLOCK], block_ids, vectors, ids, self.top_n)
+                # Short transactions: pages keep reading the old lists of the other blocks meanwhile
+                db.session.execute(delete(JobSimilarity).where(JobSimilarity.job_id.in_(block_ids.tolist())))
+                self._insert(block_ids, neighbour_ids, scores)
+                if on_progress is not None:
+                    on_progress({'jobs': start + len(block_ids)})
+                db.session.commit()
+            touch()
+            db.session.commit()
+
+            self.files.save('ids', ids)
+            self.files.save('vectors', vectors)
+            self.files.save('idf', idf)
+            self.files.remove('overlay_ids')
+            self.files.remove('overlay_vectors')
+        return len(ids)
+
+    def _insert(self, job_ids, neighbour_ids, scores):
+        rows = [
+            {'job_id': int(job_id), 'similar_job_id': int(other), 'score': float(score)}
+            for job_id, others, row_scores in zip(job_ids, neighbour_ids, scores)
+            for other, score in zip(others, row_scores)
+            if other >= 0 and score > 0
+        ]
+        if rows:
+            db.session.execute(JobSimilarity.__table__.insert(), rows)
+
+    def update_job(self, job):
+        """Recompute one job's neighbours and offer it to the jobs it now resembles.
+
+        Returns the ids of the jobs whose neighbour lists changed, or None when
+        there was no index yet and this built it (every list changed). Runs
+        inside the caller's transaction; the caller commits.
+        """
+        if not self.built:
+            # Nothing saved to score against: build the index, this job included
+            self.rebuild()
+            return None
+        with self.files.locked():
+            idf = self.files.load('idf')
+            vector = self._vectorize([job]) * idf
+            normalize(vector)
+
+            overlay_ids = self.files.load('overlay_ids')
+            overlay_vectors = self.files.load('overlay_vectors')
+            if overlay_ids is None:
+                overlay_ids = np.zeros(0, dtype=np.int64)
+                overlay_vectors = np.zeros((0, self.dim), dtype=np.float32)
+            keep = overlay_ids != job.id
+            overlay_ids = np.append(overlay_ids[keep], job.id)
+            overlay_vectors = np.concatenate([overlay_vectors[keep], vector])
+
+            # Base rows for jobs with an overlay vector are stale; score the overlay copy instead
+            base_ids = self.files.load('ids')
+            base_vectors = self.files.load('vectors', mmap=True)
+            candidate_ids, candidate_scores = top_neighbours(
+                vector, np.array([job.id]), base_vectors, base_ids, self.top_n * 4)
+            overlay_scores = (overlay_vectors @ vector[0]).astype(np.float32)
+            stale = np.isin(candidate_ids[0], overlay_ids)
+            ids = np.concatenate([candidate_ids[0][~stale], overlay_ids])
+            scores = np.concatenate([candidate_scores[0][~stale], overlay_scores])
+            scores[ids == job.id] = -np.inf
+
+            self.files.save('overlay_ids', overlay_ids)
+            self.files.save('overlay_vectors', overlay_vectors)
+
+        order = np.argsort(-scores)
+        ranked = [(int(ids[i]), float(scores[i])) for i in order if scores[i] > 0]
+        live = {row.id for row in db.session.query(Job.id).filter(Job.id.in_([i for i, _ in ranked]))}
+        ranked = [(other, score) for other, score in ranked if other in live]
+
+        changed = {job.id}
+        changed.update(db.session.scalars(
+            select(JobSimilarity.job_id).where(JobSimilarity.similar_job_id == job.id)))
+        JobSimilarity.query.filter_by(job_id=job.id).delete()
+        JobSimilarity.query.filter_by(similar_job_id=job.id).delete()
+        self._insert([job.id], [[other for other, _ in ranked[:self.top_n]]],
+                     [[score for _, score in ranked[:self.top_n]]])
+        changed.update(self._offer(job.id, ranked))
+        # Bulk writes: the similar-jobs blocks change without a Job being flushed
+        touch()
+        return changed
+
+    def _offer(self, job_id, ranked):
+        """Add ``job_id`` to the neighbour lists of jobs where it now ranks in the top N; return those jobs."""
+        offered = set()
+        others = [other for other, _ in ranked]
+        if not others:
+            return offered
+        current = {}
+        for row in JobSimilarity.query.filter(JobSimilarity.job_id.in_(others)):
+            current.setdefault(row.job_id, []).append(row)
+        for other, score in ranked:
+            rows = current.get(other, [])
+            if len(rows) >= self.top_n:
+                weakest = min(rows, key=lambda row: row.score)
+                if weakest.score >= score:
+                    continue
+                db.session.delete(weakest)
+            db.session.add(JobSimilarity(job_id=other, similar_job_id=job_id, score=score))
+            offered.add(other)
+        return offered
+
+
+def get_index():
+    config = current_app.config
+    return SimilarityIndex(config['SIMILARITY_INDEX_PATH'], config['SIMILARITY_DIMENSIONS'],
+                           config['SIMILARITY_TOP_N'])
+
+
+def similar_jobs_statement(job_id, limit=3):
+    """SELECT for the neighbours of ``job_id`` (with their posters) from ``job_similarities``."""
+    return select(Job).join(JobSimilarity, JobSimilarity.similar_job_id == Job.id) \
+        .options(joinedload(Job.poster_user)) \
+        .where(JobSimilarity.job_id == job_id) \
+        .order_by(JobSimilarity.score.desc()) \
+        .limit(limit)
+
+
+def similar_jobs(job_id, limit=3):
+    """Neighbours of ``job_id`` in one indexed lookup on ``job_similarities``; empty until computed."""
+    return db.session.scalars(similar_jobs_statement(job_id, limit)).unique().all()
+
+
+def update_job(job):
+    return get_index().update_job(job)
+
+
+def schedule_rebuild(delay=0):
+    """Queue ``similarity.rebuild`` to run within ``delay`` seconds unless one already will; the caller commits."""
+    run_at = datetime.utcnow() + timedelta(seconds=delay)
+    pending = db.session.scalars(select(Task).where(Task.name == 'similarity.rebuild', Task.status == tasks.QUEUED)
+                                 .order_by(Task.run_at).limit(1)).first()
+    if pending is None:
+        tasks.enqueue('similarity.rebuild', delay=delay)
+    elif pending.run_at > run_at:
+        pending.run_at = run_at
+
+
+@task('similarity.update_job')
+def update_job_task(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return
+    index = get_index()
+    changed = index.update_job(job)
+    config = current_app.config
+    if changed is not None:
+        # Fold the overlay back in before it grows large, and at least once per interval
+        full = index.overlay_size() >= config['SIMILARITY_OVERLAY_MAX']
+        schedule_rebuild(0 if full else config['SIMILARITY_REBUILD_INTERVAL'])
+    db.session.commit()
+    # Job pages cache their similar jobs
+    if changed is None:
+        cache.invalidate('jobs')
+    else:
+        cache.invalidate(*[f'job:{changed_id}' for changed_id in sorted(changed)])
+
+
+@task('similarity.rebuild', max_attempts=1)
+def rebuild_task():
+    get_index().rebuild(on_progress=report_progress)
+    cache.invalidate('jobs')
+
+
+similarity_cli = AppGroup('similarity', help='Precomputed similar-jobs index.')
+
+
+@similarity_cli.command('rebuild')
+def rebuild_command():
+    """Recompute job vectors and the job_similarities table."""
+    count = get_index().rebuild()
+    click.echo(f'Indexed {count} jobs.')
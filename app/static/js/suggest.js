@@ -0,0 +1,37 @@
+// Typeahead for inputs marked data-suggest="title" or "location": fills a
+// <datalist> from /search/suggest as the visitor types.
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-suggest]').forEach(function(input) {
+        const list = document.createElement('datalist');
+        list.id = input.name + '-suggestions';
+        input.setAttribute('list', list.id);
+        input.setAttribute('autocomplete', 'off');
+        input.after(list);
+
+        let timer = null;
+        let last = '';
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(function() {
+                const query = input.value.trim();
+                if (!query || query === last) {
+                    return;
+                }
+                last = query;
+                const url = input.dataset.suggestUrl + '?field=' + encodeURIComponent(input.dataset.suggest)
+                    + '&q=' + encodeURIComponent(query);
+                fetch(url)
+                    .then(function(response) { return response.ok ? response.json() : []; })
+                    .then(function(suggestions) {
+                        list.replaceChildren.apply(list, suggestions.map(function(suggestion) {
+                            const option = document.createElement('option');
+                            option.value = suggestion.text;
+                            option.label = suggestion.jobs + (suggestion.jobs === 1 ? ' job' : ' jobs');
+                            return option;
+                        }));
+                    })
+                    .catch(function() {});
+            }, 150);
+        });
+    });
+});
@@ -0,0 +1,182 @@
+"""Dashboard statistics backed by the ``stats_rollup`` table.
+
+Write paths bump per-day counters in the same transaction as the change they
+describe, so the admin dashboard reads every number it shows with a single
+grouped query over a few hundred rollup rows instead of counting the
+``applications``, ``jobs`` and ``users`` tables on each view.
+"""
+from datetime import date, datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import User, Job, Application, StatRollup
+from app.tasks import task
+
+APPLICATIONS = 'applications'
+JOBS = 'jobs'
+USERS = 'users'
+
+STATUSES = ['Pending', 'Reviewed', 'Rejected', 'Accepted']
+
+
+def _day(value):
+    if value is None:
+        return datetime.utcnow().date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def bump(metric, day, delta, status=''):
+    """Add ``delta`` to one rollup counter, creating the row if needed."""
+    if not delta:
+        return
+    table = StatRollup.__table__
+    values = {'metric': metric, 'day': _day(day), 'status': status or '', 'count': delta}
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql_insert(table).values(**values)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted['count'])
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['metric', 'day', 'status'],
+            set_={'count': table.c.count + stmt.excluded['count']}
+        )
+    else:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.metric == values['metric'], table.c.day == values['day'],
+                   table.c.status == values['status'])
+            .values(count=table.c.count + delta)
+        )
+        if updated.rowcount:
+            return
+        stmt = table.insert().values(**values)
+    db.session.execute(stmt)
+
+
+def record_application(application):
+    bump(APPLICATIONS, application.created_at, 1, application.status or 'Pending')
+
+
+def record_status_change(application, old_status):
+    if old_status == application.status:
+        return
+    bump(APPLICATIONS, application.created_at, -1, old_status or 'Pending')
+    bump(APPLICATIONS, application.created_at, 1, application.status)
+
+
+def record_applications_removed(*criteria):
+    """Subtract the applications matching ``criteria`` before they are deleted."""
+    rows = db.session.query(
+        func.date(Application.created_at), Application.status, func.count(Application.id)
+    ).filter(*criteria).group_by(func.date(Application.created_at), Application.status)
+    for day, status, count in rows.all():
+        bump(APPLICATIONS, day, -count, status or 'Pending')
+
+
+def record_rows_removed(metric, created_at, *criteria):
+    """Subtract the jobs or users matching ``criteria`` before they are deleted."""
+    rows = db.session.query(func.date(created_at), func.count()).filter(*criteria).group_by(func.date(created_at))
+    for day, count in rows.all():
+        bump(metric, day, -count)
+
+
+def record_job(job, delta=1):
+    bump(JOBS, job.created_at, delta)
+
+
+def record_user(user, delta=1):
+    bump(USERS, user.created_at, delta)
+
+
+def dashboard_stats(sample_days):
+    """Return totals, per-status and per-sample-day counts in one query.
+
+    ``sample_days`` is a list of dates; the result's ``daily`` list holds the
+    application count for each of them in the same order.
+    """
+    sampled = case((StatRollup.day.in_(sample_days), StatRollup.day), else_=None) if sample_days else None
+    columns = [StatRollup.metric, StatRollup.status]
+    if sampled is not None:
+        columns.append(sampled.label('sample_day'))
+    rows = db.session.query(*columns, func.sum(StatRollup.count)) \
+        .group_by(*columns).all()
+
+    totals = {APPLICATIONS: 0, JOBS: 0, USERS: 0}
+    by_status = dict.fromkeys(STATUSES, 0)
+    by_day = {}
+    for row in rows:
+        metric, status, count = row[0], row[1], int(row[-1] or 0)
+        totals[metric] = totals.get(metric, 0) + count
+        if metric == APPLICATIONS:
+            by_status[status] = by_status.get(status, 0) + count
+            if sampled is not None and row[2] is not None:
+                day = _day(row[2])
+                by_day[day] = by_day.get(day, 0) + count
+    return {
+        'totals': totals,
+        'by_status': by_status,
+        'daily': [by_day.get(day, 0) for day in sample_days],
+    }
+
+
+def rebuild():
+    """Recompute the whole rollup from the source tables."""
+    db.session.query(StatRollup).delete()
+    sources = [
+        (APPLICATIONS, Application.created_at, Application.status, Application.id),
+        (JOBS, Job.created_at, None, Job.id),
+        (USERS, User.created_at, None, User.id),
+    ]
+    rows = []
+    for metric, created_at, status, key in sources:
+        group = [func.date(created_at)] + ([status] if status is not None else [])
+        for result in db.session.query(*group, func.count(key)).group_by(*group):
+            rows.append({
+                'metric': metric,
+                'day': _day(result[0]),
+                'status': (result[1] or 'Pending') if status is not None else '',
+                'count': result[-1],
+            })
+    # NULL created_at rows group under the same day and status; merge before inserting
+    merged = {}
+    for row in rows:
+        key = (row['metric'], row['day'], row['status'])
+        merged[key] = merged.get(key, 0) + row['count']
+    if merged:
+        db.session.execute(StatRollup.__table__.insert(), [
+            {'metric': metric, 'day': day, 'status': status, 'count': count}
+            for (metric, day, status), count in merged.items()
+        ])
+    db.session.commit()
+    return len(merged)
+
+
+@task('stats.rebuild', max_attempts=1)
+def rebuild_task():
+    rebuild()
+
+
+stats_cli = AppGroup('stats', help='Dashboard statistics rollup.')
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Backfill the stats rollup from applications, jobs and users."""
+    count = rebuild()
+    click.echo(f'Rebuilt stats rollup: {count} rows.')
+
+
+def sample_days(now=None):
+    """The seven days plotted on the dashboard, oldest first, five days apart."""
+    now = now or datetime.utcnow()
+    return [(now - timedelta(days=i * 5)).date() for i in range(7, 0, -1)]
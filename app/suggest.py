@@ -0,0 +1,159 @@
+"""Typeahead suggestions for the search form's title and location fields.
+
+``SuggestIndex`` holds, per field, every distinct value (case-folded) with
+the number of live jobs that have it, and a sorted array of
+(word-suffix, value) keys: "senior data analyst" is reachable from "sen",
+"dat" and "ana". A prefix is two bisects on that array; the matching values
+are ranked by job count. Answers are memoised per prefix until the next job
+write reaches the index, so repeated keystrokes cost one dict lookup.
+
+Like the in-process search index the structure is built lazily per worker
+from one scan of ``jobs`` and kept current by ``search_engine.index_job`` /
+``remove_job``: the job write paths call them in the worker that wrote, and
+``search_engine.sync`` replays other processes' writes (every add or remove
+drops the memo). A suggestion only queries the database when that sync is
+due, once per ``SEARCH_SYNC_INTERVAL``.
+"""
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Job
+
+FIELDS = ('title', 'location')
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Memoised prefixes kept before the memo starts over
+MEMO_SIZE = 10000
+
+# Highest code point, so (prefix + END) sorts after every key starting with prefix
+END = '\U0010ffff'
+
+
+def normalize(value):
+    """Case-folded text with runs of whitespace collapsed."""
+    return ' '.join((value or '').split()).casefold()
+
+
+def _keys(value):
+    """Sort keys reaching ``value``: the value from the start of each of its words."""
+    return {value[match.start():] for match in WORD_RE.finditer(value)}
+
+
+class SuggestIndex:
+    """Per-worker prefix index of job titles and locations, weighted by job count."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        # field -> normalized value -> number of jobs
+        self._counts = {field: defaultdict(int) for field in FIELDS}
+        # field -> normalized value -> text as posted (most recent spelling)
+        self._display = {field: {} for field in FIELDS}
+        # field -> sorted [(key, normalized value)]
+        self._keys = {field: [] for field in FIELDS}
+        # job_id -> (normalized title, normalized location)
+        self._docs = {}
+        # (field, prefix, limit) -> suggestions, dropped on every write
+        self._memo = {}
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def warm(self):
+        self._ensure_loaded()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            for row in db.session.execute(
+                    select(Job.id, Job.title, Job.location).execution_options(yield_per=1000)):
+                self._add(*row, sort=False)
+            for keys in self._keys.values():
+                keys.sort()
+            self._loaded = True
+
+    def _add(self, job_id, title, location, sort=True):
+        self._remove(job_id)
+        doc = []
+        for field, text in zip(FIELDS, (title, location)):
+            value = normalize(text)
+            doc.append(value)
+            if not value:
+                continue
+            self._display[field][value] = ' '.join(text.split())
+            counts = self._counts[field]
+            counts[value] += 1
+            if counts[value] == 1:
+                keys = self._keys[field]
+                for key in _keys(value):
+                    if sort:
+                        bisect.insort(keys, (key, value))
+                    else:
+                        keys.append((key, value))
+        self._docs[job_id] = tuple(doc)
+        self._memo.clear()
+
+    def _remove(self, job_id):
+        doc = self._docs.pop(job_id, None)
+        if doc is None:
+            return
+        for field, value in zip(FIELDS, doc):
+            if not value:
+                continue
+            counts = self._counts[field]
+            counts[value] -= 1
+            if counts[value] <= 0:
+                del counts[value], self._display[field][value]
+                keys = self._keys[field]
+                for key in _keys(value):
+                    index = bisect.bisect_left(keys, (key, value))
+                    if index < len(keys) and keys[index] == (key, value):
+                        del keys[index]
+        self._memo.clear()
+
+    def index_jobs(self, jobs):
+        """Add or refresh jobs (anything with id, title and location)."""
+        with self._lock:
+            if self._loaded:
+                for job in jobs:
+                    self._add(job.id, job.title, job.location)
+
+    def remove_job(self, job_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(job_id)
+
+    def suggest(self, field, prefix, limit=DEFAULT_LIMIT):
+        """Return [(text, job count)] for values of ``field`` with a word starting with ``prefix``."""
+        prefix = normalize(prefix)
+        if field not in FIELDS or not prefix:
+            return []
+        self._ensure_loaded()
+        memo_key = (field, prefix, limit)
+        found = self._memo.get(memo_key)
+        if found is not None:
+            return found
+        with self._lock:
+            keys = self._keys[field]
+            start = bisect.bisect_left(keys, (prefix,))
+            stop = bisect.bisect_left(keys, (prefix + END,), start)
+            counts = self._counts[field]
+            values = {value for _, value in keys[start:stop]}
+            ranked = sorted(values, key=lambda value: (-counts[value], value))[:limit]
+            found = [(self._display[field][value], counts[value]) for value in ranked]
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[memo_key] = found
+        return found
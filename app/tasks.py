@@ -0,0 +1,294 @@
+"""Background tasks for slow side effects of writes.
+
+A view queues work with ``enqueue(name, **payload)``; the task row is added
+to the view's session, so it is committed (or rolled back) together with the
+change that caused it. A worker process runs the queue:
+
+    flask tasks work            # poll until stopped (SIGTERM/SIGINT finish the current task)
+    flask tasks work --burst    # drain what is due and exit
+    flask tasks status          # backlog by task name and state
+    flask tasks retry           # requeue failed tasks
+    flask tasks enqueue NAME '{"job_id": 1}'
+
+Handlers are registered with ``@task('name')`` and run in an app context
+with the payload as keyword arguments. They commit their own work, ideally
+in short transactions, and must be safe to run again: a handler that raises
+is rolled back and retried with exponential backoff (``TASKS_RETRY_DELAY``
+doubled per attempt) until ``TASKS_MAX_ATTEMPTS``, after which the task is
+kept as ``failed`` with its error. Successful tasks are deleted.
+
+Workers claim tasks with a conditional UPDATE, so any number of them can
+share the table on MySQL or SQLite. ``report_progress`` also refreshes the
+task's lock, so long handlers should call it (and commit) at least once per
+``TASKS_LOCK_TIMEOUT``; tasks whose lock is older than that (their worker
+died) are requeued.
+
+With ``TASKS_EAGER`` the tasks a request queued run in that process right
+after the response is built, which suits development without a worker.
+"""
+import contextvars
+import json
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, g, has_request_context
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update
+
+from app import db
+from app.models import Task
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FAILED = 'failed'
+
+_handlers = {}
+_current_task = contextvars.ContextVar('current_task', default=None)
+
+
+def task(name, max_attempts=None):
+    """Register a function as the handler of task ``name``."""
+    def register(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        _handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(name, delay=0, **payload):
+    """Queue task ``name`` in the current session; it is saved when the caller commits."""
+    if name not in _handlers:
+        raise KeyError(f'Unknown task: {name}')
+    max_attempts = _handlers[name].max_attempts or current_app.config['TASKS_MAX_ATTEMPTS']
+    entry = Task(name=name, payload=payload, status=QUEUED, attempts=0, max_attempts=max_attempts,
+                 run_at=datetime.utcnow() + timedelta(seconds=delay))
+    db.session.add(entry)
+    if has_request_context() and current_app.config['TASKS_EAGER']:
+        g.setdefault('_tasks_queued', []).append(entry)
+    return entry
+
+
+def report_progress(progress):
+    """Save ``progress`` (JSON data) on the running task and refresh its lock, in the handler's transaction.
+
+    The lock is refreshed when the handler commits, so ``requeue_stale`` leaves a
+    task that keeps reporting alone however long it runs.
+    """
+    task_id = _current_task.get()
+    if task_id is not None:
+        db.session.execute(update(Task).where(Task.id == task_id, Task.status == RUNNING)
+                           .values(progress=progress, locked_at=datetime.utcnow()))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale():
+    """Return tasks whose worker stopped while running them (no heartbeat within the lock timeout) to the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['TASKS_LOCK_TIMEOUT'])
+    requeued = db.session.execute(
+        update(Task).where(Task.status == RUNNING, Task.locked_at < cutoff)
+        .values(status=QUEUED, locked_by=None, locked_at=None)
+    ).rowcount
+    db.session.commit()
+    return requeued
+
+
+def claim(worker, limit=10, ids=None):
+    """Mark up to ``limit`` due tasks as running by ``worker``; return their ids."""
+    now = datetime.utcnow()
+    candidates = select(Task.id).where(Task.status == QUEUED, Task.run_at <= now) \
+        .order_by(Task.run_at, Task.id).limit(limit)
+    if ids is not None:
+        candidates = candidates.where(Task.id.in_(ids))
+    claimed = []
+    for task_id in db.session.scalars(candidates).all():
+        # Another worker may claim the same row first; only one UPDATE matches
+        won = db.session.execute(
+            update(Task).where(Task.id == task_id, Task.status == QUEUED)
+            .values(status=RUNNING, locked_by=worker, locked_at=now, attempts=Task.attempts + 1)
+        ).rowcount
+        if won:
+            claimed.append(task_id)
+    db.session.commit()
+    return claimed
+
+
+def run(task_id):
+    """Run one claimed task; return True if it succeeded."""
+    entry = db.session.get(Task, task_id)
+    if entry is None:
+        return True
+    name, payload = entry.name, dict(entry.payload or {})
+    handler = _handlers.get(name)
+    token = _current_task.set(task_id)
+    try:
+        if handler is None:
+            raise KeyError(f'Unknown task: {name}')
+        handler(**payload)
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        entry = db.session.get(Task, task_id)
+        entry.last_error = f'{type(error).__name__}: {error}'[:2000]
+        entry.locked_by = entry.locked_at = None
+        if entry.attempts >= entry.max_attempts:
+            entry.status = FAILED
+            current_app.logger.exception('Task %s %s failed for good after %d attempts',
+                                         name, task_id, entry.attempts)
+        else:
+            entry.status = QUEUED
+            delay = current_app.config['TASKS_RETRY_DELAY'] * 2 ** (entry.attempts - 1)
+            entry.run_at = datetime.utcnow() + timedelta(seconds=delay)
+            current_app.logger.warning('Task %s %s failed (attempt %d), retrying in %ds: %s',
+                                       name, task_id, entry.attempts, delay, entry.last_error)
+        db.session.commit()
+        return False
+    finally:
+        _current_task.reset(token)
+    db.session.execute(Task.__table__.delete().where(Task.id == task_id))
+    db.session.commit()
+    return True
+
+
+def work(burst=False, batch=10, ids=None, should_stop=lambda: False):
+    """Run due tasks until the queue is empty (``burst``) or ``should_stop()``; return (done, failed)."""
+    worker = worker_name()
+    done = failed = 0
+    poll_interval = current_app.config['TASKS_POLL_INTERVAL']
+    last_requeue = 0
+    while not should_stop():
+        if ids is None and time.monotonic() - last_requeue > poll_interval * 30:
+            requeue_stale()
+            last_requeue = time.monotonic()
+        claimed = claim(worker, batch, ids)
+        for task_id in claimed:
+            if run(task_id):
+                done += 1
+            else:
+                failed += 1
+            db.session.expunge_all()
+        if not claimed:
+            if burst:
+                break
+            time.sleep(poll_interval)
+    return done, failed
+
+
+def running():
+    """Tasks being run now, with their progress and when they last reported it."""
+    return [
+        {'id': entry.id, 'task': entry.name, 'payload': entry.payload, 'worker': entry.locked_by,
+         'heartbeat': entry.locked_at.isoformat() if entry.locked_at else None, 'progress': entry.progress}
+        for entry in db.session.scalars(select(Task).where(Task.status == RUNNING).order_by(Task.locked_at))
+    ]
+
+
+def backlog():
+    """Return {name: {status: count}} and the age in seconds of the oldest due task."""
+    counts = {}
+    for name, status, count in db.session.execute(
+            select(Task.name, Task.status, func.count(Task.id)).group_by(Task.name, Task.status)):
+        counts.setdefault(name, {})[status] = count
+    oldest = db.session.scalar(select(func.min(Task.run_at)).where(Task.status == QUEUED))
+    now = datetime.utcnow()
+    age = max(0.0, (now - oldest).total_seconds()) if oldest is not None and oldest <= now else 0.0
+    return counts, age
+
+
+class TaskQueue:
+    """Flask extension holding the queue settings and running eager tasks."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TASKS_EAGER', False)
+        app.config.setdefault('TASKS_MAX_ATTEMPTS', 5)
+        app.config.setdefault('TASKS_RETRY_DELAY', 10)
+        app.config.setdefault('TASKS_LOCK_TIMEOUT', 600)
+        app.config.setdefault('TASKS_POLL_INTERVAL', 1.0)
+
+        # Handlers live next to the code they belong to; importing registers them
+        from app import deletion, similarity, stats  # noqa: F401
+
+        if app.config['TASKS_EAGER']:
+            app.after_request(self._run_eager)
+
+    def _run_eager(self, response):
+        queued = g.pop('_tasks_queued', None)
+        if queued:
+            # The view has committed by now; tasks it left uncommitted are dropped
+            ids = [entry.id for entry in queued if entry.id is not None]
+            db.session.rollback()
+            work(burst=True, ids=ids)
+        return response
+
+
+task_queue = TaskQueue()
+
+tasks_cli = AppGroup('tasks', help='Background task queue.')
+
+
+@tasks_cli.command('work')
+@click.option('--burst', is_flag=True, help='Exit once no task is due.')
+@click.option('--batch', default=10, show_default=True, help='Tasks claimed per poll.')
+def work_command(burst, batch):
+    """Run queued tasks."""
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    click.echo(f'Worker {worker_name()} started.')
+    done, failed = work(burst=burst, batch=batch, should_stop=lambda: bool(stopping))
+    click.echo(f'Worker stopped: {done} tasks done, {failed} failed attempts.')
+
+
+@tasks_cli.command('status')
+def status_command():
+    """Show the backlog by task name and state."""
+    counts, age = backlog()
+    if not counts:
+        click.echo('No tasks queued.')
+        return
+    for name, statuses in sorted(counts.items()):
+        click.echo(f'{name:<32} ' + '  '.join(f'{status} {count}' for status, count in sorted(statuses.items())))
+    click.echo(f'Oldest due task waiting {age:.0f}s.')
+    for entry in running():
+        click.echo(f'running #{entry["id"]} {entry["task"]} {json.dumps(entry["payload"])} on {entry["worker"]}: '
+                   f'{json.dumps(entry["progress"])}')
+    for entry in db.session.scalars(select(Task).where(Task.status == FAILED).order_by(Task.id.desc()).limit(5)):
+        click.echo(f'failed #{entry.id} {entry.name} {json.dumps(entry.payload)}: {entry.last_error}')
+
+
+@tasks_cli.command('retry')
+@click.option('--name', default=None, help='Only tasks with this name.')
+def retry_command(name):
+    """Requeue failed tasks for another round of attempts."""
+    statement = update(Task).where(Task.status == FAILED)
+    if name:
+        statement = statement.where(Task.name == name)
+    count = db.session.execute(
+        statement.values(status=QUEUED, attempts=0, run_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    click.echo(f'Requeued {count} tasks.')
+
+
+@tasks_cli.command('enqueue')
+@click.argument('name')
+@click.argument('payload', default='{}')
+def enqueue_command(name, payload):
+    """Queue task NAME with a JSON object of arguments."""
+    entry = enqueue(name, **json.loads(payload))
+    db.session.commit()
+    click.echo(f'Queued {name} as task {entry.id}.')
@@ -0,0 +1,107 @@
+"""Hashed TF-IDF vectors and the directories they are saved in.
+
+Shared by similar jobs (``app.similarity``), applicant matching
+(``app.matching``) and recommendations (``app.recommendations``). Terms are
+hashed into a fixed number of buckets, so no vocabulary has to be kept, and
+a field's terms count ``weight`` times with a sublinear ``1 + log(tf)``.
+"""
+import fcntl
+import math
+import os
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.search import tokenize
+
+
+def bucket(term, dim):
+    # crc32 rather than hash(): the bucket must be stable across processes
+    return zlib.crc32(term.encode('utf-8')) % dim
+
+
+def vectorize(rows, fields, dim, prefixes=None):
+    """Build an unnormalized (len(rows), dim) term-frequency matrix of the weighted ``fields``.
+
+    ``fields`` maps attribute names to weights; ``prefixes`` optionally maps a
+    field to a string put before its terms, keeping them apart from the same
+    words in other fields.
+    """
+    prefixes = prefixes or {}
+    matrix = np.zeros((len(rows), dim), dtype=np.float32)
+    row_index, columns, values = [], [], []
+    for i, row in enumerate(rows):
+        counts = {}
+        for field, weight in fields.items():
+            prefix = prefixes.get(field, '')
+            for term in tokenize(getattr(row, field)):
+                column = bucket(prefix + term, dim)
+                counts[column] = counts.get(column, 0.0) + weight
+        row_index.extend([i] * len(counts))
+        columns.extend(counts.keys())
+        values.extend(1.0 + math.log(count) for count in counts.values())
+    if values:
+        matrix[np.array(row_index), np.array(columns)] = np.array(values, dtype=np.float32)
+    return matrix
+
+
+def inverse_document_frequency(document_frequency, documents):
+    """Smoothed IDF weights from per-bucket document counts."""
+    return (np.log((1.0 + documents) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+
+
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+class IndexDirectory:
+    """A directory of ``.npy`` arrays shared by the processes of a host."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def exists(self, name):
+        return os.path.exists(self.file(name + '.npy'))
+
+    def modified(self, name):
+        """Modification time of a saved array, or None if it was never saved."""
+        filename = self.file(name + '.npy')
+        return os.path.getmtime(filename) if os.path.exists(filename) else None
+
+    @contextmanager
+    def locked(self):
+        """Hold the directory's exclusive lock, across processes."""
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        with open(self.file('lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self, name, array):
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        # Write then rename so readers in other workers never see a partial file
+        tmp = self.file(name + '.tmp.npy')
+        np.save(tmp, array)
+        os.replace(tmp, self.file(name + '.npy'))
+
+    def load(self, name, mmap=False):
+        """A saved array (memory-mapped if ``mmap``), or None if it was never saved."""
+        filename = self.file(name + '.npy')
+        if not os.path.exists(filename):
+            return None
+        return np.load(filename, mmap_mode='r' if mmap else None)
+
+    def remove(self, name):
+        if self.exists(name):
+            os.remove(self.file(name + '.npy'))
@@ -0,0 +1,18 @@
+"""Benchmark suite: bulk data generation, a scripted workload and result comparison.
+
+    python -m benchmarks seed --database-url sqlite:///bench.db --users 1e5 --jobs 5e4 --applications 1e6
+    python -m benchmarks run --database-url sqlite:///bench.db --output before.json
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks recommend --database-url sqlite:///bench.db --users 20000
+"""
+from config import Config
+
+
+def benchmark_config(database_url, **overrides):
+    """Config class pointing the app at ``database_url`` for benchmarking."""
+    attrs = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'WTF_CSRF_ENABLED': False,
+    }
+    attrs.update(overrides)
+    return type('BenchmarkConfig', (Config,), attrs)
@@ -0,0 +1,213 @@
+"""Command line entry point: ``python -m benchmarks {seed,run,servers,recommend,compare}``."""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+from app import create_app, db
+from benchmarks import benchmark_config
+
+
+def _count(value):
+    # Accept 1e6-style sizes
+    return int(float(value))
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def seed_command(args):
+    from app import stats, similarity
+    from benchmarks.datagen import generate
+
+    app = create_app(benchmark_config(args.database_url))
+    with app.app_context():
+        db.create_all()
+        generate(args.users, args.jobs, args.applications, seed=args.seed, chunk_size=args.chunk_size)
+        stats.rebuild()
+        if args.similarity:
+            similarity.get_index().rebuild()
+
+
+def run_command(args):
+    from benchmarks.workload import InProcessDriver, HTTPDriver, run_workload, sample_ids
+
+    app = create_app(benchmark_config(args.database_url))
+    with app.app_context():
+        job_ids, user_ids, admin = sample_ids()
+        dialect = db.engine.dialect.name
+        if args.url:
+            from app.models import User
+            user = db.session.get(User, user_ids[0])
+            driver = HTTPDriver(args.url, admin.email, user.email)
+        else:
+            driver = InProcessDriver(app, admin.id)
+    results = run_workload(driver, job_ids, user_ids, requests_per_route=args.requests,
+                           concurrency=args.concurrency, seed=args.seed, routes=args.route)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'database': dialect,
+        'target': args.url or 'test-client',
+        'python': platform.python_version(),
+        'requests_per_route': args.requests,
+        'concurrency': args.concurrency,
+        'results': results,
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+def servers_command(args):
+    from benchmarks.servers import compare_servers
+    from benchmarks.workload import sample_ids
+
+    app = create_app(benchmark_config(args.database_url))
+    with app.app_context():
+        job_ids, user_ids, admin = sample_ids()
+        from app.models import User
+        user_email = db.session.get(User, user_ids[0]).email
+    rows = compare_servers(args.database_url, job_ids, user_ids, admin.email, user_email,
+                           kinds=args.server or ('sync', 'async'), workers=args.workers,
+                           concurrency_levels=[int(level) for level in args.concurrency.split(',')],
+                           requests_per_route=args.requests, seed=args.seed)
+
+    print(f"{'server':<8}{'conc':>6}  {'route':<24}{'rps':>9}{'rps/worker':>12}{'p50 ms':>9}{'p99 ms':>9}")
+    for row in rows:
+        print(f"{row['server']:<8}{row['concurrency']:>6}  {row['route']:<24}{_fmt(row['throughput_rps']):>9}"
+              f"{_fmt(row['rps_per_worker']):>12}{_fmt(row['p50_ms']):>9}{_fmt(row['p99_ms']):>9}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'commit': _git_commit(), 'database': args.database_url.split(':', 1)[0],
+                       'workers': args.workers, 'results': rows}, f, indent=2)
+
+
+def recommend_command(args):
+    from benchmarks.recommend import measure_recommendations
+
+    app = create_app(benchmark_config(args.database_url, RECOMMENDATIONS_INDEX_PATH=args.index_path))
+    with app.app_context():
+        report = measure_recommendations(args.users, args.exact_users, seed=args.seed)
+    per_user = report['per_user_ms']
+    print(f"{report['users']:,} users x {report['jobs']:,} jobs: {report['clusters']} clusters, "
+          f"{report['probes']} probed, {report['dimensions']} dimensions, index {_fmt(report['index_mb'])} MB")
+    print(f"index build        {_fmt(report['build_seconds'])} s")
+    print(f"per user (sample of {report['sampled_users']:,}): profile {_fmt(per_user['profiles'], 3)} ms, "
+          f"rank {_fmt(per_user['rank'], 3)} ms, store {_fmt(per_user['store'], 3)} ms")
+    print(f"projected full pass {_fmt(report['projected_pass_seconds'] / 60)} min")
+    print(f"rank vs exhaustive  {_fmt(report['rank_ms_per_user'], 3)} ms vs {_fmt(report['exact_ms_per_user'], 3)} ms "
+          f"per user, recall@{report['top_k']} {_fmt(report['recall_at_k'], 3)}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'commit': _git_commit(), 'python': platform.python_version(), **report}, f, indent=2)
+
+
+def _fmt(value, digits=1):
+    return '-' if value is None else f'{value:.{digits}f}'
+
+
+def print_results(results):
+    print(f"{'route':<28}{'req':>6}{'err':>5}{'rps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for row in results:
+        print(f"{row['route']:<28}{row['requests']:>6}{row['errors']:>5}{_fmt(row['throughput_rps']):>9}"
+              f"{_fmt(row['p50_ms']):>9}{_fmt(row['p90_ms']):>9}{_fmt(row['p99_ms']):>9}"
+              f"{_fmt(row['queries_mean']):>9}")
+
+
+def compare_command(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    before = {row['route']: row for row in baseline['results']}
+    print(f"baseline {baseline.get('commit')} -> candidate {candidate.get('commit')}")
+    print(f"{'route':<28}{'p50 ms':>18}{'p99 ms':>18}{'rps':>18}{'queries':>14}")
+
+    def delta(old, new, digits=1):
+        if old is None or new is None:
+            return f'{_fmt(old, digits)} -> {_fmt(new, digits)}'
+        change = (new - old) / old * 100 if old else 0.0
+        return f'{_fmt(new, digits)} ({change:+.0f}%)'
+
+    regressions = 0
+    for row in candidate['results']:
+        old = before.get(row['route'])
+        if old is None:
+            continue
+        print(f"{row['route']:<28}{delta(old['p50_ms'], row['p50_ms']):>18}{delta(old['p99_ms'], row['p99_ms']):>18}"
+              f"{delta(old['throughput_rps'], row['throughput_rps']):>18}"
+              f"{delta(old['queries_mean'], row['queries_mean']):>14}")
+        if old['p99_ms'] and row['p99_ms'] and row['p99_ms'] > old['p99_ms'] * (1 + args.threshold):
+            regressions += 1
+    if regressions:
+        print(f'{regressions} route(s) regressed p99 by more than {args.threshold:.0%}.')
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='Bulk-generate a synthetic dataset.')
+    seed.add_argument('--database-url', required=True)
+    seed.add_argument('--users', type=_count, default=10000)
+    seed.add_argument('--jobs', type=_count, default=5000)
+    seed.add_argument('--applications', type=_count, default=100000)
+    seed.add_argument('--chunk-size', type=_count, default=10000)
+    seed.add_argument('--seed', type=int, default=42)
+    seed.add_argument('--similarity', action='store_true', help='Also rebuild the similar-jobs index.')
+    seed.set_defaults(func=seed_command)
+
+    run = commands.add_parser('run', help='Run the workload and report per-route results.')
+    run.add_argument('--database-url', required=True)
+    run.add_argument('--url', help='Base URL of a running server; default drives the Flask test client.')
+    run.add_argument('--requests', type=int, default=100, help='Requests per route.')
+    run.add_argument('--concurrency', type=int, default=1, help='Concurrent requests (HTTP mode).')
+    run.add_argument('--route', action='append', help='Only run this route; repeatable.')
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--output', help='Write results as JSON for later comparison.')
+    run.set_defaults(func=run_command)
+
+    servers = commands.add_parser('servers', help='Compare sync (gunicorn) and async (uvicorn) serving of read routes.')
+    servers.add_argument('--database-url', required=True)
+    servers.add_argument('--server', action='append', choices=['sync', 'async'],
+                         help='Server kind to run; repeatable. Default: both.')
+    servers.add_argument('--workers', type=int, default=1, help='Worker processes per server (one per core).')
+    servers.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels.')
+    servers.add_argument('--requests', type=int, default=200, help='Requests per route and level.')
+    servers.add_argument('--seed', type=int, default=42)
+    servers.add_argument('--output', help='Write results as JSON.')
+    servers.set_defaults(func=servers_command)
+
+    recommend = commands.add_parser('recommend', help='Time the offline recommendation pass per user.')
+    recommend.add_argument('--database-url', required=True)
+    recommend.add_argument('--users', type=_count, default=20000, help='Users scored for the per-user cost.')
+    recommend.add_argument('--exact-users', type=_count, default=500, help='Users also ranked exhaustively for recall.')
+    recommend.add_argument('--index-path', default='instance/benchmark-recommendations',
+                           help='Where to build the job index.')
+    recommend.add_argument('--seed', type=int, default=42)
+    recommend.add_argument('--output', help='Write results as JSON.')
+    recommend.set_defaults(func=recommend_command)
+
+    compare = commands.add_parser('compare', help='Compare two result files, e.g. from two commits.')
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.add_argument('--threshold', type=float, default=0.2, help='Allowed p99 slowdown before failing.')
+    compare.set_defaults(func=compare_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Scalable synthetic data generator.
+
+Rows are generated in chunks and written with Core ``insert()`` executemany
+calls, one short transaction per chunk, with secondary indexes rebuilt once
+per table afterwards. Primary keys are assigned here
+(continuing from the current maximum) so related rows can reference each
+other without reading anything back, and every synthetic user shares one
+precomputed password hash.
+"""
+import random
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, inspect
+
+from app import db
+from app.models import User, Job, Resume, Application, Role
+from app.passwords import password_hasher
+from app.salary import salary_columns
+
+USER_PASSWORD = 'password'
+ADMIN_PASSWORD = 'adminpass'
+
+JOB_TITLES = [
+    'Software Engineer', 'Web Developer', 'Data Analyst', 'Product Manager',
+    'UI/UX Designer', 'Marketing Specialist', 'Sales Representative',
+    'Customer Support', 'HR Manager', 'Finance Analyst', 'DevOps Engineer',
+    'Data Scientist', 'Project Coordinator', 'Accountant', 'Business Analyst',
+]
+JOB_LEVELS = ['Junior', 'Senior', 'Lead', 'Principal', 'Associate', 'Staff']
+JOB_LOCATIONS = ['Hong Kong', 'Kowloon', 'New Territories', 'Shenzhen', 'Remote',
+                 'Central', 'Tsim Sha Tsui', 'Quarry Bay', 'Sha Tin', 'Kwun Tong']
+JOB_SALARIES = [
+    'HK$15,000 - HK$20,000', 'HK$20,000 - HK$25,000', 'HK$25,000 - HK$30,000',
+    'HK$30,000 - HK$40,000', 'HK$40,000 - HK$50,000', 'HK$50,000 - HK$70,000',
+]
+SKILLS = ['Python', 'SQL', 'JavaScript', 'Excel', 'communication', 'leadership',
+          'Java', 'cloud', 'analytics', 'negotiation', 'design', 'Cantonese', 'Mandarin']
+EDUCATION_LEVELS = ["High School", "Associate's Degree", "Bachelor's Degree", "Master's Degree", "PhD"]
+STATUSES = ['Pending', 'Reviewed', 'Rejected', 'Accepted']
+STATUS_WEIGHTS = [60, 20, 15, 5]
+
+
+class Progress:
+    """Prints rows written and throughput for one table at most once a second."""
+
+    def __init__(self, label, total, stream=sys.stderr):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.stream = stream
+        self.started = time.monotonic()
+        self._last = 0.0
+
+    def advance(self, count):
+        self.done += count
+        now = time.monotonic()
+        if now - self._last >= 1.0 or self.done >= self.total:
+            self._last = now
+            elapsed = max(now - self.started, 1e-9)
+            self.stream.write(f'\r{self.label}: {self.done:,}/{self.total:,} '
+                              f'({self.done / elapsed:,.0f} rows/s)')
+            if self.done >= self.total:
+                self.stream.write('\n')
+            self.stream.flush()
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _tune_connection(conn):
+    """Relax per-statement durability on the loading connection; the data is synthetic."""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        conn.exec_driver_sql('PRAGMA synchronous = OFF')
+    elif dialect == 'mysql':
+        conn.exec_driver_sql('SET unique_checks = 0, foreign_key_checks = 0')
+
+
+@contextmanager
+def _deferred_indexes(conn, table):
+    """Drop the table's non-unique secondary indexes for the block and rebuild them after.
+
+    Building an index once over the loaded rows is much cheaper than updating
+    it on every insert. MySQL keeps indexes a foreign key depends on.
+    """
+    existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+    foreign_keys = {fk.parent.name for fk in table.foreign_keys}
+    deferred = [index for index in table.indexes
+                if index.name in existing and not index.unique
+                and not (conn.dialect.name == 'mysql' and index.expressions[0].name in foreign_keys)]
+    for index in deferred:
+        index.drop(conn)
+    conn.commit()
+    try:
+        yield
+    finally:
+        if deferred:
+            started = time.monotonic()
+            for index in deferred:
+                index.create(conn)
+            conn.commit()
+            sys.stderr.write(f'{table.name}: rebuilt {len(deferred)} indexes in {time.monotonic() - started:.1f}s\n')
+
+
+def _write(model, total, rows, chunk_size, label, defer_indexes=True):
+    """Insert ``total`` rows from an iterator in ``chunk_size`` executemany batches.
+
+    Uses one connection for the whole table and commits after every chunk, so
+    transactions stay short and memory stays flat however large ``total`` is.
+    """
+    progress = Progress(label, total)
+    table = model.__table__
+    insert = table.insert()
+    db.session.commit()
+    with db.engine.connect() as conn:
+        _tune_connection(conn)
+        with _deferred_indexes(conn, table) if defer_indexes and total else nullcontext():
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    conn.execute(insert, chunk)
+                    conn.commit()
+                    progress.advance(len(chunk))
+                    chunk = []
+            if chunk:
+                conn.execute(insert, chunk)
+                conn.commit()
+                progress.advance(len(chunk))
+    if total == 0:
+        progress.advance(0)
+
+
+def generate(users, jobs, applications, seed=42, chunk_size=10000, days=365, prefix='bench_', admin_id=None,
+             defer_indexes=True):
+    """Append a synthetic dataset of the given size and return the id ranges used.
+
+    Users are named ``{prefix}user{id}`` and all log in with ``USER_PASSWORD``.
+    Jobs are posted by ``admin_id``; when it is None an admin account
+    ``{prefix}admin{id}`` is created first. ``applications`` is capped at
+    ``users * jobs`` since each user applies to a job at most once. With
+    ``defer_indexes`` secondary indexes are rebuilt after each table is loaded.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = password_hasher.hash(USER_PASSWORD)
+    applications = min(applications, users * jobs)
+
+    if admin_id is None:
+        admin_id = _next_id(User)
+        db.session.execute(User.__table__.insert(), [{
+            'id': admin_id, 'username': f'{prefix}admin{admin_id}', 'email': f'{prefix}admin{admin_id}@example.com',
+            'password_hash': password_hasher.hash(ADMIN_PASSWORD), 'role': Role.ADMIN,
+            'created_at': now - timedelta(days=days),
+        }])
+        db.session.commit()
+
+    first_user = _next_id(User)
+    first_job = _next_id(Job)
+    first_resume = _next_id(Resume)
+    first_application = _next_id(Application)
+
+    def user_rows():
+        for i in range(users):
+            user_id = first_user + i
+            yield {
+                'id': user_id,
+                'username': f'{prefix}user{user_id}',
+                'email': f'{prefix}user{user_id}@example.com',
+                'password_hash': password_hash,
+                'role': Role.USER,
+                'created_at': now - timedelta(seconds=rng.randrange(days * 86400)),
+            }
+
+    salaries = {text: salary_columns(text) for text in JOB_SALARIES}
+
+    def job_rows():
+        for i in range(jobs):
+            title = f'{rng.choice(JOB_LEVELS)} {rng.choice(JOB_TITLES)}'
+            skills = rng.sample(SKILLS, 4)
+            salary = rng.choice(JOB_SALARIES)
+            yield {
+                'id': first_job + i,
+                'title': title,
+                'description': f'We are hiring a {title} to join our growing team. '
+                               f'You will work with {skills[0]} and {skills[1]} every day.',
+                'requirements': f'Requirements for {title}:\n- {skills[0]}\n- {skills[1]}\n'
+                                f'- {skills[2]}\n- {skills[3]}',
+                'location': rng.choice(JOB_LOCATIONS),
+                'salary': salary,
+                **salaries[salary],
+                'contact_info': f'hr@company{rng.randrange(1000)}.com',
+                'created_at': now - timedelta(seconds=rng.randrange(days * 86400)),
+                'posted_by': admin_id,
+            }
+
+    def resume_rows():
+        for i in range(users):
+            user_id = first_user + i
+            skills = rng.sample(SKILLS, 3)
+            yield {
+                'id': first_resume + i,
+                'user_id': user_id,
+                'name': f'User {user_id}',
+                'gender': rng.choice(['Male', 'Female', 'Other']),
+                'age': rng.randint(21, 60),
+                'education': rng.choice(EDUCATION_LEVELS),
+                'contact': f'{prefix}user{user_id}@example.com',
+                'experience': f'{rng.randint(1, 20)} years of {skills[0]} and {skills[1]}.',
+                'introduction': f'Motivated professional with strong {skills[2]} skills.',
+                'created_at': now,
+                'updated_at': now,
+            }
+
+    def application_rows():
+        # Spread applications evenly over users; each user applies to a run of
+        # consecutive jobs from a random start, which keeps (user, job) unique
+        if not applications:
+            return
+        base, extra = divmod(applications, users)
+        application_id = first_application
+        for i in range(users):
+            count = base + (1 if i < extra else 0)
+            start = rng.randrange(jobs)
+            statuses = rng.choices(STATUSES, STATUS_WEIGHTS, k=count)
+            for j in range(count):
+                created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+                yield {
+                    'id': application_id,
+                    'user_id': first_user + i,
+                    'job_id': first_job + (start + j) % jobs,
+                    'resume_id': first_resume + i,
+                    'status': statuses[j],
+                    'created_at': created_at,
+                    'updated_at': created_at,
+                }
+                application_id += 1
+
+    _write(User, users, user_rows(), chunk_size, 'users', defer_indexes)
+    _write(Job, jobs, job_rows(), chunk_size, 'jobs', defer_indexes)
+    _write(Resume, users, resume_rows(), chunk_size, 'resumes', defer_indexes)
+    _write(Application, applications, application_rows(), chunk_size, 'applications', defer_indexes)
+
+    return {
+        'admin_id': admin_id,
+        'users': (first_user, first_user + users - 1),
+        'jobs': (first_job, first_job + jobs - 1),
+        'applications': applications,
+    }
@@ -0,0 +1,83 @@
+"""Cost of the offline recommendation pass (``app.recommendations``).
+
+Builds the job index, then scores a random sample of users in the batches
+the nightly rebuild uses, timing each stage per user: loading and embedding
+profiles, ranking (the clustered candidate search) and storing the lists.
+The full pass is projected from the per-user cost. A smaller sample is
+also ranked exactly, against every job, for the recall of the clustered
+search and the cost it avoids.
+
+    python -m benchmarks seed --database-url sqlite:///rec.db --users 1e6 --jobs 5e5 --applications 2e6
+    python -m benchmarks recommend --database-url sqlite:///rec.db --users 20000
+"""
+import random
+import time
+
+import numpy as np
+from sqlalchemy import exists, or_, select
+
+from app import db
+from app.models import Application, Resume, User
+from app.recommendations import Profiles, get_index
+from app.similarity import top_neighbours
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def measure_recommendations(sample_users=20000, exact_users=500, seed=42):
+    """Build the index and score sampled users; return a report dict (times in seconds)."""
+    index = get_index()
+    jobs, build_seconds = _timed(index.build)
+    built = index.index()
+
+    has_profile = or_(exists().where(Resume.user_id == User.id), exists().where(Application.user_id == User.id))
+    user_ids = db.session.scalars(select(User.id).where(has_profile).order_by(User.id)).all()
+    sample = sorted(random.Random(seed).sample(user_ids, min(sample_users, len(user_ids))))
+
+    stages = {'profiles': 0.0, 'rank': 0.0, 'store': 0.0}
+    for start in range(0, len(sample), index.batch_size):
+        batch = sample[start:start + index.batch_size]
+        profiles, seconds = _timed(index.profiles, batch)
+        stages['profiles'] += seconds
+        (job_ids, scores), seconds = _timed(index.rank, profiles)
+        stages['rank'] += seconds
+        started = time.perf_counter()
+        index.store(profiles.user_ids, job_ids, scores)
+        db.session.commit()
+        stages['store'] += time.perf_counter() - started
+
+    # Recall against an exhaustive search over every indexed job, applications ignored by both
+    exact_sample = sample[:exact_users]
+    profiles = index.profiles(exact_sample)
+    empty = np.zeros(0, dtype=np.int64)
+    profiles = Profiles(profiles.user_ids, profiles.vectors, empty, empty)
+    (approximate, _), approximate_seconds = _timed(index.rank, profiles)
+    (exact, exact_scores), exact_seconds = _timed(
+        top_neighbours, profiles.vectors, np.full(len(exact_sample), -1), built.vectors, built.ids, index.top_k)
+    found = wanted = 0
+    for approximate_ids, exact_ids, row_scores in zip(approximate, exact, exact_scores):
+        relevant = {int(job_id) for job_id, score in zip(exact_ids, row_scores) if score > 0}
+        wanted += len(relevant)
+        found += len(relevant & {int(job_id) for job_id in approximate_ids})
+
+    per_user = {stage: seconds / max(len(sample), 1) for stage, seconds in stages.items()}
+    return {
+        'jobs': jobs,
+        'users': len(user_ids),
+        'sampled_users': len(sample),
+        'clusters': len(built.centroids),
+        'probes': index.probes,
+        'dimensions': index.dim,
+        'top_k': index.top_k,
+        'index_mb': built.vectors.nbytes / 2 ** 20,
+        'build_seconds': build_seconds,
+        'per_user_ms': {stage: seconds * 1000 for stage, seconds in per_user.items()},
+        'projected_pass_seconds': build_seconds + sum(per_user.values()) * len(user_ids),
+        'recall_at_k': found / wanted if wanted else None,
+        'rank_ms_per_user': approximate_seconds * 1000 / max(len(exact_sample), 1),
+        'exact_ms_per_user': exact_seconds * 1000 / max(len(exact_sample), 1),
+    }
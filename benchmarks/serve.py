@@ -0,0 +1,22 @@
+"""App factories for benchmark servers, configured from ``BENCHMARK_DATABASE_URL``.
+
+    gunicorn --workers 2 'benchmarks.serve:wsgi_app()'
+    uvicorn --factory --workers 2 benchmarks.serve:asgi_app
+"""
+import os
+
+from benchmarks import benchmark_config
+
+
+def _config():
+    return benchmark_config(os.environ['BENCHMARK_DATABASE_URL'])
+
+
+def wsgi_app():
+    from app import create_app
+    return create_app(_config())
+
+
+def asgi_app():
+    from app.asgi import create_asgi_app
+    return create_asgi_app(_config())
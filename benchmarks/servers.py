@@ -0,0 +1,70 @@
+"""Sync (gunicorn) vs async (uvicorn + app/asgi.py) serving of the public read routes.
+
+Each server is started as a subprocess with the same number of workers and
+driven over HTTP at increasing concurrency; throughput is reported per
+worker so results compare across machines with different core counts.
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.workload import HTTPDriver, run_workload
+
+READ_ROUTES = ['main.index', 'main.search', 'main.search[location]', 'main.job_details']
+
+
+def server_command(kind, workers, port):
+    if kind == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+                '--log-level', 'warning', 'benchmarks.serve:wsgi_app()']
+    if kind == 'async':
+        return [sys.executable, '-m', 'uvicorn', '--factory', 'benchmarks.serve:asgi_app', '--workers', str(workers),
+                '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log']
+    raise ValueError(f'Unknown server kind: {kind}')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with status {process.returncode}')
+        try:
+            urllib.request.urlopen(url + '/', timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not come up within {timeout}s')
+
+
+def compare_servers(database_url, job_ids, user_ids, admin_email, user_email, kinds=('sync', 'async'),
+                    workers=1, concurrency_levels=(1, 8, 32), requests_per_route=200, seed=42):
+    """Return result rows: one per (server, concurrency, route)."""
+    env = dict(os.environ, BENCHMARK_DATABASE_URL=database_url)
+    rows = []
+    for kind in kinds:
+        port = _free_port()
+        url = f'http://127.0.0.1:{port}'
+        process = subprocess.Popen(server_command(kind, workers, port), env=env)
+        try:
+            _wait_until_up(url, process)
+            driver = HTTPDriver(url, admin_email, user_email)
+            for concurrency in concurrency_levels:
+                results = run_workload(driver, job_ids, user_ids, requests_per_route=requests_per_route,
+                                       concurrency=concurrency, seed=seed, routes=READ_ROUTES)
+                for result in results:
+                    rps = result['throughput_rps']
+                    rows.append(dict(result, server=kind, workers=workers, concurrency=concurrency,
+                                     rps_per_worker=rps / workers if rps else None))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return rows
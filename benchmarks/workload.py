@@ -0,0 +1,176 @@
+"""Scripted workload driver.
+
+Requests a fixed mix of routes either in-process through the Flask test
+client (which also records SQL statement counts) or over HTTP against a
+running server such as a local gunicorn, and summarizes per-route
+throughput and latency percentiles.
+"""
+import http.cookiejar
+import random
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from app import db
+from app.models import User, Job, Role
+from app.queries import count_queries
+from benchmarks.datagen import JOB_TITLES, JOB_LOCATIONS, USER_PASSWORD, ADMIN_PASSWORD
+
+CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+# Statement count reported by the app's Server-Timing header (app/metrics.py)
+SERVER_TIMING_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(route, latencies, elapsed, query_counts, errors):
+    """Per-route result row; latencies are in milliseconds."""
+    count = len(latencies)
+    return {
+        'route': route,
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': count / elapsed if elapsed > 0 else None,
+        'p50_ms': percentile(latencies, 0.50),
+        'p90_ms': percentile(latencies, 0.90),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': max(latencies) if latencies else None,
+        'queries_mean': sum(query_counts) / len(query_counts) if query_counts else None,
+    }
+
+
+def build_scenarios(rng, job_ids, user_ids):
+    """Route name -> (role, callable returning (method, path)) for the workload mix."""
+    def random_job():
+        return rng.choice(job_ids)
+
+    return {
+        'main.index': ('anonymous', lambda: ('GET', '/')),
+        'main.search': ('anonymous', lambda: (
+            'GET', '/search?' + urllib.parse.urlencode({'title': rng.choice(JOB_TITLES).split()[0]}))),
+        'main.search[location]': ('anonymous', lambda: (
+            'GET', '/search?' + urllib.parse.urlencode({'location': rng.choice(JOB_LOCATIONS)}))),
+        'main.job_details': ('anonymous', lambda: ('GET', f'/job/{random_job()}')),
+        'user.apply_job': ('user', lambda: ('POST', f'/user/apply/{random_job()}')),
+        'user.applications': ('user', lambda: ('GET', '/user/applications')),
+        'admin.dashboard': ('admin', lambda: ('GET', '/admin/dashboard')),
+        'admin.manage_jobs': ('admin', lambda: ('GET', '/admin/jobs')),
+        'admin.manage_users': ('admin', lambda: ('GET', '/admin/users')),
+        'admin.manage_applications': ('admin', lambda: ('GET', '/admin/applications')),
+    }
+
+
+def sample_ids(sample=1000):
+    """Ids of recent jobs and users to aim requests at, plus one admin."""
+    job_ids = [row.id for row in Job.query.with_entities(Job.id).order_by(Job.id.desc()).limit(sample)]
+    user_ids = [row.id for row in User.query.with_entities(User.id)
+                .filter_by(role=Role.USER).order_by(User.id.desc()).limit(sample)]
+    admin = User.query.filter_by(role=Role.ADMIN).order_by(User.id.desc()).first()
+    if not job_ids or not user_ids or admin is None:
+        raise RuntimeError('The database needs jobs, users and an admin; run `python -m benchmarks seed` first.')
+    return job_ids, user_ids, admin
+
+
+class InProcessDriver:
+    """Drives the app through the Flask test client; records SQL statement counts.
+
+    Must be used outside an app context so each request gets a fresh one,
+    with its own session and ``current_user``, as it would in production.
+    """
+
+    def __init__(self, app, admin_id):
+        self.app = app
+        self.admin_id = admin_id
+        self.client = app.test_client()
+        with app.app_context():
+            self.engine = db.engine
+
+    def request(self, role, method, path, user_id):
+        account = {'admin': self.admin_id, 'user': user_id}.get(role)
+        with self.client.session_transaction() as session:
+            session.clear()
+            if account is not None:
+                session['_user_id'] = str(account)
+                session['_fresh'] = True
+        with count_queries(self.engine) as counter:
+            started = time.perf_counter()
+            response = self.client.open(path, method=method)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, counter.count
+
+
+class HTTPDriver:
+    """Drives a running server over HTTP; one cookie session per role.
+
+    Statement counts are read from the Server-Timing header when the server sends one.
+    """
+
+    def __init__(self, base_url, admin_email, user_email):
+        self.base_url = base_url.rstrip('/')
+        self.openers = {'anonymous': self._opener()}
+        self.openers['admin'] = self._login(admin_email, ADMIN_PASSWORD)
+        self.openers['user'] = self._login(user_email, USER_PASSWORD)
+
+    def _opener(self):
+        return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def _login(self, email, password):
+        opener = self._opener()
+        page = opener.open(self.base_url + '/auth/login').read().decode('utf-8')
+        match = CSRF_RE.search(page)
+        data = {'email': email, 'password': password}
+        if match:
+            data['csrf_token'] = match.group(1)
+        opener.open(self.base_url + '/auth/login', data=urllib.parse.urlencode(data).encode('ascii')).read()
+        return opener
+
+    def request(self, role, method, path, user_id):
+        data = b'' if method == 'POST' else None
+        started = time.perf_counter()
+        try:
+            response = self.openers[role].open(self.base_url + path, data=data)
+            response.read()
+            status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            status, headers = error.code, error.headers
+        elapsed = time.perf_counter() - started
+        match = SERVER_TIMING_QUERIES_RE.search(headers.get('Server-Timing') or '')
+        return status, elapsed, int(match.group(1)) if match else None
+
+
+def run_workload(driver, job_ids, user_ids, requests_per_route=100, concurrency=1, seed=42, routes=None):
+    """Run every scenario and return a list of per-route summaries."""
+    rng = random.Random(seed)
+    scenarios = build_scenarios(rng, job_ids, user_ids)
+    results = []
+    for route, (role, make_request) in scenarios.items():
+        if routes and route not in routes:
+            continue
+        calls = [(role,) + make_request() + (rng.choice(user_ids),) for _ in range(requests_per_route)]
+        latencies, query_counts, errors = [], [], 0
+
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(lambda call: driver.request(*call), calls))
+        else:
+            outcomes = [driver.request(*call) for call in calls]
+        elapsed = time.perf_counter() - started
+
+        for status, seconds, queries in outcomes:
+            if status >= 500:
+                errors += 1
+            latencies.append(seconds * 1000.0)
+            if queries is not None:
+                query_counts.append(queries)
+        results.append(summarize(route, latencies, elapsed, query_counts, errors))
+    return results
@@ -0,0 +1,83 @@
+"""Check that an invalidation racing a cache fill is not lost.
+
+For each backend, ``cache.get_or_set`` computes a value while another writer
+(for SQLite, a second backend on the same file standing in for another
+worker) invalidates one of its tags. The stale value must not be stored: the
+next call recomputes it. Entries filled without a concurrent write must still
+be cached, and an invalidation must drop the entry and bump the version in
+one go.
+
+    python check_cache_versions.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from app import create_app
+from app.cache import CacheStats, SQLiteBackend, cache
+from config import Config
+
+
+def cache_config(backend, path):
+    class CacheConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        CACHE_BACKEND = backend
+        CACHE_SQLITE_PATH = path
+        TESTING = True
+    return CacheConfig
+
+
+def check(results, name, passed):
+    results.append(passed)
+    print(f'{name:<60} {"ok" if passed else "FAIL"}')
+
+
+def check_backend(results, choice, workdir):
+    path = os.path.join(workdir, f'{choice}.sqlite')
+    app = create_app(cache_config(choice, path))
+    with app.app_context():
+        backend = cache.backend
+        # Another worker's writes; the memory backend is per process, so it is the same one
+        other = SQLiteBackend(CacheStats(), path) if choice == 'sqlite' else backend
+        calls = []
+
+        def compute_racing_a_write():
+            calls.append(1)
+            other.invalidate('job:1')
+            return f'value {len(calls)}'
+
+        cache.get_or_set('job:1', compute_racing_a_write, ('jobs', 'job:1'))
+        found, _ = backend.get('job:1')
+        check(results, f'{choice}: a value whose tag moved while computing is not set', not found)
+        check(results, f'{choice}: the refused set is counted', backend.stats.stale_sets == 1)
+
+        value = cache.get_or_set('job:1', lambda: 'fresh', ('jobs', 'job:1'))
+        found, cached = backend.get('job:1')
+        check(results, f'{choice}: the next call recomputes and caches', value == 'fresh' and cached == 'fresh')
+
+        before = backend.tag_versions(('jobs', 'job:1'))
+        other.invalidate('jobs')
+        found, _ = backend.get('job:1')
+        after = backend.tag_versions(('jobs', 'job:1'))
+        check(results, f'{choice}: invalidate drops the entry and bumps the version',
+              not found and after == (before[0] + 1, before[1]))
+        check(results, f'{choice}: a set with the old versions is refused',
+              not backend.set('job:1', 'stale', 60, ('jobs', 'job:1'), before))
+        check(results, f'{choice}: a set with the current versions is stored',
+              backend.set('job:1', 'current', 60, ('jobs', 'job:1'), after))
+
+
+def check_cache_versions():
+    workdir = tempfile.mkdtemp()
+    results = []
+    try:
+        for choice in ('memory', 'sqlite'):
+            check_backend(results, choice, workdir)
+    finally:
+        shutil.rmtree(workdir)
+    return all(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_cache_versions() else 1)
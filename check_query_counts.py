@@ -0,0 +1,123 @@
+"""Check that admin pages run a constant number of SQL statements.
+
+Seeds an in-memory SQLite database, renders the signed-in home page, each
+admin page and JSON API endpoint, doubles the data and renders again. Any page whose statement count
+grows with the row count has an N+1 query and fails the check.
+
+    python check_query_counts.py
+"""
+import sys
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.models import User, Job, Resume, Application, Role
+from app.cache import cache
+from app.identity import identity_cache
+from app.pagination import count_cache
+from app.queries import count_queries
+from config import Config
+
+PAGES = [
+    '/',
+    '/admin/dashboard',
+    '/admin/jobs',
+    '/admin/users',
+    '/admin/applications',
+    '/user/applications',
+    '/admin/user/1/applications',
+    '/api/v1/jobs?fields=title,description,posted_by',
+    '/api/v1/applications?fields=job_title,status',
+    '/api/v1/resumes',
+]
+
+
+class QueryCountConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    WTF_CSRF_ENABLED = False
+    TESTING = True
+
+
+def seed(batch, admin, job_count=20, user_count=20):
+    """Add one batch of jobs, users, resumes and applications."""
+    now = datetime.utcnow()
+    jobs = [
+        Job(
+            title=f'Job {batch}-{i}',
+            description='Description',
+            requirements='Requirements',
+            location='Hong Kong',
+            salary='HK$20,000 - HK$25,000',
+            contact_info='hr@example.com',
+            posted_by=admin.id,
+            created_at=now - timedelta(minutes=batch * job_count + i)
+        )
+        for i in range(job_count)
+    ]
+    db.session.add_all(jobs)
+    users = [User(username=f'user{batch}-{i}', email=f'user{batch}-{i}@example.com', password='password')
+             for i in range(user_count)]
+    db.session.add_all(users)
+    db.session.commit()
+
+    for user in users + [admin]:
+        resume = user.resumes.first()
+        if resume is None:
+            resume = Resume(user_id=user.id, name=user.username, gender='Other', age=30,
+                            education='Degree', contact=user.email, experience='Experience',
+                            introduction='Introduction')
+            db.session.add(resume)
+            db.session.flush()
+        for job in jobs[:5]:
+            db.session.add(Application(user_id=user.id, job_id=job.id, resume_id=resume.id))
+    db.session.commit()
+
+
+def measure(app, client):
+    counts = {}
+    with app.app_context():
+        engine = db.engine
+    for page in PAGES:
+        count_cache.clear()
+        with app.app_context():
+            cache.clear()
+            identity_cache.clear()
+        with count_queries(engine) as counter:
+            response = client.get(page)
+        if response.status_code != 200:
+            raise RuntimeError(f'{page} returned {response.status_code}')
+        counts[page] = counter.count
+    return counts
+
+
+def check_query_counts():
+    app = create_app(QueryCountConfig)
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin', email='admin@example.com', password='adminpass', role=Role.ADMIN)
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+        client = app.test_client()
+        client.post('/auth/login', data={'email': 'admin@example.com', 'password': 'adminpass'})
+
+        seed(1, admin)
+    # Pages are requested outside the seeding app context so every request
+    # starts with an empty session, as it would in production
+    before = measure(app, client)
+    with app.app_context():
+        admin = db.session.get(User, admin_id)
+        seed(2, admin)
+        seed(3, admin)
+    after = measure(app, client)
+
+    failed = False
+    for page in PAGES:
+        status = 'ok' if before[page] == after[page] else 'GROWS'
+        failed = failed or status != 'ok'
+        print(f'{page:<48} {before[page]:>3} -> {after[page]:>3} queries  {status}')
+    return not failed
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_query_counts() else 1)
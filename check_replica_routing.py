@@ -0,0 +1,154 @@
+"""Check read/write splitting against a primary and a replica.
+
+By default both are SQLite files in a temporary directory. Pass two MySQL
+URIs to run the same checks against two local servers instead. Each database
+is seeded with the same rows (once), then the replica's job titles are
+prefixed with "REPLICA" so every page shows which database answered it:
+
+    python check_replica_routing.py
+    python check_replica_routing.py mysql+pymysql://...primary mysql+pymysql://...replica
+
+Checks that read-only pages come from the replica, that writes go to the
+primary and pin the rest of the request there, and that the client that
+wrote reads from the primary until its read-your-writes window passes, as
+does a cache refill just after the entry was invalidated.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from flask import g
+from sqlalchemy import create_engine, delete, func, select, update
+
+from app import create_app, db
+from app.cache import CacheStats, MemoryBackend, cache
+from app.database import PRIMARY, REPLICA, use_replica
+from app.models import User, Job, Resume, Application, Role
+from config import Config
+
+MARK = 'REPLICA '
+
+
+def routing_config(primary, replica):
+    class ReplicaConfig(Config):
+        SQLALCHEMY_DATABASE_URI = primary
+        DATABASE_REPLICA_URI = replica
+        DB_READ_YOUR_WRITES_SECONDS = 1
+        CACHE_BACKEND = 'null'
+        IDENTITY_CACHE_TTL = 0
+        WTF_CSRF_ENABLED = False
+        TESTING = True
+    return ReplicaConfig
+
+
+def seed(uri):
+    app = create_app(routing_config(uri, None))
+    with app.app_context():
+        db.create_all()
+        user_id = db.session.scalar(select(User.id).where(User.email == 'user@example.com'))
+        if user_id is not None:
+            # Seeded by an earlier run: forget the application it made
+            db.session.execute(delete(Application).where(Application.user_id == user_id))
+            db.session.commit()
+            db.engine.dispose()
+            return
+        admin = User(username='admin', email='admin@example.com', password='adminpass', role=Role.ADMIN)
+        user = User(username='user', email='user@example.com', password='password')
+        db.session.add_all([admin, user])
+        db.session.flush()
+        db.session.add_all([
+            Job(title=f'Job {i}', description='Description', requirements='Requirements',
+                location='Hong Kong', salary='HK$20,000 - HK$25,000', contact_info='hr@example.com',
+                posted_by=admin.id)
+            for i in range(3)
+        ])
+        db.session.add(Resume(user_id=user.id, name='user', gender='Other', age=30, education='Degree',
+                              contact='user@example.com', experience='Experience', introduction='Introduction'))
+        db.session.commit()
+        db.engine.dispose()
+
+
+def check(results, name, passed):
+    results.append((name, passed))
+    print(f'{name:<60} {"ok" if passed else "FAIL"}')
+
+
+def check_replica_routing(primary=None, replica=None):
+    workdir = None
+    if primary is None:
+        workdir = tempfile.mkdtemp()
+        primary = f'sqlite:///{os.path.join(workdir, "primary.db")}'
+        replica = f'sqlite:///{os.path.join(workdir, "replica.db")}'
+    seed(primary)
+    seed(replica)
+
+    replica_engine = create_engine(replica)
+    with replica_engine.begin() as connection:
+        connection.execute(update(Job).where(~Job.title.startswith(MARK)).values(title=MARK + Job.title))
+
+    app = create_app(routing_config(primary, replica))
+    results = []
+    try:
+        client = app.test_client()
+        check(results, 'anonymous home page reads the replica', MARK.encode() in client.get('/').data)
+
+        client.post('/auth/login', data={'email': 'user@example.com', 'password': 'password'})
+        with app.app_context():
+            job_id = db.session.scalar(select(Job.id).order_by(Job.id))
+        check(results, 'job page reads the replica', MARK.encode() in client.get(f'/job/{job_id}').data)
+
+        response = client.post(f'/user/apply/{job_id}')
+        with replica_engine.connect() as connection:
+            on_replica = connection.scalar(select(func.count(Application.id)))
+        with app.app_context():
+            on_primary = db.session.scalar(select(func.count(Application.id)))
+        check(results, 'application is written to the primary only', (on_primary, on_replica) == (1, 0))
+        check(results, 'writing sets the read-your-writes cookie',
+              'db_primary_until' in response.headers.get('Set-Cookie', ''))
+
+        page = client.get(f'/job/{job_id}').data
+        check(results, 'next read comes from the primary (sees the write)',
+              MARK.encode() not in page and b'</i>Applied' in page)
+        time.sleep(app.config['DB_READ_YOUR_WRITES_SECONDS'] + 0.1)
+        check(results, 'reads return to the replica after the window',
+              MARK.encode() in client.get(f'/job/{job_id}').data)
+
+        with app.test_request_context('/'):
+            use_replica()
+            replica_title = db.session.get(Job, job_id).title
+            db.session.add(Job(title='Pinned', description='-', requirements='-', location='-',
+                               salary='-', contact_info='-', posted_by=1))
+            db.session.flush()
+            pinned_count = db.session.scalar(select(func.count(Job.id)).where(Job.title == 'Pinned'))
+            check(results, 'within a request, reads start on the replica', replica_title.startswith(MARK))
+            check(results, 'a flush pins the rest of the request to the primary',
+                  g._db_route == PRIMARY and pinned_count == 1)
+            db.session.rollback()
+            use_replica()
+            check(results, 'a pinned request stays pinned', g._db_route != REPLICA)
+
+        # A per-process backend, so the check needs no cache file
+        app.extensions['cache'] = MemoryBackend(CacheStats(), 16)
+        job_title = select(Job.title).where(Job.id == job_id)
+        with app.test_request_context('/'):
+            use_replica()
+            cache.invalidate(f'job:{job_id}')
+            refill = cache.get_or_set('check:refill', lambda: db.session.scalar(job_title), tags=(f'job:{job_id}',))
+            check(results, 'a refill just after invalidation reads the primary',
+                  not refill.startswith(MARK) and g._db_route == REPLICA)
+            other = cache.get_or_set('check:other', lambda: db.session.scalar(job_title), tags=('other',))
+            check(results, 'other refills read the replica', other.startswith(MARK))
+    finally:
+        replica_engine.dispose()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        if workdir is not None:
+            shutil.rmtree(workdir)
+    return all(passed for _, passed in results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_replica_routing(*sys.argv[1:3]) else 1)
@@ -0,0 +1,67 @@
+"""Check how salary texts are read into structured columns.
+
+Runs ``app.salary.salary_columns`` and the frozen copy in the migration that
+backfilled the columns over the same texts, so both keep reading them alike:
+
+    python check_salary_parsing.py
+"""
+import importlib.util
+import os
+import sys
+
+from app.salary import Salary, parse_salary_query, salary_columns
+
+MIGRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', 'versions', '127adb185b27_.py')
+
+JOBS = [
+    ('HK$20,000 - HK$25,000', Salary('HKD', 20000, 25000)),
+    ('20-25k', Salary('HKD', 20000, 25000)),
+    ('HK$25,000+', Salary('HKD', 25000, None)),
+    ('25k+ per month', Salary('HKD', 25000, None)),
+    ('Up to 30k', Salary('HKD', None, 30000)),
+    ('From HK$18,000', Salary('HKD', 18000, None)),
+    # Words that only contain "min", "over" or "max", and a "+" adding something else
+    ('HK$15,000 (terminal operations)', Salary('HKD', 15000, 15000)),
+    ('HK$15,000 admin allowance included', Salary('HKD', 15000, 15000)),
+    ('HK$20,000 + discretionary bonus', Salary('HKD', 20000, 20000)),
+    ('HK$20,000 plus overtime', Salary('HKD', 20000, 20000)),
+    ('HK$20,000 Maxwell Road office', Salary('HKD', 20000, 20000)),
+    ('MOP$18,000', Salary('MOP', 18000, 18000)),
+    ('US$4,000', Salary('USD', 4000, 4000)),
+    ('Negotiable', None),
+]
+
+QUERIES = [
+    ('25k', Salary('HKD', 25000, None)),
+    ('at least HK$25,000', Salary('HKD', 25000, None)),
+    ('under 30k', Salary('HKD', None, 30000)),
+    ('20k to 30k', Salary('HKD', 20000, 30000)),
+]
+
+
+def load_migration_columns():
+    spec = importlib.util.spec_from_file_location('salary_migration', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.salary_columns
+
+
+def check(results, name, got, expected):
+    results.append(got == expected)
+    print(f'{name:<60} {"ok" if got == expected else f"FAIL: {got}"}')
+
+
+def check_salary_parsing():
+    results = []
+    migration_columns = load_migration_columns()
+    for text, expected in JOBS:
+        expected = dict(zip(('salary_currency', 'salary_min', 'salary_max'), expected or (None, None, None)))
+        check(results, f'job {text!r}', salary_columns(text), expected)
+        check(results, f'job {text!r} (migration)', migration_columns(text), expected)
+    for text, expected in QUERIES:
+        check(results, f'search {text!r}', parse_salary_query(text), expected)
+    return all(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_salary_parsing() else 1)
@@ -0,0 +1,100 @@
+"""Check that a long task which reports progress is not requeued under its worker.
+
+Runs two tasks with a one-second ``TASKS_LOCK_TIMEOUT`` against a SQLite file
+in a temporary directory. Both outlive the timeout; between batches another
+app context (standing in for a second worker) calls ``requeue_stale``. The
+task that calls ``report_progress`` per batch must keep its lock; the one
+that never reports must be requeued.
+
+    python check_task_heartbeat.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import create_app, db
+from app.models import Task
+from app.tasks import claim, enqueue, report_progress, requeue_stale, run, task, worker_name
+from config import Config
+
+BATCHES = 3
+# Longer than the lock timeout in total, shorter per batch
+BATCH_SECONDS = 0.6
+
+requeued = []
+
+
+def heartbeat_config(uri):
+    class HeartbeatConfig(Config):
+        SQLALCHEMY_DATABASE_URI = uri
+        TASKS_LOCK_TIMEOUT = 1
+        CACHE_BACKEND = 'null'
+        TESTING = True
+    return HeartbeatConfig
+
+
+def other_worker_requeues(app):
+    with app.app_context():
+        requeued.append(requeue_stale())
+
+
+@task('check.reporting', max_attempts=1)
+def reporting_task():
+    app = current_app._get_current_object()
+    for batch in range(BATCHES):
+        time.sleep(BATCH_SECONDS)
+        report_progress({'batches': batch + 1})
+        db.session.commit()
+        other_worker_requeues(app)
+
+
+@task('check.silent', max_attempts=1)
+def silent_task():
+    time.sleep(BATCHES * BATCH_SECONDS)
+    other_worker_requeues(current_app._get_current_object())
+
+
+def check(results, name, passed):
+    results.append(passed)
+    print(f'{name:<60} {"ok" if passed else "FAIL"}')
+
+
+def run_one(app, name):
+    """Queue, claim and run task ``name``; return how many tasks were requeued while it ran."""
+    requeued.clear()
+    with app.app_context():
+        entry = enqueue(name)
+        db.session.commit()
+        claim(worker_name(), ids=[entry.id])
+        run(entry.id)
+        left = db.session.scalar(select(func.count(Task.id)))
+    return sum(requeued), left
+
+
+def check_task_heartbeat():
+    workdir = tempfile.mkdtemp()
+    app = create_app(heartbeat_config(f'sqlite:///{os.path.join(workdir, "tasks.db")}'))
+    results = []
+    try:
+        with app.app_context():
+            db.create_all()
+        count, left = run_one(app, 'check.reporting')
+        check(results, 'a task reporting progress is never requeued', count == 0)
+        check(results, 'it runs once and is deleted', left == 0)
+
+        count, _ = run_one(app, 'check.silent')
+        check(results, 'a task that stops reporting is requeued', count == 1)
+    finally:
+        with app.app_context():
+            db.engine.dispose()
+        shutil.rmtree(workdir)
+    return all(results)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_task_heartbeat() else 1)
@@ -1,109 +1,75 @@
+"""Load demo or bulk test data into the configured database.
+
+    python create_test_data.py                      # admin, 5 users, 10 jobs
+    python create_test_data.py --users 1e6 --jobs 5e5 --applications 2e7
+
+Rows are streamed in chunks with executemany inserts (see
+benchmarks/datagen.py) and every synthetic user shares one precomputed
+password hash, so large datasets load in minutes. The same --seed always
+produces the same data.
+"""
+import argparse
+
 from app import create_app, db
-from app.models import User, Job, Resume, Application, Role
-from datetime import datetime, timedelta
-import random
+from app.models import User, Role
+from app import stats, similarity
+from benchmarks.datagen import generate, USER_PASSWORD
 
 app = create_app()
 
-def create_test_data():
+
+def _count(value):
+    # Accept 1e6-style sizes
+    return int(float(value))
+
+
+def create_test_data(users=5, jobs=10, applications=15, seed=42, chunk_size=10000, similar_jobs=True,
+                     defer_indexes=True):
     with app.app_context():
-        admin = User(
-            username='admin',
-            email='admin@example.com',
-            password='adminpass',
-            role=Role.ADMIN
-        )
-        db.session.add(admin)
-
-        users = []
-        for i in range(1, 6):
-            user = User(
-                username=f'user{i}',
-                email=f'user{i}@example.com',
-                password=f'password{i}'
-            )
-            users.append(user)
-            db.session.add(user)
-        
-        db.session.commit()
-        print("Created admin and 5 regular users.")
-        
-
-        job_titles = [
-            "Software Engineer", "Web Developer", "Data Analyst", 
-            "Product Manager", "UI/UX Designer", "Marketing Specialist",
-            "Sales Representative", "Customer Support", "HR Manager",
-            "Finance Analyst"
-        ]
-        
-        job_locations = ["Hong Kong", "Kowloon", "New Territories", "Shenzhen", "Remote"]
-        
-        job_salaries = [
-            "HK$15,000 - HK$20,000", 
-            "HK$20,000 - HK$25,000",
-            "HK$25,000 - HK$30,000", 
-            "HK$30,000 - HK$40,000",
-            "HK$40,000 - HK$50,000"
-        ]
-        
-        jobs = []
-        for i in range(10):
-            job = Job(
-                title=job_titles[i],
-                description=f"This is a detailed description for the {job_titles[i]} position. We are looking for motivated professionals who want to grow with our company.",
-                requirements=f"Requirements for {job_titles[i]}:\n- Relevant experience\n- Good communication skills\n- Team player\n- Problem-solving abilities",
-                location=random.choice(job_locations),
-                salary=random.choice(job_salaries),
-                contact_info=f"HR Department, Email: hr@company{i+1}.com",
-                posted_by=admin.id,
-                created_at=datetime.utcnow() - timedelta(days=random.randint(1, 30))
-            )
-            jobs.append(job)
-            db.session.add(job)
-            
-        db.session.commit()
-        print("Created 10 job postings.")
-
-        education_levels = ["High School", "Associate's Degree", "Bachelor's Degree", "Master's Degree", "PhD"]
-        
-        for user in users:
-            resume = Resume(
-                user_id=user.id,
-                name=f"{user.username.capitalize()} User",
-                gender=random.choice(["Male", "Female"]),
-                age=random.randint(22, 45),
-                education=random.choice(education_levels),
-                contact=f"Phone: +852 {random.randint(10000000, 99999999)}, Email: {user.email}",
-                experience=f"Work Experience:\n- Company A: 2 years\n- Company B: 3 years\n- Various projects and internships",
-                introduction=f"I am a motivated professional with experience in various fields. I am looking for new opportunities to grow and develop my skills."
+        admin = User.query.filter_by(email='admin@example.com').first()
+        if admin is None:
+            admin = User(
+                username='admin',
+                email='admin@example.com',
+                password='adminpass',
+                role=Role.ADMIN
             )
-            db.session.add(resume)
-            
-        db.session.commit()
-        print("Created resumes for all regular users.")
-        
-
-        statuses = ["Pending", "Reviewed", "Rejected", "Accepted"]
-        
-        for user in users:
-            user_resume = Resume.query.filter_by(user_id=user.id).first()
-            job_count = random.randint(2, 4)
-            selected_jobs = random.sample(jobs, job_count)
-            
-            for job in selected_jobs:
-                application = Application(
-                    user_id=user.id,
-                    job_id=job.id,
-                    resume_id=user_resume.id,
-                    status=random.choice(statuses),
-                    created_at=datetime.utcnow() - timedelta(days=random.randint(1, 20))
-                )
-                db.session.add(application)
-                
-        db.session.commit()
-        print("Created job applications for users.")
-        
+            db.session.add(admin)
+            db.session.commit()
+            print("Created admin (admin@example.com / adminpass).")
+
+        ranges = generate(users, jobs, applications, seed=seed, chunk_size=chunk_size,
+                          prefix='', admin_id=admin.id, defer_indexes=defer_indexes)
+        first_user, last_user = ranges['users']
+        if users:
+            print(f"Created {users:,} users (user{first_user}@example.com ... user{last_user}@example.com, "
+                  f"password '{USER_PASSWORD}'), {jobs:,} jobs and {ranges['applications']:,} applications.")
+
+        stats.rebuild()
+        print("Rebuilt dashboard statistics.")
+
+        if similar_jobs:
+            similarity.get_index().rebuild()
+            print("Rebuilt similar jobs index.")
+
         print("Test data creation completed successfully!")
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load demo or bulk test data.')
+    parser.add_argument('--users', type=_count, default=5)
+    parser.add_argument('--jobs', type=_count, default=10)
+    parser.add_argument('--applications', type=_count, default=15)
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data.')
+    parser.add_argument('--chunk-size', type=_count, default=10000, help='Rows per insert batch and transaction.')
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='Maintain secondary indexes during the load instead of rebuilding them after.')
+    parser.add_argument('--skip-similarity', action='store_true', help='Do not rebuild the similar jobs index.')
+    args = parser.parse_args(argv)
+    create_test_data(args.users, args.jobs, args.applications, seed=args.seed,
+                     chunk_size=args.chunk_size, similar_jobs=not args.skip_similarity,
+                     defer_indexes=not args.keep_indexes)
+
+
 if __name__ == '__main__':
-    create_test_data() 
\ No newline at end of file
+    main()
@@ -0,0 +1,131 @@
+"""add structured salary columns to jobs
+
+Revision ID: 127adb185b27
+Revises: 4e94c52c4da5
+Create Date: 2026-10-18 19:42:16.508331
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '127adb185b27'
+down_revision = '4e94c52c4da5'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# The salary parser as of this revision (app.salary), frozen so that later
+# changes to it do not change what this migration writes
+DEFAULT_CURRENCY = 'HKD'
+CURRENCY_SYMBOLS = (
+    ('HK$', 'HKD'), ('US$', 'USD'), ('NT$', 'TWD'), ('S$', 'SGD'), ('A$', 'AUD'), ('C$', 'CAD'),
+    ('RMB', 'CNY'), ('£', 'GBP'), ('€', 'EUR'), ('$', DEFAULT_CURRENCY),
+)
+CURRENCY_CODES = {'HKD', 'USD', 'TWD', 'SGD', 'AUD', 'CAD', 'CNY', 'GBP', 'EUR', 'JPY', 'MOP'}
+CODE_RE = re.compile(r'\b([A-Za-z]{3})\b')
+AMOUNT_RE = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*([kKmM]\b)?')
+MULTIPLIERS = {'k': 1000, 'm': 1000000}
+RANGE_SEPARATOR_RE = re.compile(r'\s*(?:[A-Za-z]{1,3}\$?|[$£€])?\s*(?:-|–|~|to)\s*(?:[A-Za-z]{1,3}\$?|[$£€])?\s*',
+                                re.IGNORECASE)
+AT_MOST_RE = re.compile(r'\b(?:up\s+to|under|below|max(?:imum)?)\b|<=?', re.IGNORECASE)
+AT_LEAST_RE = re.compile(r'\b(?:at\s+least|from|over|above|min(?:imum)?)\b|>=?|\d[kKmM]?(?:\+|\s+\+\s*$)',
+                         re.IGNORECASE)
+
+
+def _currency(text):
+    upper = text.upper()
+    # Codes first: "MOP$" is patacas, not the "$" it contains
+    for word in CODE_RE.findall(upper):
+        if word in CURRENCY_CODES:
+            return word
+    for symbol, code in CURRENCY_SYMBOLS:
+        if symbol in upper:
+            return code
+    return DEFAULT_CURRENCY
+
+
+def _amounts(text):
+    matches = []
+    for match in AMOUNT_RE.finditer(text):
+        number, suffix = match.groups()
+        try:
+            value = float(number.replace(',', ''))
+        except ValueError:
+            continue
+        matches.append((match, value, MULTIPLIERS[suffix.lower()] if suffix else 1))
+    amounts = []
+    for i, (match, value, multiplier) in enumerate(matches):
+        if multiplier == 1 and value < 1000:
+            for j in (i + 1, i - 1):
+                if 0 <= j < len(matches) and matches[j][2] != 1:
+                    first, second = sorted((match, matches[j][0]), key=lambda m: m.start())
+                    if RANGE_SEPARATOR_RE.fullmatch(text, first.end(), second.start()):
+                        multiplier = matches[j][2]
+                        break
+        amounts.append(int(round(value * multiplier)))
+    if not amounts:
+        return []
+    return [amount for amount in amounts if amount * 100 >= max(amounts)]
+
+
+def salary_columns(text):
+    amounts = _amounts(text) if text else []
+    if not amounts:
+        return {'salary_currency': None, 'salary_min': None, 'salary_max': None}
+    minimum, maximum = min(amounts), max(amounts)
+    if len(amounts) == 1:
+        at_least = AT_LEAST_RE.search(text)
+        if AT_MOST_RE.search(text) and not at_least:
+            minimum = None
+        elif at_least:
+            maximum = None
+    return {'salary_currency': _currency(text), 'salary_min': minimum, 'salary_max': maximum}
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('salary_currency', sa.String(length=3), nullable=True))
+        batch_op.add_column(sa.Column('salary_min', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('salary_max', sa.Integer(), nullable=True))
+
+    # Backfill by primary key, one batch per statement, before the indexes exist
+    jobs = sa.table('jobs', sa.column('id', sa.Integer), sa.column('salary', sa.String),
+                    sa.column('salary_currency', sa.String), sa.column('salary_min', sa.Integer),
+                    sa.column('salary_max', sa.Integer))
+    conn = op.get_bind()
+    update = jobs.update().where(jobs.c.id == sa.bindparam('job_id')).values(
+        salary_currency=sa.bindparam('currency'), salary_min=sa.bindparam('minimum'),
+        salary_max=sa.bindparam('maximum'))
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.select(jobs.c.id, jobs.c.salary).where(jobs.c.id > last_id)
+                            .order_by(jobs.c.id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+        values = []
+        for job_id, salary in rows:
+            columns = salary_columns(salary)
+            if columns['salary_currency'] is not None:
+                values.append({'job_id': job_id, 'currency': columns['salary_currency'],
+                               'minimum': columns['salary_min'], 'maximum': columns['salary_max']})
+        if values:
+            conn.execute(update, values)
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_salary_max_id', ['salary_currency', 'salary_max', 'id'], unique=False)
+        batch_op.create_index('ix_jobs_salary_min', ['salary_currency', 'salary_min'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_salary_min')
+        batch_op.drop_index('ix_jobs_salary_max_id')
+        batch_op.drop_column('salary_max')
+        batch_op.drop_column('salary_min')
+        batch_op.drop_column('salary_currency')
@@ -0,0 +1,35 @@
+"""add FULLTEXT indexes for job search
+
+Revision ID: 3cb54c17c324
+Revises: de9fa05cc2f1
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3cb54c17c324'
+down_revision = 'de9fa05cc2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FULLTEXT is MySQL-only; other databases use the in-process search index
+    if op.get_bind().dialect.name != 'mysql':
+        return
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ft_jobs_text', ['title', 'description', 'requirements'], unique=False, mysql_prefix='FULLTEXT')
+        batch_op.create_index('ft_jobs_location', ['location'], unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ft_jobs_location')
+        batch_op.drop_index('ft_jobs_text')
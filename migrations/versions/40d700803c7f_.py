@@ -0,0 +1,26 @@
+"""add jobs.location index for the location facet
+
+Revision ID: 40d700803c7f
+Revises: 127adb185b27
+Create Date: 2026-10-18 20:31:07.214958
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '40d700803c7f'
+down_revision = '127adb185b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_location', ['location'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_location')
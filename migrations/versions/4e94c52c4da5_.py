@@ -0,0 +1,39 @@
+"""add content versions and jobs.updated_at for HTTP caching
+
+Revision ID: 4e94c52c4da5
+Revises: 6f2be0816016
+Create Date: 2026-10-18 18:05:41.318207
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e94c52c4da5'
+down_revision = '6f2be0816016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    content_versions = op.create_table('content_versions',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(content_versions, [{'name': 'public', 'version': 1, 'updated_at': datetime.utcnow()}])
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE jobs SET updated_at = created_at')
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    op.drop_table('content_versions')
@@ -0,0 +1,34 @@
+"""add job_changes log for refreshing in-process search indexes
+
+Revision ID: 521c45f6891a
+Revises: f464f951d332
+Create Date: 2026-10-18 23:41:08.402517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '521c45f6891a'
+down_revision = 'f464f951d332'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_changes',
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('version', 'job_id')
+    )
+    with op.batch_alter_table('job_changes', schema=None) as batch_op:
+        batch_op.create_index('ix_job_changes_changed_at', ['changed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job_changes', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_changes_changed_at')
+
+    op.drop_table('job_changes')
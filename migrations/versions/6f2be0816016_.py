@@ -0,0 +1,50 @@
+"""add soft delete columns, task progress and indexes for batched deletes
+
+Revision ID: 6f2be0816016
+Revises: 7fc12759b501
+Create Date: 2026-10-18 16:40:27.581093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2be0816016'
+down_revision = '7fc12759b501'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_users_deleted_at'), ['deleted_at'], unique=False)
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_jobs_deleted_at'), ['deleted_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_jobs_posted_by'), ['posted_by'], unique=False)
+
+    with op.batch_alter_table('job_similarities', schema=None) as batch_op:
+        batch_op.create_index('ix_job_similarities_similar_job_id', ['similar_job_id'], unique=False)
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('progress', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_column('progress')
+
+    with op.batch_alter_table('job_similarities', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_similarities_similar_job_id')
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_posted_by'))
+        batch_op.drop_index(batch_op.f('ix_jobs_deleted_at'))
+        batch_op.drop_column('deleted_at')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_deleted_at'))
+        batch_op.drop_column('deleted_at')
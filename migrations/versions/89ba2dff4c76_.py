@@ -0,0 +1,31 @@
+"""add stats_rollup table for dashboard statistics
+
+Revision ID: 89ba2dff4c76
+Revises: 3cb54c17c324
+Create Date: 2026-10-18 10:02:15.530871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '89ba2dff4c76'
+down_revision = '3cb54c17c324'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate afterwards with `flask stats rebuild`
+    op.create_table('stats_rollup',
+    sa.Column('metric', sa.String(length=20), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('metric', 'day', 'status')
+    )
+
+
+def downgrade():
+    op.drop_table('stats_rollup')
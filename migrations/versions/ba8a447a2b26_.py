@@ -0,0 +1,37 @@
+"""add job_similarities table for precomputed similar jobs
+
+Revision ID: ba8a447a2b26
+Revises: 89ba2dff4c76
+Create Date: 2026-10-18 11:20:07.412930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ba8a447a2b26'
+down_revision = '89ba2dff4c76'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate afterwards with `flask similarity rebuild`
+    op.create_table('job_similarities',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('similar_job_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+    sa.ForeignKeyConstraint(['similar_job_id'], ['jobs.id'], ),
+    sa.PrimaryKeyConstraint('job_id', 'similar_job_id')
+    )
+    with op.batch_alter_table('job_similarities', schema=None) as batch_op:
+        batch_op.create_index('ix_job_similarities_job_id_score', ['job_id', 'score'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job_similarities', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_similarities_job_id_score')
+
+    op.drop_table('job_similarities')
@@ -0,0 +1,31 @@
+"""add match scores to applications
+
+Revision ID: e97ae6c33c93
+Revises: 40d700803c7f
+Create Date: 2026-10-18 21:37:05.214087
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e97ae6c33c93'
+down_revision = '40d700803c7f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Scores start NULL; `flask matching rebuild` fills them in batches
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('match_score', sa.Float(), nullable=True))
+        batch_op.create_index('ix_applications_match_score_id', ['match_score', 'id'], unique=False)
+        batch_op.create_index('ix_applications_job_id_match_score', ['job_id', 'match_score', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.drop_index('ix_applications_job_id_match_score')
+        batch_op.drop_index('ix_applications_match_score_id')
+        batch_op.drop_column('match_score')
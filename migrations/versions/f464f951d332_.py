@@ -0,0 +1,40 @@
+"""add job_recommendations table for per-user recommended jobs
+
+Revision ID: f464f951d332
+Revises: e97ae6c33c93
+Create Date: 2026-10-18 22:54:31.170264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f464f951d332'
+down_revision = 'e97ae6c33c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate afterwards with `flask recommendations rebuild`
+    op.create_table('job_recommendations',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'job_id')
+    )
+    with op.batch_alter_table('job_recommendations', schema=None) as batch_op:
+        batch_op.create_index('ix_job_recommendations_job_id', ['job_id'], unique=False)
+        batch_op.create_index('ix_job_recommendations_user_id_score', ['user_id', 'score'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job_recommendations', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_recommendations_user_id_score')
+        batch_op.drop_index('ix_job_recommendations_job_id')
+
+    op.drop_table('job_recommendations')
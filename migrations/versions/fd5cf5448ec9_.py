@@ -0,0 +1,61 @@
+"""add secondary and composite indexes for listings and lookups
+
+Revision ID: fd5cf5448ec9
+Revises: ba8a447a2b26
+Create Date: 2026-10-18 12:05:44.906317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fd5cf5448ec9'
+down_revision = 'ba8a447a2b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicate applications left by the old double-apply race so the
+    # unique constraint can be created; run `flask stats rebuild` afterwards
+    op.execute(
+        'DELETE FROM applications WHERE id NOT IN ('
+        ' SELECT id FROM (SELECT MIN(id) AS id FROM applications GROUP BY user_id, job_id) AS keep)'
+    )
+
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_applications_user_job', ['user_id', 'job_id'])
+        batch_op.create_index('ix_applications_job_id_status', ['job_id', 'status'], unique=False)
+        batch_op.create_index('ix_applications_resume_id', ['resume_id'], unique=False)
+        batch_op.create_index('ix_applications_status_created_at', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_applications_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_applications_user_id_created_at', ['user_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_created_at_id', ['created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('resumes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_resumes_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_created_at'))
+
+    with op.batch_alter_table('resumes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_resumes_user_id'))
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_created_at_id')
+
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.drop_index('ix_applications_user_id_created_at')
+        batch_op.drop_index('ix_applications_created_at_id')
+        batch_op.drop_index('ix_applications_status_created_at')
+        batch_op.drop_index('ix_applications_resume_id')
+        batch_op.drop_index('ix_applications_job_id_status')
+        batch_op.drop_constraint('uq_applications_user_job', type_='unique')